@@ -11,11 +11,8 @@ from typing import Dict
 
 import pandas as pd
 
-from dfolks.core.classfactory import (
-    NormalClassRegistery,
-    TransformerRegistery,
-    load_class,
-)
+from dfolks.core import classfactory
+from dfolks.core.classfactory import NormalClassRegistery, load_class
 
 # Set up a shared logger
 logger = logging.getLogger("shared")
@@ -49,7 +46,7 @@ class ChainProcess:
             logger.info(f"Processing {child['kind']} started")
             cls = load_class(child)
             # If cls is TransformerRegistery, conduct fit_transform
-            if isinstance(cls, TransformerRegistery):
+            if isinstance(cls, classfactory.TransformerRegistery):
                 cls.fit(df)
                 df = cls.transform(df)
                 cls_dict.update({f"{child["kind"]}": cls})
@@ -1,5 +1,5 @@
 """classfactory base classes.
-1) TransformerRegistery: base class for customized transformer.
+1) TransformerRegistery: base class for customized transformer (defined at first access).
 2) WorkflowsRegistry: base class for workflow.
 3) NormalClassRegistery: base class for normal classes.
 
@@ -9,6 +9,15 @@ ClassRegistry: managing class - register to avoid collision.
 ABC: absract base class for defining abstract methods.
 BaseEstimator and TransformerMixin: scikit-learn base classes for transformers.
 
+Registered classes are looked up through a kind -> class index which is built once per process.
+Only the module which owns a requested kind is imported; kinds are mapped to modules by
+1) class_manifest.yaml: static manifest of built-in classes,
+2) "dfolks.classes" entry points: e.g. for classes of external packages,
+3) a manifest file (DFOLKS_CLASS_MANIFEST) persisted after importing all submodules and keyed by
+   package file mtimes.
+All submodules are imported only if a kind cannot be resolved by them.
+A kind registered again (allow_overwrite_classes) is updated in the index and manifests.
+
 Need to work:
 0) more attributes for base classes
 1) documentation
@@ -16,22 +25,51 @@ Need to work:
 
 from __future__ import annotations
 
+import importlib
+import importlib.metadata
 import logging
+import os
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Union
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
 
 import yaml
 from class_registry import ClassRegistry
 from class_registry.base import AutoRegister
-from pydantic import BaseModel
-from sklearn.base import BaseEstimator, TransformerMixin
+from pydantic import BaseModel, field_validator
+
+from dfolks.core.modules import import_all_submodules, package_fingerprint, set_logger
+
+# Set up shared logger
+logger = logging.getLogger("shared")
+
+
+class IndexedClassRegistry(ClassRegistry):
+    """ClassRegistry which keeps the class index up to date when a kind is overwritten."""
+
+    def _register(self, key, class_) -> None:
+        overwritten = key in self._registry
+        super()._register(key, class_)
+        if overwritten:
+            reindex_class(key)
 
-from dfolks.core.modules import import_all_submodules, set_logger
 
 # Class registry, all sub-classes will be stored at attr_name and not allow duplication.
-__reg_transformer_cls__ = ClassRegistry(attr_name="trsclss", unique=True)
-__reg_workflow_cls__ = ClassRegistry(attr_name="wfclss", unique=True)
-__reg_normal_cls__ = ClassRegistry(attr_name="nmclss", unique=True)
+__reg_transformer_cls__ = IndexedClassRegistry(attr_name="trsclss", unique=True)
+__reg_workflow_cls__ = IndexedClassRegistry(attr_name="wfclss", unique=True)
+__reg_normal_cls__ = IndexedClassRegistry(attr_name="nmclss", unique=True)
+
+# Index of registered classes (kind -> class), built once per process.
+__class_index__: Dict[str, type] = {}
+__class_index_built__ = False
+# Environment variable for a path of the persisted class manifest; not persisted if unset.
+__class_manifest_env__ = "DFOLKS_CLASS_MANIFEST"
+# Static manifest of built-in classes (kind -> module).
+__static_class_manifest__ = Path(__file__).with_name("class_manifest.yaml")
+# Entry point group for registered classes (name: kind, value: module:class).
+__class_entry_point_group__ = "dfolks.classes"
+# Modules which own kinds (kind -> module), discovered without importing the modules.
+__class_modules__: Dict[str, str] = {}
 
 
 def allow_overwrite_classes():
@@ -42,44 +80,65 @@ def allow_overwrite_classes():
     __reg_normal_cls__.unique = False
 
 
-class TransformerRegistery(
-    AutoRegister(__reg_transformer_cls__),
-    ABC,
-    BaseEstimator,
-    TransformerMixin,
-    BaseModel,
-):
-    """Base class for customized transformer.
+def _transformer_registery() -> type:
+    """Define TransformerRegistery at first access.
 
-    Inherited class must have following values
-    1) trsclss: class registration.
+    scikit-learn takes more than a second to import, thus it is imported only if
+    a transformer is used; e.g. not for a simple data ingestion job.
+    """
+    from sklearn.base import BaseEstimator, TransformerMixin
 
-    Key methods
-    ----------
-    variables: Return variables of the workflow.
-    ----------
+    class TransformerRegistery(
+        AutoRegister(__reg_transformer_cls__),
+        ABC,
+        BaseEstimator,
+        TransformerMixin,
+        BaseModel,
+    ):
+        """Base class for customized transformer.
 
-    Abstract methods
-    ----------
-    fit: Performing fit.
-    transform: Performing transformation.
-    ----------
-    """
+        Inherited class must have following values
+        1) trsclss: class registration.
 
-    @property
-    def variables(self) -> Dict:
-        """Return Variables of a pydantic model."""
-        return self.model_dump()
+        Key methods
+        ----------
+        variables: Return variables of the workflow.
+        ----------
 
-    @abstractmethod
-    def fit(self, X, y=None):
-        """fit method"""
-        raise NotImplementedError("fit method not implemented")
+        Abstract methods
+        ----------
+        fit: Performing fit.
+        transform: Performing transformation.
+        ----------
+        """
 
-    @abstractmethod
-    def transform(self, X):
-        """transform method"""
-        raise NotImplementedError("transform method not implemented")
+        @property
+        def variables(self) -> Dict:
+            """Return Variables of a pydantic model."""
+            return self.model_dump()
+
+        @abstractmethod
+        def fit(self, X, y=None):
+            """fit method"""
+            raise NotImplementedError("fit method not implemented")
+
+        @abstractmethod
+        def transform(self, X):
+            """transform method"""
+            raise NotImplementedError("transform method not implemented")
+
+    # Behave as a module level class; e.g. for pickling.
+    TransformerRegistery.__qualname__ = "TransformerRegistery"
+    globals()["TransformerRegistery"] = TransformerRegistery
+
+    return TransformerRegistery
+
+
+def __getattr__(name: str) -> Any:
+    """Return lazily defined classes of the module."""
+    if name == "TransformerRegistery":
+        return _transformer_registery()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class WorkflowsRegistry(AutoRegister(__reg_workflow_cls__), ABC, BaseModel):
@@ -102,10 +161,20 @@ class WorkflowsRegistry(AutoRegister(__reg_workflow_cls__), ABC, BaseModel):
         Optional[str] = "INFO"
     log_path: Set a path if you want to store a log in a file.
         Optional[str] = None
+    depends_on: Names of jobs or artifacts ("target_db/target_path") which this job depends on.
+        Used by the job executor to order jobs; a single name is accepted.
+        Optional[List[str]] = None
     """
 
     log_level: Optional[str] = "INFO"
     log_path: Optional[str] = None
+    depends_on: Optional[List[str]] = None
+
+    @field_validator("depends_on", mode="before")
+    def _check_depends_on(cls, value):
+        if isinstance(value, str):
+            return [value]
+        return value
 
     @abstractmethod
     def run(self) -> None:
@@ -147,10 +216,152 @@ class NormalClassRegistery(AutoRegister(__reg_normal_cls__), ABC, BaseModel):
         return self.model_dump()
 
 
+def _registries():
+    """Return registries in the order of lookup precedence."""
+    return (
+        ("trsclss", __reg_transformer_cls__),
+        ("wfclss", __reg_workflow_cls__),
+        ("nmclss", __reg_normal_cls__),
+    )
+
+
+def _manifest_path(path: Optional[str] = None) -> Optional[Path]:
+    """Return a path of the class manifest if defined."""
+    path = path or os.getenv(__class_manifest_env__)
+    return Path(path) if path else None
+
+
+def read_class_manifest(path: Optional[str] = None) -> Optional[Dict]:
+    """Read the class manifest; None if undefined, missing or outdated."""
+    manifest_path = _manifest_path(path)
+    if manifest_path is None or not manifest_path.exists():
+        return None
+
+    with open(manifest_path) as f:
+        manifest = yaml.safe_load(f) or {}
+
+    # Manifest is outdated if any module of dfolks was added, removed or modified.
+    if manifest.get("fingerprint") != package_fingerprint():
+        logger.info(f"Class manifest is outdated: {manifest_path}")
+        return None
+
+    return manifest
+
+
+def write_class_manifest(path: Optional[str] = None) -> Optional[Path]:
+    """Write kind, registry and module of registered classes to the class manifest."""
+    manifest_path = _manifest_path(path)
+    if manifest_path is None:
+        return None
+
+    classes = {}
+    for attr_name, registry in reversed(_registries()):
+        for kind, cls in registry._registry.items():
+            classes[kind] = {"registry": attr_name, "module": cls.__module__}
+
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        yaml.safe_dump(
+            {"fingerprint": package_fingerprint(), "classes": classes},
+            f,
+            sort_keys=True,
+        )
+    logger.info(f"Class manifest saved in {manifest_path}")
+
+    return manifest_path
+
+
+def build_class_index(refresh: bool = False) -> Dict[str, type]:
+    """Build kind -> class index of registered classes once per process.
+
+    If a valid class manifest exists, only modules listed in it are imported;
+    otherwise all submodules are imported and the manifest is (re)written.
+    """
+    global __class_index_built__
+
+    if __class_index_built__ and not refresh:
+        return __class_index__
+
+    manifest = None if refresh else read_class_manifest()
+    if manifest is not None:
+        for module in sorted({c["module"] for c in manifest["classes"].values()}):
+            importlib.import_module(module)
+    else:
+        import_all_submodules()
+
+    # Registries with higher precedence overwrite the same kind.
+    __class_index__.clear()
+    for _, registry in reversed(_registries()):
+        __class_index__.update(registry._registry)
+    __class_index_built__ = True
+
+    if manifest is None:
+        write_class_manifest()
+
+    return __class_index__
+
+
+def discover_class_modules(refresh: bool = False) -> Dict[str, str]:
+    """Map kinds to modules which own them without importing the modules.
+
+    Later sources take precedence: static manifest, entry points, persisted manifest.
+    """
+    if __class_modules__ and not refresh:
+        return __class_modules__
+
+    __class_modules__.clear()
+
+    with open(__static_class_manifest__) as f:
+        __class_modules__.update(yaml.safe_load(f) or {})
+
+    for entry_point in importlib.metadata.entry_points(
+        group=__class_entry_point_group__
+    ):
+        __class_modules__[entry_point.name] = entry_point.module
+
+    manifest = read_class_manifest()
+    if manifest is not None:
+        for kind, cls in manifest["classes"].items():
+            __class_modules__[kind] = cls["module"]
+
+    return __class_modules__
+
+
+def invalidate_class_index() -> None:
+    """Invalidate the class index; it is rebuilt at the next lookup."""
+    global __class_index_built__
+    __class_index__.clear()
+    __class_modules__.clear()
+    __class_index_built__ = False
+
+
+def reindex_class(kind: str) -> None:
+    """Point the class index and class manifests of a re-registered kind to its class."""
+    cls = _find_registered(kind)
+    if cls is None:
+        return
+
+    if kind in __class_index__:
+        __class_index__[kind] = cls
+    if kind in __class_modules__:
+        __class_modules__[kind] = cls.__module__
+
+    manifest = read_class_manifest()
+    if manifest is None or kind not in manifest["classes"]:
+        return
+    attr_name = next(a for a, r in _registries() if kind in r)
+    entry = {"registry": attr_name, "module": cls.__module__}
+    if manifest["classes"][kind] != entry:
+        manifest["classes"][kind] = entry
+        with open(_manifest_path(), "w") as f:
+            yaml.safe_dump(manifest, f, sort_keys=True)
+        logger.info(f"Class manifest updated for re-registered kind '{kind}'.")
+
+
 def check_registration():
     """Imports all submodules and checks the registered classes."""
     # Import all modules in the specified package.
-    import_all_submodules()
+    build_class_index()
 
     # Print out all registered classes.
     # transformer registry
@@ -179,13 +390,46 @@ def check_registration():
     )
 
 
+def _find_registered(kind: str):
+    """Return a class of the kind from registries; None if not registered yet."""
+    for _, registry in _registries():
+        if kind in registry:
+            return registry._registry[kind]
+
+    return None
+
+
+def get_class(kind: str):
+    """Return a registered class of the kind; None if not registered.
+
+    Only the module which owns the kind is imported if it is discovered;
+    otherwise all submodules are imported once.
+    """
+    if kind in __class_index__:
+        return __class_index__[kind]
+
+    cls = _find_registered(kind)
+
+    if cls is None:
+        module = discover_class_modules().get(kind)
+        if module is not None:
+            logger.debug(f"Import {module} for kind '{kind}'")
+            importlib.import_module(module)
+            cls = _find_registered(kind)
+
+    if cls is None:
+        cls = build_class_index().get(kind)
+
+    if cls is not None:
+        __class_index__[kind] = cls
+
+    return cls
+
+
 def load_class(
     yml: Union[Dict[str, Any], str],
 ):
     """Load registered class from a yaml string or dict."""
-    # Import all subclasses which are registered in entry points.
-    import_all_submodules()
-
     # Parse YAML input; if it's already a dict, use it directly.
     if isinstance(yml, dict):
         vars = yml
@@ -198,17 +442,9 @@ def load_class(
 
     kind = vars["kind"]
 
-    # Check in transformer registry
-    if kind in __reg_transformer_cls__:
-        cls = __reg_transformer_cls__._registry[kind]
-        return cls.model_validate(vars)
-    # Check in workflow registry
-    elif kind in __reg_workflow_cls__:
-        cls = __reg_workflow_cls__._registry[kind]
-        return cls.model_validate(vars)
-    # Check in normal class registry
-    elif kind in __reg_normal_cls__:
-        cls = __reg_normal_cls__._registry[kind]
-        return cls.model_validate(vars)
-    else:
+    # Look up transformer, workflow and normal class registries via the class index.
+    cls = get_class(kind)
+    if cls is None:
         raise ValueError(f"Class with kind '{kind}' is not registered.")
+
+    return cls.model_validate(vars)
@@ -1,22 +1,78 @@
 """Execute workflow jobs from YAML files.
 
+Jobs are scheduled as a DAG; a job can declare "depends_on" with names of other jobs
+(file name without extension) or artifacts produced by other jobs ("target_db/target_path").
+Ready jobs are executed one by one by default, or concurrently in a process or thread pool
+if max_workers > 1; jobs writing the same artifact are never executed at the same time.
+Jobs depending on failed jobs are skipped.
+
 Need to work:
 0) Documentation.
-1) Add CLI options.
 """
 
+import argparse
 import logging
+import time
+import traceback
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from graphlib import TopologicalSorter
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set
 
 import yaml
+from pydantic import BaseModel, ConfigDict
 
 from dfolks.core.classfactory import WorkflowsRegistry, load_class
-from dfolks.core.modules import set_logger
+from dfolks.core.modules import (
+    JobLogFilter,
+    __current_job__,
+    get_formatter,
+    set_logger,
+)
 
 # Set up shared logger
 logger = logging.getLogger("shared")
 
+# Supported pools for concurrent job execution.
+__support_pools__ = ["process", "thread"]
+
+
+class JobResult(BaseModel):
+    """Result of a job execution.
+
+    Variables
+    ----------
+    job_path: Path of the job YAML file.
+        Path
+    status: "completed", "failed" or "skipped" (upstream jobs failed).
+        str
+    result: Returned value of the workflow.
+        Any = None
+    error: Traceback of the exception if the job failed.
+        Optional[str] = None
+    log_path: Path of the job log file.
+        Optional[Path] = None
+    elapsed: Elapsed time in seconds.
+        float = 0.0
+    ----------
+    """
+
+    job_path: Path
+    status: str
+    result: Any = None
+    error: Optional[str] = None
+    log_path: Optional[Path] = None
+    elapsed: float = 0.0
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
 
 def extract_job_yamls(jobs_path: str | Path = "jobs") -> List[Path]:
     """Extract YAML files directly under the jobs folder."""
@@ -63,20 +119,332 @@ def execute_job(job_path: str | Path) -> Optional[object]:
         return None
 
 
-def execute_jobs(jobs_path: str | Path = "jobs") -> None:
-    """Execute all runnable YAML jobs directly under the jobs folder."""
-    logger.info("Starting job execution.")
-    job_yamls = extract_job_yamls(jobs_path)
+def run_job(
+    job_path: str | Path,
+    log_dir: Optional[str | Path] = None,
+    isolate_thread: bool = False,
+) -> JobResult:
+    """Execute a single job YAML file and return its result without raising.
+
+    If log_dir is defined, logs of the job are also written to log_dir/<job name>.log.
+    isolate_thread should be True in a thread pool so that the log file only has
+    records of the job; records of threads started by the job with
+    ContextThreadPoolExecutor or start_thread are included.
+    """
+    job_path = Path(job_path)
+    log_path = None
+    handler = None
+    # Records of the job are tagged with the job in the context.
+    job_id = f"{job_path}:{uuid.uuid4().hex}"
+    token = __current_job__.set(job_id)
+
+    # Add a file handler for the job.
+    if log_dir is not None:
+        log_path = Path(log_dir) / f"{job_path.stem}.log"
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(log_path, mode="a")
+        handler.setFormatter(get_formatter())
+        if isolate_thread:
+            handler.addFilter(JobLogFilter(job_id))
+        logger.addHandler(handler)
+
+    start = time.perf_counter()
+    try:
+        result = execute_job(job_path)
+        job_result = JobResult(job_path=job_path, status="completed", result=result)
+    except Exception:
+        logger.exception(f"Failed to execute job YAML: {job_path}")
+        job_result = JobResult(
+            job_path=job_path, status="failed", error=traceback.format_exc()
+        )
+    finally:
+        if handler is not None:
+            logger.removeHandler(handler)
+            handler.close()
+        __current_job__.reset(token)
+
+    job_result.log_path = log_path
+    job_result.elapsed = time.perf_counter() - start
+
+    return job_result
+
 
+def _future_result(future: Future, job_path: Path) -> JobResult:
+    """Return a job result of a future of run_job."""
+    try:
+        job_result = future.result()
+    # e.g. a worker process terminated abruptly.
+    except Exception:
+        logger.exception(f"Failed to execute job YAML: {job_path}")
+        job_result = JobResult(
+            job_path=job_path, status="failed", error=traceback.format_exc()
+        )
+    logger.info(f"Job {job_path} {job_result.status} in {job_result.elapsed:.1f}s.")
+
+    return job_result
+
+
+def execute_jobs_concurrently(
+    job_yamls: List[Path],
+    max_workers: int = 1,
+    pool: str = "process",
+    log_dir: Optional[str | Path] = None,
+) -> List[JobResult]:
+    """Execute job YAML files concurrently and return results in the order of jobs.
+
+    depends_on of jobs is ignored; use execute_job_graph for dependent jobs.
+    Jobs are executed one by one unless max_workers > 1; jobs writing the same artifact
+    are executed one at a time in the order of jobs.
+
+    pool: "process" for ProcessPoolExecutor or "thread" for ThreadPoolExecutor.
+        Threads are enough for jobs waiting on remote APIs.
+    """
+    graph = {job_path: set() for job_path in job_yamls}
+
+    return _execute_graph(
+        graph, job_yamls, max_workers, pool, log_dir, job_artifacts_of(job_yamls)
+    )
+
+
+def job_artifacts(job_yaml: Dict) -> List[str]:
+    """Return artifacts produced by a job; "target_db/target_path*" or "target_path*"."""
+    artifacts = []
+    for key, value in job_yaml.items():
+        if key.startswith("target_path") and isinstance(value, str):
+            if job_yaml.get("target_db"):
+                artifacts.append(Path(job_yaml["target_db"], value).as_posix())
+            else:
+                artifacts.append(Path(value).as_posix())
+
+    return artifacts
+
+
+def read_job_yamls(job_yamls: List[Path]) -> Dict[Path, Dict]:
+    """Read job YAML files; an unreadable or invalid job is read as an empty dict.
+
+    Such a job fails at execution and is reported as a failed job.
+    """
+    job_yaml_dict = {}
     for job_path in job_yamls:
         try:
-            _ = execute_job(job_path)
-        except Exception:
-            logger.exception(f"Failed to execute job YAML: {job_path}")
+            job_yaml = yaml.safe_load(Path(job_path).read_text(encoding="utf-8"))
+        except (OSError, yaml.YAMLError):
+            job_yaml = None
+        job_yaml_dict[job_path] = job_yaml if isinstance(job_yaml, dict) else {}
+
+    return job_yaml_dict
+
+
+def job_artifacts_of(job_yamls: List[Path]) -> Dict[Path, Set[str]]:
+    """Return artifacts produced by each job of job YAML files."""
+    return {
+        job_path: set(job_artifacts(job_yaml))
+        for job_path, job_yaml in read_job_yamls(job_yamls).items()
+    }
+
+
+def build_job_graph(
+    job_yamls: List[Path], errors: Optional[Dict[Path, str]] = None
+) -> Dict[Path, Set[Path]]:
+    """Build a DAG of jobs; job path -> paths of upstream jobs.
+
+    depends_on of a job accepts names of other jobs or artifacts produced by other jobs;
+    a job depends on all jobs producing an artifact.
+    errors: Unknown dependencies of jobs are logged and added as job path -> message;
+        execute_job_graph fails such jobs and skips their downstream jobs.
+    """
+    job_yaml_dict = read_job_yamls(job_yamls)
+
+    # Map job names and produced artifacts to job paths; a dependency on an artifact
+    # waits for all jobs producing it.
+    producers: Dict[str, Set[Path]] = {}
+    for job_path in job_yamls:
+        producers.setdefault(Path(job_path).stem, set()).add(job_path)
+    for job_path, job_yaml in job_yaml_dict.items():
+        for artifact in job_artifacts(job_yaml):
+            producers.setdefault(artifact, set()).add(job_path)
+
+    graph = {}
+    for job_path, job_yaml in job_yaml_dict.items():
+        depends_on = job_yaml.get("depends_on") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+
+        upstreams = set()
+        for dependency in depends_on:
+            if dependency not in producers:
+                message = f"Unknown dependency '{dependency}' of {job_path}."
+                logger.error(message)
+                if errors is not None:
+                    errors[job_path] = message
+                continue
+            upstreams.update(producers[dependency])
+        upstreams.discard(job_path)
+        graph[job_path] = upstreams
+
+    return graph
+
+
+def execute_job_graph(
+    job_yamls: List[Path],
+    max_workers: int = 1,
+    pool: str = "process",
+    log_dir: Optional[str | Path] = None,
+) -> List[JobResult]:
+    """Execute job YAML files in the order of dependencies and return results.
+
+    Ready jobs are executed one by one if max_workers is 1; otherwise concurrently,
+    except jobs writing the same artifact which are executed one at a time.
+    Jobs with unknown dependencies fail without being executed.
+    Jobs whose upstream jobs failed or were skipped are skipped.
+    """
+    errors = {}
+    graph = build_job_graph(job_yamls, errors)
+
+    return _execute_graph(
+        graph,
+        job_yamls,
+        max_workers,
+        pool,
+        log_dir,
+        job_artifacts_of(job_yamls),
+        errors,
+    )
+
+
+def _execute_graph(
+    graph: Dict[Path, Set[Path]],
+    job_yamls: List[Path],
+    max_workers: int = 1,
+    pool: str = "process",
+    log_dir: Optional[str | Path] = None,
+    artifacts: Optional[Dict[Path, Set[str]]] = None,
+    errors: Optional[Dict[Path, str]] = None,
+) -> List[JobResult]:
+    """Execute jobs of a DAG; job path -> paths of upstream jobs.
+
+    artifacts: Artifacts produced by each job; a ready job waits while another job
+        writing any of its artifacts is running, e.g. both upsert the same file.
+    errors: Jobs failed before execution, e.g. by unknown dependencies; job path ->
+        message.
+    """
+    if pool not in __support_pools__:
+        raise ValueError(f"Unsupported pool '{pool}'. Choose from {__support_pools__}.")
+
+    job_order = {job_path: i for i, job_path in enumerate(job_yamls)}
+    artifacts = artifacts or {}
+    errors = errors or {}
+
+    # Raise graphlib.CycleError if jobs depend on each other.
+    sorter = TopologicalSorter(graph)
+    sorter.prepare()
+
+    results = {}
+    executor = None
+    if max_workers != 1:
+        executor_cls = ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+        executor = executor_cls(max_workers=max_workers)
+        logger.info(
+            f"Executing {len(job_yamls)} jobs with {pool} pool (max_workers={max_workers})."
+        )
+
+    running = {}
+    # Ready jobs waiting for running jobs writing the same artifacts.
+    waiting = []
+    locked: Set[str] = set()
+    try:
+        while sorter.is_active():
+            waiting = sorted([*waiting, *sorter.get_ready()], key=job_order.get)
+            for job_path in list(waiting):
+                produced = artifacts.get(job_path, set())
+                failed = [
+                    str(upstream)
+                    for upstream in graph[job_path]
+                    if results[upstream].status != "completed"
+                ]
+                # Skip the job if any upstream jobs did not complete.
+                if failed:
+                    logger.warning(
+                        f"Skipping {job_path}; upstream jobs failed: {failed}"
+                    )
+                    results[job_path] = JobResult(
+                        job_path=job_path,
+                        status="skipped",
+                        error=f"Upstream jobs failed: {failed}",
+                    )
+                    sorter.done(job_path)
+                elif job_path in errors:
+                    results[job_path] = JobResult(
+                        job_path=job_path, status="failed", error=errors[job_path]
+                    )
+                    sorter.done(job_path)
+                elif produced & locked:
+                    continue
+                elif executor is None:
+                    results[job_path] = run_job(job_path, log_dir)
+                    sorter.done(job_path)
+                else:
+                    future = executor.submit(
+                        run_job, job_path, log_dir, pool == "thread"
+                    )
+                    running[future] = job_path
+                    locked |= produced
+                waiting.remove(job_path)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_path = running.pop(future)
+                locked -= artifacts.get(job_path, set())
+                results[job_path] = _future_result(future, job_path)
+                sorter.done(job_path)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return [results[job_path] for job_path in job_yamls]
+
+
+def execute_jobs(
+    jobs_path: str | Path = "jobs",
+    max_workers: int = 1,
+    pool: str = "process",
+    log_dir: Optional[str | Path] = None,
+) -> None:
+    """Execute all runnable YAML jobs directly under the jobs folder.
+
+    Jobs are executed in the order of dependencies; one by one if max_workers is 1,
+    otherwise concurrently.
+    """
+    logger.info("Starting job execution.")
+    job_yamls = extract_job_yamls(jobs_path)
+
+    results = execute_job_graph(job_yamls, max_workers, pool, log_dir)
+
+    failed = [str(r.job_path) for r in results if r.status == "failed"]
+    if failed:
+        logger.error(f"{len(failed)} of {len(results)} jobs failed: {failed}")
+    skipped = [str(r.job_path) for r in results if r.status == "skipped"]
+    if skipped:
+        logger.error(f"{len(skipped)} of {len(results)} jobs skipped: {skipped}")
 
     logger.info("Job execution completed.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Execute workflow jobs.")
+    parser.add_argument("--jobs-path", default="jobs", help="Folder of job YAMLs.")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=1,
+        help="Number of concurrent jobs; jobs writing the same output run one at a time.",
+    )
+    parser.add_argument("--pool", default="process", choices=__support_pools__)
+    parser.add_argument("--log-dir", default=None, help="Folder of per-job logs.")
+    args = parser.parse_args()
+
     logger = set_logger("shared", logging.INFO, None)
-    execute_jobs()
+    execute_jobs(args.jobs_path, args.max_workers, args.pool, args.log_dir)
@@ -26,7 +26,7 @@ def _load_by_path(path) -> Dict:
     # Get absolute path.
     path = str(path)
     if Path(path).is_absolute():
-        f_path = path
+        f_path = Path(path)
     else:
         f_path = Path(os.path.join(PROJECTROOTPATH, path)).resolve()
 
@@ -1,20 +1,70 @@
 """Modules for core classes.
 
 1) set_logger
-2) import_all_submodules
+2) get_formatter
+3) import_all_submodules
+4) package_fingerprint
+5) JobLogFilter, ContextThreadPoolExecutor, start_thread: logs of a job and its threads
 
 Need to work:
 0) import all submodules: dynamic entrypoint.
 """
 
+import contextvars
+import hashlib
 import importlib
 import logging
 import pkgutil
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 # Global logger
 loggers = {}
 
+# Job executed in the current context; propagated to threads started by the job.
+__current_job__ = contextvars.ContextVar("current_job", default=None)
+
+
+def get_formatter() -> logging.Formatter:
+    """Return a formatter of shared loggers."""
+    return logging.Formatter(
+        fmt="%(asctime)s [Module: %(module)s-%(funcName)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+
+class JobLogFilter(logging.Filter):
+    """Pass log records of a job, including records of threads started by the job."""
+
+    def __init__(self, job_id: str):
+        super().__init__()
+        self.job_id = job_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return __current_job__.get() == self.job_id
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor running tasks in the context of the submitting thread.
+
+    Records logged by tasks are thus passed by JobLogFilter of the submitting job.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def start_thread(target, daemon: bool = True) -> threading.Thread:
+    """Start a thread running target in the context of the current thread."""
+    thread = threading.Thread(
+        target=contextvars.copy_context().run, args=(target,), daemon=daemon
+    )
+    thread.start()
+
+    return thread
+
 
 def set_logger(name, level, log_path):
     """Set up a shared logger."""
@@ -28,10 +78,7 @@ def set_logger(name, level, log_path):
         logger.setLevel(level)  # Set the base logger level.
 
         # Define a formatter.
-        formatter = logging.Formatter(
-            fmt="%(asctime)s [Module: %(module)s-%(funcName)s] [%(levelname)s] %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
+        formatter = get_formatter()
 
         # Create a console handler.
         console_handler = logging.StreamHandler(sys.stdout)
@@ -60,3 +107,21 @@ def import_all_submodules(packages=("dfolks",)):
             package.__path__, package.__name__ + "."
         ):
             importlib.import_module(module_name)
+
+
+def package_fingerprint(packages=("dfolks",)) -> str:
+    """Return a hash of module file paths and their mtimes of packages.
+
+    Used to check whether a persisted class manifest is still up to date.
+    """
+    digest = hashlib.sha1()
+    for package_name in packages:
+        package = importlib.import_module(package_name)
+        for root in package.__path__:
+            for path in sorted(Path(root).rglob("*.py")):
+                digest.update(
+                    f"{package_name}/{path.relative_to(root).as_posix()}:"
+                    f"{path.stat().st_mtime_ns};".encode()
+                )
+
+    return digest.hexdigest()
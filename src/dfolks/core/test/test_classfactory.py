@@ -1,16 +1,25 @@
 """Test for classfactory."""
 
+import importlib
+import importlib.metadata
 from typing import ClassVar
 
 import pytest
 from pydantic import BaseModel
 
+import dfolks.core.classfactory as classfactory
 from dfolks.core.classfactory import (
     NormalClassRegistery,
     TransformerRegistery,
     WorkflowsRegistry,
     allow_overwrite_classes,
+    build_class_index,
+    discover_class_modules,
+    get_class,
+    invalidate_class_index,
     load_class,
+    read_class_manifest,
+    write_class_manifest,
 )
 
 
@@ -157,3 +166,181 @@ def test_load_class_raises_if_not_registered(patch_registries):
     with pytest.raises(ValueError) as e:
         load_class({"kind": "UnknownKind"})
     assert "not registered" in str(e.value)
+
+
+@pytest.fixture
+def count_imports(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "dfolks.core.classfactory.import_all_submodules", lambda: calls.append(1)
+    )
+    monkeypatch.delenv("DFOLKS_CLASS_MANIFEST", raising=False)
+    invalidate_class_index()
+    yield calls
+    invalidate_class_index()
+
+
+def test_get_class_without_importing_all_submodules(count_imports):
+    assert get_class("testnmcls1") is TstNormalRegA
+    assert get_class("testnmcls1") is TstNormalRegA
+    assert load_class({"kind": "testnmcls1", "test_var": 1}).test_var == 1
+    assert len(count_imports) == 0
+
+
+def test_get_class_imports_all_submodules_once_if_not_discovered(count_imports):
+    assert get_class("not_registered_kind") is None
+    assert get_class("not_registered_kind") is None
+    assert len(count_imports) == 1
+
+
+def test_get_class_imports_only_owning_module(count_imports, monkeypatch):
+    imported = []
+
+    def fake_import_module(name):
+        imported.append(name)
+
+        class TstNormalRegLazy(NormalClassRegistery):
+            nmclss: ClassVar[str] = "testnmcls_lazy"
+
+            @property
+            def variables(self):
+                return self.model_dump()
+
+    monkeypatch.setitem(
+        classfactory.discover_class_modules(), "testnmcls_lazy", "fake.module"
+    )
+    monkeypatch.setattr(importlib, "import_module", fake_import_module)
+
+    assert get_class("testnmcls_lazy").nmclss == "testnmcls_lazy"
+    assert imported == ["fake.module"]
+    assert len(count_imports) == 0
+
+
+def test_discover_class_modules_from_entry_points(count_imports, monkeypatch):
+    entry_point = importlib.metadata.EntryPoint(
+        name="ExtKind", value="ext.module:ExtClass", group="dfolks.classes"
+    )
+    monkeypatch.setattr(
+        importlib.metadata,
+        "entry_points",
+        lambda group: [entry_point] if group == "dfolks.classes" else [],
+    )
+
+    modules = discover_class_modules(refresh=True)
+    assert modules["ExtKind"] == "ext.module"
+    assert modules["SimpleParser"] == "dfolks.parsers.simpleparser"
+
+
+def test_static_class_manifest_matches_registered_classes(count_imports):
+    for kind, module in discover_class_modules(refresh=True).items():
+        importlib.import_module(module)
+        cls = classfactory._find_registered(kind)
+        assert cls is not None, kind
+        assert cls.__module__ == module
+
+
+def test_transformer_registery_is_module_level_class():
+    assert classfactory.TransformerRegistery is TransformerRegistery
+    assert TransformerRegistery.__qualname__ == "TransformerRegistery"
+    with pytest.raises(AttributeError):
+        classfactory.NotDefinedClass
+
+
+def test_class_index_rebuilt_after_invalidation(count_imports):
+    build_class_index()
+    invalidate_class_index()
+    build_class_index()
+    assert len(count_imports) == 2
+
+
+def test_class_index_registry_precedence(count_imports):
+    # Transformer registry takes precedence over workflow registry.
+    assert issubclass(build_class_index()["testcls1"], TransformerRegistery)
+
+
+def test_get_class_finds_classes_registered_after_index_built(count_imports):
+    build_class_index()
+
+    class TstNormalRegLate(NormalClassRegistery):
+        nmclss: ClassVar[str] = "testnmcls_late"
+
+        @property
+        def variables(self):
+            return self.model_dump()
+
+    assert get_class("testnmcls_late") is TstNormalRegLate
+    assert get_class("not_registered_kind") is None
+
+
+def test_class_manifest_write_and_read(count_imports, tmp_path, monkeypatch):
+    manifest_path = tmp_path / "manifest.yaml"
+    monkeypatch.setenv("DFOLKS_CLASS_MANIFEST", str(manifest_path))
+
+    build_class_index()
+    assert manifest_path.exists()
+
+    manifest = read_class_manifest()
+    assert manifest["classes"]["testnmcls1"] == {
+        "registry": "nmclss",
+        "module": __name__,
+    }
+
+    # A new build imports modules listed in the manifest instead of walking.
+    imported = []
+    import_module = importlib.import_module
+
+    def fake_import_module(name):
+        imported.append(name)
+        return import_module(name)
+
+    monkeypatch.setattr(importlib, "import_module", fake_import_module)
+    invalidate_class_index()
+    build_class_index()
+    assert len(count_imports) == 1
+    assert __name__ in imported
+
+
+def test_class_manifest_outdated(tmp_path, monkeypatch):
+    manifest_path = tmp_path / "manifest.yaml"
+    write_class_manifest(manifest_path)
+    monkeypatch.setattr(classfactory, "package_fingerprint", lambda: "changed")
+    assert read_class_manifest(manifest_path) is None
+
+
+def test_class_manifest_not_defined(monkeypatch):
+    monkeypatch.delenv("DFOLKS_CLASS_MANIFEST", raising=False)
+    assert write_class_manifest() is None
+    assert read_class_manifest() is None
+
+
+def test_reregistered_class_is_reindexed(count_imports, tmp_path, monkeypatch):
+    manifest_path = tmp_path / "manifest.yaml"
+    monkeypatch.setenv("DFOLKS_CLASS_MANIFEST", str(manifest_path))
+    monkeypatch.setattr(classfactory.__reg_normal_cls__, "unique", False)
+
+    class TstNormalRegOld(NormalClassRegistery):
+        __module__ = "dfolks.old_module"
+        nmclss: ClassVar[str] = "testnmcls_reregistered"
+
+        @property
+        def variables(self):
+            return self.model_dump()
+
+    build_class_index()
+    assert get_class("testnmcls_reregistered") is TstNormalRegOld
+    assert discover_class_modules()["testnmcls_reregistered"] == "dfolks.old_module"
+
+    class TstNormalRegNew(NormalClassRegistery):
+        nmclss: ClassVar[str] = "testnmcls_reregistered"
+
+        @property
+        def variables(self):
+            return self.model_dump()
+
+    assert get_class("testnmcls_reregistered") is TstNormalRegNew
+    assert build_class_index()["testnmcls_reregistered"] is TstNormalRegNew
+    assert discover_class_modules()["testnmcls_reregistered"] == __name__
+    assert read_class_manifest()["classes"]["testnmcls_reregistered"] == {
+        "registry": "nmclss",
+        "module": __name__,
+    }
@@ -1,12 +1,27 @@
 """Test for execute."""
 
+import logging
+import threading
+import time
+from graphlib import CycleError
 from pathlib import Path
 from typing import ClassVar
 
 import pytest
 
 from dfolks.core.classfactory import WorkflowsRegistry
-from dfolks.core.execute import execute_job, execute_jobs, extract_job_yamls
+from dfolks.core.execute import (
+    build_job_graph,
+    execute_job,
+    execute_job_graph,
+    execute_jobs,
+    execute_jobs_concurrently,
+    extract_job_yamls,
+    run_job,
+)
+from dfolks.core.modules import ContextThreadPoolExecutor, start_thread
+
+logger = logging.getLogger("shared")
 
 
 class DummyWorkflow(WorkflowsRegistry):
@@ -118,3 +133,284 @@ def test_execute_jobs_executes_one_by_one_and_continues_after_failure(
 
     assert execute_jobs(jobs_path) is None
     assert executed_jobs == ["a_job.yaml", "b_job.yaml", "c_job.yaml"]
+
+
+def test_run_job_collects_exception(tmp_path, monkeypatch):
+    def fake_execute_job(job_path):
+        raise ValueError("invalid job")
+
+    monkeypatch.setattr("dfolks.core.execute.execute_job", fake_execute_job)
+
+    job_result = run_job(tmp_path / "job.yaml", log_dir=tmp_path / "logs")
+
+    assert job_result.status == "failed"
+    assert "invalid job" in job_result.error
+    assert job_result.log_path == tmp_path / "logs" / "job.log"
+    assert "invalid job" in job_result.log_path.read_text(encoding="utf-8")
+
+
+def test_execute_jobs_concurrently_with_thread_pool(tmp_path, monkeypatch):
+    job_paths = [tmp_path / f"{name}.yaml" for name in ["a_job", "b_job", "c_job"]]
+    barrier = threading.Barrier(len(job_paths), timeout=5)
+
+    def fake_execute_job(job_path):
+        logger.info(f"Running {Path(job_path).stem}")
+        # All jobs should be running at the same time.
+        barrier.wait()
+        if Path(job_path).stem == "b_job":
+            raise ValueError("invalid job")
+        return Path(job_path).stem
+
+    monkeypatch.setattr("dfolks.core.execute.execute_job", fake_execute_job)
+    logger.setLevel(logging.INFO)
+
+    results = execute_jobs_concurrently(
+        job_paths, max_workers=3, pool="thread", log_dir=tmp_path / "logs"
+    )
+
+    assert [r.job_path for r in results] == job_paths
+    assert [r.status for r in results] == ["completed", "failed", "completed"]
+    assert [r.result for r in results] == ["a_job", None, "c_job"]
+
+    # Log files are isolated per job.
+    log_text = results[0].log_path.read_text(encoding="utf-8")
+    assert "Running a_job" in log_text
+    assert "Running c_job" not in log_text
+
+
+def test_job_log_includes_threads_of_the_job(tmp_path, monkeypatch):
+    job_paths = [tmp_path / f"{name}.yaml" for name in ["a_job", "b_job"]]
+    barrier = threading.Barrier(len(job_paths), timeout=5)
+
+    def fake_execute_job(job_path):
+        name = Path(job_path).stem
+        barrier.wait()
+        # Records of worker threads of a job are written to the log of the job.
+        with ContextThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(logger.info, f"Pool of {name}").result()
+        start_thread(lambda: logger.info(f"Thread of {name}")).join()
+        barrier.wait()
+
+    monkeypatch.setattr("dfolks.core.execute.execute_job", fake_execute_job)
+    logger.setLevel(logging.INFO)
+
+    results = execute_jobs_concurrently(
+        job_paths, max_workers=2, pool="thread", log_dir=tmp_path / "logs"
+    )
+
+    log_text = results[0].log_path.read_text(encoding="utf-8")
+    assert "Pool of a_job" in log_text
+    assert "Thread of a_job" in log_text
+    assert "b_job" not in log_text
+
+
+def test_execute_jobs_concurrently_with_process_pool(tmp_path):
+    job_path = tmp_path / "job.yaml"
+    job_path.write_text("kind: DummyWorkflow\nresult: complete\n", encoding="utf-8")
+
+    results = execute_jobs_concurrently([job_path], max_workers=2, pool="process")
+
+    assert results[0].status == "completed"
+    assert results[0].result == "complete"
+
+
+def test_execute_jobs_concurrently_raises_if_pool_not_supported(tmp_path):
+    with pytest.raises(ValueError):
+        execute_jobs_concurrently([], pool="unknown")
+
+
+def test_execute_jobs_with_max_workers(tmp_path, monkeypatch):
+    jobs_path = tmp_path / "jobs"
+    jobs_path.mkdir()
+    (jobs_path / "a_job.yaml").write_text("kind: FirstWorkflow\n", encoding="utf-8")
+    (jobs_path / "b_job.yaml").write_text("kind: FailedWorkflow\n", encoding="utf-8")
+
+    executed_jobs = []
+
+    def fake_execute_job(job_path):
+        executed_jobs.append(Path(job_path).name)
+        if Path(job_path).name == "b_job.yaml":
+            raise ValueError("invalid job")
+
+    monkeypatch.setattr("dfolks.core.execute.execute_job", fake_execute_job)
+
+    assert execute_jobs(jobs_path, max_workers=2, pool="thread") is None
+    assert sorted(executed_jobs) == ["a_job.yaml", "b_job.yaml"]
+
+
+def write_jobs(jobs_path, jobs):
+    jobs_path.mkdir(exist_ok=True)
+    job_paths = []
+    for name, job_yaml in jobs.items():
+        job_path = jobs_path / f"{name}.yaml"
+        job_path.write_text(job_yaml, encoding="utf-8")
+        job_paths.append(job_path)
+    return job_paths
+
+
+def test_build_job_graph_with_names_and_artifacts(tmp_path):
+    ingest_a, ingest_b, extract = write_jobs(
+        tmp_path / "jobs",
+        {
+            "ingest_a": "kind: A\ntarget_db: jquants\ntarget_path_stock: stock.csv\n",
+            "ingest_b": "kind: B\ntarget_path_fin_report: fin.csv\n",
+            "extract": "kind: C\ndepends_on:\n  - jquants/stock.csv\n  - ingest_b\n",
+        },
+    )
+
+    graph = build_job_graph([ingest_a, ingest_b, extract])
+
+    assert graph == {ingest_a: set(), ingest_b: set(), extract: {ingest_a, ingest_b}}
+
+
+def test_build_job_graph_waits_for_all_producers(tmp_path):
+    ingest_a, ingest_b, extract = write_jobs(
+        tmp_path / "jobs",
+        {
+            "ingest_a": "kind: A\ntarget_db: jquants\ntarget_path_stock: stock.csv\n",
+            "ingest_b": "kind: B\ntarget_db: jquants\ntarget_path_stock: stock.csv\n",
+            "jquants": "kind: C\ndepends_on: jquants/stock.csv\n",
+        },
+    )
+
+    graph = build_job_graph([ingest_a, ingest_b, extract])
+
+    assert graph[extract] == {ingest_a, ingest_b}
+
+
+def test_execute_job_graph_with_registered_workflow(tmp_path):
+    job_paths = write_jobs(
+        tmp_path / "jobs",
+        {
+            "a_job": "kind: DummyWorkflow\nresult: a\n",
+            "b_job": "kind: DummyWorkflow\nresult: b\ndepends_on: a_job\n",
+        },
+    )
+
+    results = execute_job_graph(job_paths)
+
+    assert [r.status for r in results] == ["completed", "completed"]
+    assert [r.result for r in results] == ["a", "b"]
+
+
+@pytest.mark.parametrize("runner", [execute_job_graph, execute_jobs_concurrently])
+def test_jobs_writing_same_artifact_run_one_at_a_time(tmp_path, monkeypatch, runner):
+    job_paths = write_jobs(
+        tmp_path / "jobs",
+        {
+            "a_ingest": "kind: A\ntarget_db: jquants\ntarget_path_stock: stock.csv\n",
+            "b_ingest": "kind: B\ntarget_db: jquants\ntarget_path_stock: stock.csv\n",
+            "c_ingest": "kind: C\ntarget_path_stock: other.csv\n",
+        },
+    )
+    lock = threading.Lock()
+    running = set()
+    overlaps = []
+    executed_jobs = []
+
+    def fake_execute_job(job_path):
+        name = Path(job_path).stem
+        with lock:
+            executed_jobs.append(name)
+            running.add(name)
+            overlaps.append({"a_ingest", "b_ingest"} <= running)
+        time.sleep(0.05)
+        with lock:
+            running.discard(name)
+
+    monkeypatch.setattr("dfolks.core.execute.execute_job", fake_execute_job)
+
+    results = runner(job_paths, max_workers=3, pool="thread")
+
+    assert [r.status for r in results] == ["completed"] * 3
+    assert not any(overlaps)
+    assert executed_jobs.index("a_ingest") < executed_jobs.index("b_ingest")
+
+
+def test_build_job_graph_collects_unknown_dependencies(tmp_path):
+    a, b = write_jobs(
+        tmp_path / "jobs",
+        {"a": "kind: A\ndepends_on: [missing, b]\n", "b": "kind: B\n"},
+    )
+    errors = {}
+
+    assert build_job_graph([a, b], errors) == {a: {b}, b: set()}
+    assert list(errors) == [a]
+    assert "missing" in errors[a]
+
+
+@pytest.mark.parametrize("max_workers, pool", [(1, "process"), (2, "thread")])
+def test_execute_job_graph_fails_job_with_unknown_dependency(
+    tmp_path, monkeypatch, max_workers, pool
+):
+    job_paths = write_jobs(
+        tmp_path / "jobs",
+        {
+            "a_typo": "kind: A\ndepends_on: b_ingset\n",
+            "b_ingest": "kind: B\n",
+            "c_report": "kind: C\ndepends_on: a_typo\n",
+        },
+    )
+    executed_jobs = []
+
+    def fake_execute_job(job_path):
+        executed_jobs.append(Path(job_path).stem)
+
+    monkeypatch.setattr("dfolks.core.execute.execute_job", fake_execute_job)
+
+    results = execute_job_graph(job_paths, max_workers=max_workers, pool=pool)
+
+    assert [r.status for r in results] == ["failed", "completed", "skipped"]
+    assert "b_ingset" in results[0].error
+    assert executed_jobs == ["b_ingest"]
+
+
+def test_execute_job_graph_raises_if_cycle(tmp_path):
+    job_paths = write_jobs(
+        tmp_path / "jobs",
+        {"a": "kind: A\ndepends_on: b\n", "b": "kind: B\ndepends_on: a\n"},
+    )
+
+    with pytest.raises(CycleError):
+        execute_job_graph(job_paths)
+
+
+@pytest.mark.parametrize("max_workers, pool", [(1, "process"), (3, "thread")])
+def test_execute_job_graph_runs_in_order_and_skips_downstream(
+    tmp_path, monkeypatch, max_workers, pool
+):
+    job_paths = write_jobs(
+        tmp_path / "jobs",
+        {
+            "a_extract": "kind: A\ndepends_on: [c_ingest, b_ingest]\n",
+            "b_ingest": "kind: B\n",
+            "c_ingest": "kind: C\n",
+            "d_report": "kind: D\ndepends_on: e_failed\n",
+            "e_failed": "kind: E\n",
+            "f_report": "kind: F\ndepends_on: d_report\n",
+        },
+    )
+    executed_jobs = []
+
+    def fake_execute_job(job_path):
+        executed_jobs.append(Path(job_path).stem)
+        if Path(job_path).stem == "e_failed":
+            raise ValueError("invalid job")
+        return Path(job_path).stem
+
+    monkeypatch.setattr("dfolks.core.execute.execute_job", fake_execute_job)
+
+    results = execute_job_graph(job_paths, max_workers=max_workers, pool=pool)
+    statuses = {r.job_path.stem: r.status for r in results}
+
+    assert statuses == {
+        "a_extract": "completed",
+        "b_ingest": "completed",
+        "c_ingest": "completed",
+        "d_report": "skipped",
+        "e_failed": "failed",
+        "f_report": "skipped",
+    }
+    assert executed_jobs.index("a_extract") > executed_jobs.index("b_ingest")
+    assert executed_jobs.index("a_extract") > executed_jobs.index("c_ingest")
+    assert "d_report" not in executed_jobs
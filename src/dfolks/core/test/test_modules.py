@@ -2,10 +2,15 @@
 
 import importlib
 import logging
+import os
 import pkgutil
 import sys
 
-from dfolks.core.modules import import_all_submodules, set_logger
+from dfolks.core.modules import (
+    import_all_submodules,
+    package_fingerprint,
+    set_logger,
+)
 
 
 def test_set_logger():
@@ -85,3 +90,18 @@ def test_import_all_submodules(monkeypatch):
         "dfolks.submodule1",
         "dfolks.submodule2",
     ]
+
+
+def test_package_fingerprint_changes_with_mtime(tmp_path, monkeypatch):
+    package_path = tmp_path / "fakepkg"
+    package_path.mkdir()
+    (package_path / "__init__.py").write_text("")
+    module_path = package_path / "module.py"
+    module_path.write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    fingerprint = package_fingerprint(packages=("fakepkg",))
+    assert fingerprint == package_fingerprint(packages=("fakepkg",))
+
+    os.utime(module_path, ns=(0, 0))
+    assert fingerprint != package_fingerprint(packages=("fakepkg",))
@@ -1,6 +1,9 @@
 """API calls to get data from EDINET.
 
 Referenece: https://disclosure2dl.edinet-fsa.go.jp/guide/static/disclosure/download/ESE140206.pdf
+All requests are sent within the rate limit of "edinet" (dfolks.data.ratelimit) and
+reused from the response cache (dfolks.data.httpcache) if it is enabled.
+Document lists of past dates never expire in the response cache.
 
 Need to do
 1) Add more loggers with HTTP status codes.
@@ -8,24 +11,67 @@ Need to do
 """
 
 import datetime
+import fnmatch
+import logging
 import os
-import time
+import queue
+import shutil
+import threading
 import zipfile
+from concurrent.futures import as_completed
+from functools import partial
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
 
+from dfolks.core.modules import ContextThreadPoolExecutor
+from dfolks.data.httpcache import __url_ttl__, cached_get
+from dfolks.data.ratelimit import get_rate_limiter
+
 # Define the path to the .env file
 env_path = Path(__file__).resolve().parents[3] / "env" / ".env"
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path=env_path)
 
+# Set up shared logger
+logger = logging.getLogger("shared")
+
+# Time zone of submission dates of EDINET.
+__edinet_tz__ = ZoneInfo("Asia/Tokyo")
+# Chunk size in bytes to write a downloaded document.
+__chunk_size__ = 1024 * 1024
+# Members of a document Zip file needed to parse XBRL; instance and its taxonomy files.
+# PDFs, HTMLs (inline XBRL), images and audit documents are not extracted.
+__xbrl_members__ = [
+    "XBRL/PublicDoc/*.xbrl",
+    "XBRL/PublicDoc/*.xsd",
+    "XBRL/PublicDoc/*.xml",
+]
+
+
+def _get(
+    url: str, session: Optional[requests.Session] = None, ttl=__url_ttl__, **kwargs
+) -> requests.Response:
+    """Send a GET request within the rate limit of EDINET and retry transient failures.
+
+    Responses are reused from the response cache if it is enabled.
+    session: Session to reuse connections; a new connection per request if None.
+    ttl: TTL of the response in the response cache; TTL of URL if omitted.
+    """
+    fetch = partial(get_rate_limiter("edinet").call, (session or requests).get)
+    return cached_get(fetch, url, ttl=ttl, **kwargs)
 
-def get_edinet_document_list(date) -> pd.DataFrame:
-    """Get a list of EDINET documents submitted on a specific date."""
+
+def get_edinet_document_list(date, session=None) -> pd.DataFrame:
+    """Get a list of EDINET documents submitted on a specific date.
+
+    session: requests.Session to reuse connections; a new connection if None.
+    """
     # Load the EDINET API token from environment variables
     edinet_api_token = os.getenv("EDINET_API_TOKEN")
     if not edinet_api_token:
@@ -45,8 +91,12 @@ def get_edinet_document_list(date) -> pd.DataFrame:
         "Subscription-Key": edinet_api_token,
     }
 
+    # A list of a past date in JST is not updated; never expires in the response cache.
+    today = datetime.datetime.now(__edinet_tz__).strftime("%Y-%m-%d")
+    ttl = None if str(date_str)[:10] < today else __url_ttl__
+
     # Make the GET request to the EDINET API
-    response = requests.get(url, params=params)
+    response = _get(url, session=session, ttl=ttl, params=params)
 
     # Check if the request was successful
     if response.status_code != 200:
@@ -61,8 +111,42 @@ def get_edinet_document_list(date) -> pd.DataFrame:
     return df
 
 
-def get_edinet_document(doc_id) -> requests.Response:
-    """Get EDINET document by document ID."""
+def iter_edinet_document_lists(
+    dates: Iterable, max_workers: int = 4
+) -> Iterator[Tuple[object, pd.DataFrame]]:
+    """Get lists of EDINET documents of dates concurrently; yield (date, list) as fetched.
+
+    Lists are fetched by max_workers threads within the rate limit of "edinet",
+    thus documents of the first fetched dates can be processed while others are fetched.
+    Each thread reuses connections by its own session. Errors are raised when yielded.
+    """
+    local = threading.local()
+    sessions = []
+
+    def fetch(date):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            sessions.append(local.session)
+        return get_edinet_document_list(date=date, session=local.session)
+
+    executor = ContextThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(fetch, date): date for date in dates}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # Stop fetching if an error is raised or the iterator is closed.
+        executor.shutdown(wait=True, cancel_futures=True)
+        for session in sessions:
+            session.close()
+
+
+def get_edinet_document(doc_id, headers=None, stream=False) -> requests.Response:
+    """Get EDINET document by document ID.
+
+    headers: e.g. Range to resume a partial download.
+    stream: Stream the content by iter_content instead of loading it at once.
+    """
     # Load the EDINET API token from environment variables
     edinet_api_token = os.getenv("EDINET_API_TOKEN")
 
@@ -77,50 +161,261 @@ def get_edinet_document(doc_id) -> requests.Response:
     }
 
     # Make the GET request to the EDINET API
-    response = requests.get(url, params=params)
+    if headers is None and not stream:
+        response = _get(url, params=params)
+    # Streamed and partial bodies are written by callers as they arrive; not cached.
+    else:
+        response = get_rate_limiter("edinet").call(
+            requests.get, url, params=params, headers=headers, stream=stream
+        )
 
     return response
 
 
-def download_edinet_document(doc_id, folder_path) -> None:
-    """Download EDINET XBRL file as a Zip file."""
+def download_edinet_document(doc_id, folder_path, chunk_size=__chunk_size__) -> None:
+    """Download EDINET XBRL file as a Zip file.
+
+    Content is written to <doc_id>.zip.part and renamed to <doc_id>.zip when completed;
+    a partial download is resumed by a Range request, or downloaded again if the range
+    is not satisfiable.
+    """
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
 
-    response = get_edinet_document(doc_id=doc_id)
-
-    # If the request was successful, save the content to a file
-    if response.status_code == 200:
-        with open(os.path.join(folder_path, f"{doc_id}.zip"), "wb") as f:
-            for chunk in response.iter_content(chunk_size=1024):
-                f.write(chunk)
-    # If the request was not successful, raise an exception
-    elif response.status_code != 200:
-        raise Exception(f"Error fetching data from EDINET API: {response.status_code}")
+    zip_path = os.path.join(folder_path, f"{doc_id}.zip")
+    part_path = f"{zip_path}.part"
 
-
-def download_edinet_documents(doc_list, folder_path) -> None:
-    """Download multiple EDINET XBRL files as Zip files."""
+    # Resume a partial download if any.
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset:
+        logger.info(f"Resuming download of {doc_id} from {offset} bytes.")
+        response = get_edinet_document(
+            doc_id=doc_id, headers={"Range": f"bytes={offset}-"}, stream=True
+        )
+    else:
+        response = get_edinet_document(doc_id=doc_id, stream=True)
+
+    # 416: the partial download is already complete or no longer matches the document;
+    # download the whole document again.
+    if offset and response.status_code == 416:
+        response.close()
+        logger.warning(f"Range of {doc_id} is not satisfiable; downloading it again.")
+        os.remove(part_path)
+        response = get_edinet_document(doc_id=doc_id, stream=True)
+
+    # The connection is released even if writing the content fails.
+    with response:
+        # If the request was successful, save the content to a file
+        # 206: rest of a partial download, 200: whole content.
+        if response.status_code in (200, 206):
+            mode = "ab" if response.status_code == 206 else "wb"
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+            os.replace(part_path, zip_path)
+        # If the request was not successful, raise an exception
+        else:
+            raise Exception(
+                f"Error fetching data from EDINET API: {response.status_code}"
+            )
+
+
+def _download_and_unzip(
+    doc_id, folder_path, unzip_executor, remove_zip=True, members=None
+):
+    """Download a document and submit unzipping it; return a future of unzipping."""
+    zip_path = os.path.join(folder_path, f"{doc_id}.zip")
+    # Skip downloading if a zip file was downloaded but not unzipped.
+    if not os.path.exists(zip_path):
+        download_edinet_document(doc_id=doc_id, folder_path=folder_path)
+
+    return unzip_executor.submit(
+        unzip_file,
+        file_name=doc_id,
+        folder_path=folder_path,
+        remove_zip=remove_zip,
+        members=members,
+    )
+
+
+def iter_edinet_documents(
+    doc_list: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    folder_path,
+    max_workers=4,
+    unzip_workers=2,
+    remove_zip=True,
+    members=None,
+    max_pending=None,
+) -> Iterator[Tuple[str, Optional[Exception]]]:
+    """Download and unzip EDINET documents; yield (docID, error) as each is unzipped.
+
+    Documents are downloaded concurrently by max_workers threads within the rate limit
+    of "edinet" and unzipped by unzip_workers threads. A document is unzipped into
+    folder_path/docID; documents already unzipped are yielded without downloading.
+    error is None if the document was downloaded and unzipped.
+
+    doc_list: Documents with docID, or an iterable of them; e.g. lists of dates yielded
+        while they are fetched. Documents are downloaded as soon as their list is yielded.
+    members: Patterns of members to extract; e.g. __xbrl_members__. None for all.
+    max_pending: Documents downloaded but not processed by the caller yet.
+        None for no limit. A document is processed when the next one is requested,
+        thus disk usage is bounded if the caller removes each document before that.
+    """
     # Create the folder if it doesn't exist
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
 
-    # Iterate over the document list and download each documents
-    for _, doc in doc_list.iterrows():
-        download_edinet_document(doc_id=doc["docID"], folder_path=folder_path)
-        unzip_file(file_name=doc["docID"], folder_path=folder_path, remove_zip=True)
-        time.sleep(1)
-
-
-def unzip_file(file_name, folder_path, remove_zip=False) -> None:
-    """Unzip EDINET XBRL Zip file."""
-    # Create the folder if it doesn't exist
-    if not os.path.exists(os.path.join(folder_path, file_name)):
-        os.makedirs(os.path.join(folder_path, file_name))
-
-    # Unzip the file
+    if isinstance(doc_list, pd.DataFrame):
+        doc_list = [doc_list]
+    doc_ids = (doc_id for docs in doc_list for doc_id in docs["docID"])
+
+    # Documents unzipped or failed; put by callbacks of download and unzip threads.
+    done = queue.Queue()
+
+    def unzipped(doc_id, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed to unzip {doc_id}: {error}")
+        done.put((doc_id, error))
+
+    def downloaded(doc_id, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed to download {doc_id}: {error}")
+            done.put((doc_id, error))
+        else:
+            future.result().add_done_callback(partial(unzipped, doc_id))
+
+    unzip_executor = ContextThreadPoolExecutor(max_workers=unzip_workers)
+    download_executor = ContextThreadPoolExecutor(max_workers=max_workers)
+    listed = set()
+    n_downloads = 0
+    n_pending = 0
+    exhausted = False
+    try:
+        while True:
+            # Submit documents until max_pending documents are not processed.
+            while not exhausted and (max_pending is None or n_pending < max_pending):
+                doc_id = next(doc_ids, None)
+                if doc_id is None:
+                    exhausted = True
+                    break
+                if doc_id in listed:
+                    continue
+                listed.add(doc_id)
+                n_pending += 1
+
+                # Skip downloading documents which are already unzipped.
+                if os.path.isdir(os.path.join(folder_path, doc_id)):
+                    done.put((doc_id, None))
+                    continue
+                future = download_executor.submit(
+                    _download_and_unzip,
+                    doc_id,
+                    folder_path,
+                    unzip_executor,
+                    remove_zip,
+                    members,
+                )
+                future.add_done_callback(partial(downloaded, doc_id))
+                n_downloads += 1
+
+            if n_pending == 0:
+                break
+            doc_id, error = done.get()
+            n_pending -= 1
+            yield doc_id, error
+    finally:
+        # Stop downloading if an error is raised or the iterator is closed.
+        download_executor.shutdown(wait=True, cancel_futures=True)
+        unzip_executor.shutdown(wait=True, cancel_futures=True)
+
+    logger.info(
+        f"Downloaded {n_downloads} documents; "
+        f"{len(listed) - n_downloads} already downloaded."
+    )
+
+
+def download_edinet_documents(
+    doc_list: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    folder_path,
+    max_workers=4,
+    unzip_workers=2,
+    remove_zip=True,
+    members=None,
+) -> None:
+    """Download multiple EDINET XBRL files as Zip files and unzip them.
+
+    Documents are downloaded concurrently by max_workers threads within the rate limit
+    of "edinet" and unzipped by unzip_workers threads while other documents are downloaded.
+    Documents already unzipped in folder_path are skipped, thus a failed run is resumed
+    by running it again. Errors are raised after all other documents are processed.
+
+    doc_list: Documents with docID, or an iterable of them; e.g. lists of dates yielded
+        while they are fetched. Documents are downloaded as soon as their list is yielded.
+    members: Patterns of members to extract; e.g. __xbrl_members__. None for all.
+    """
+    errors = {}
+    for doc_id, error in iter_edinet_documents(
+        doc_list,
+        folder_path,
+        max_workers=max_workers,
+        unzip_workers=unzip_workers,
+        remove_zip=remove_zip,
+        members=members,
+    ):
+        if error is not None:
+            errors[doc_id] = error
+
+    if errors:
+        raise Exception(f"Failed to download {len(errors)} documents: {list(errors)}")
+
+
+def select_zip_members(
+    names: List[str], members: Optional[List[str]] = None
+) -> List[str]:
+    """Return names of Zip members matching any of patterns; all names if None."""
+    if members is None:
+        return list(names)
+
+    return [
+        name
+        for name in names
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in members)
+    ]
+
+
+def unzip_file(file_name, folder_path, remove_zip=False, members=None) -> None:
+    """Unzip EDINET XBRL Zip file.
+
+    Files are extracted to a temporary folder and renamed to file_name when completed,
+    thus file_name folder exists only if all files were extracted.
+
+    members: Patterns of members to extract; e.g. __xbrl_members__. None for all.
+    """
+    target_path = os.path.join(folder_path, file_name)
+    temp_path = f"{target_path}.tmp"
+    shutil.rmtree(temp_path, ignore_errors=True)
+
+    # Unzip the file; only selected members are written to disk.
     with zipfile.ZipFile(os.path.join(folder_path, f"{file_name}.zip"), "r") as zip_ref:
-        zip_ref.extractall(os.path.join(folder_path, file_name))
+        names = select_zip_members(zip_ref.namelist(), members)
+        if members is not None:
+            logger.debug(
+                f"Extracting {len(names)} of {len(zip_ref.namelist())} files "
+                f"from {file_name}.zip."
+            )
+        zip_ref.extractall(temp_path, members=names)
+        # Create the folder even if no members matched.
+        os.makedirs(temp_path, exist_ok=True)
+
+    # Replace the folder if it exists.
+    shutil.rmtree(target_path, ignore_errors=True)
+    os.replace(temp_path, target_path)
 
     # Remove the zip file if specified
     if remove_zip:
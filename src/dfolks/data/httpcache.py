@@ -0,0 +1,345 @@
+"""On-disk cache of HTTP responses of remote APIs.
+
+1) ResponseCacheConfig: variables of the response cache defined in job YAMLs.
+2) ResponseCache: cache of GET responses keyed by URL and params.
+3) get_response_cache/set_response_cache: response cache shared by API calls.
+
+Responses are stored below Home directory/DataHive/cache by default.
+Each endpoint has a TTL; expired responses with ETag or Last-Modified are revalidated
+with a conditional request and reused on 304 Not Modified.
+A caller may override TTL of a request; e.g. document lists of past dates never expire.
+Streamed (stream=True) and partial (Range header) requests are not cached; their bodies
+are written by callers as they arrive, e.g. EDINET documents.
+Least recently used responses are evicted when the cache exceeds max_size_mb.
+
+The cache is disabled unless set_response_cache is called (e.g. "cache" of a job YAML)
+or DFOLKS_HTTP_CACHE is set; "1" for the default folder or a folder path.
+
+Need to do
+0) Documentation.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from pydantic import BaseModel, Field
+from requests.structures import CaseInsensitiveDict
+
+# Set up shared logger
+logger = logging.getLogger("shared")
+
+# Default folder of the response cache.
+__cache_dir__ = Path.joinpath(Path.home(), "DataHive", "cache")
+# Environment variable to enable the response cache.
+__cache_env__ = "DFOLKS_HTTP_CACHE"
+# Default TTLs in seconds by a part of URL; None never expires.
+__default_ttls__ = {
+    # EDINET documents are immutable, document lists of a date may be updated.
+    "/documents/": None,
+    "/documents.json": 3600.0,
+    # J-Quants listed corporations are updated daily.
+    "/equities/master": 86400.0,
+}
+# Params excluded from cache keys and metadata; e.g. API keys.
+__secret_params__ = {"Subscription-Key"}
+# Response headers stored with a cached response.
+__cached_headers__ = ["Content-Type", "ETag", "Last-Modified"]
+
+# Sentinel of get to use TTL of URL.
+__url_ttl__ = object()
+
+# Response cache shared by API calls; False until configured.
+__response_cache__ = False
+__response_cache_lock__ = threading.Lock()
+
+
+class ResponseCacheConfig(BaseModel):
+    """Variables of the response cache.
+
+    Variables
+    ----------
+    cache_dir: Folder of the cache. None for Home directory/DataHive/cache.
+        Optional[str] = None
+    default_ttl: Seconds until a response expires. None never expires.
+        Optional[float] = 86400.0
+    ttls: Seconds until a response expires by a part of URL; the longest match is used.
+        Dict[str, Optional[float]] = {}; added to __default_ttls__.
+    max_size_mb: Maximum size of the cache in MB.
+        float = 1024.0
+    ----------
+    """
+
+    cache_dir: Optional[str] = None
+    default_ttl: Optional[float] = Field(default=86400.0, ge=0)
+    ttls: Dict[str, Optional[float]] = {}
+    max_size_mb: float = Field(default=1024.0, gt=0)
+
+
+class ResponseCache:
+    """On-disk cache of GET responses.
+
+    A response is stored as <key>.body and <key>.json (metadata) where key is a hash of
+    URL and params. Only responses with status code 200 are stored.
+
+    Key methods
+    ----------
+    get: Return a cached response or fetch and store it.
+    ttl: Return TTL of a URL.
+    clear: Remove all cached responses.
+    ----------
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        default_ttl: Optional[float] = 86400.0,
+        ttls: Optional[Dict[str, Optional[float]]] = None,
+        max_size_mb: float = 1024.0,
+    ):
+        """Initialize class; validated by ResponseCacheConfig."""
+        config = ResponseCacheConfig(
+            cache_dir=cache_dir,
+            default_ttl=default_ttl,
+            ttls=ttls or {},
+            max_size_mb=max_size_mb,
+        )
+        self.cache_dir = Path(config.cache_dir) if config.cache_dir else __cache_dir__
+        self.default_ttl = config.default_ttl
+        self.ttls = {**__default_ttls__, **config.ttls}
+        self.max_size = int(config.max_size_mb * 1024 * 1024)
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict] = None) -> str:
+        """Return a cache key of URL and params."""
+        params = {
+            k: str(v)
+            for k, v in (params or {}).items()
+            if k not in __secret_params__ and v is not None
+        }
+        raw = json.dumps([url, sorted(params.items())], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str):
+        """Return paths of the body and metadata of a key."""
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.body", folder / f"{key}.json"
+
+    def ttl(self, url: str) -> Optional[float]:
+        """Return TTL of a URL; the longest matching part of URL in ttls."""
+        matches = [part for part in self.ttls if part in url]
+        if not matches:
+            return self.default_ttl
+        return self.ttls[max(matches, key=len)]
+
+    def _read(self, key: str) -> Optional[Dict]:
+        """Read metadata of a key; None if not cached."""
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if not body_path.exists():
+                return None
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def _response(self, key: str, meta: Dict) -> requests.Response:
+        """Build a response from a cached body and metadata."""
+        body_path, meta_path = self._paths(key)
+        response = requests.Response()
+        response.status_code = meta["status_code"]
+        response.url = meta["url"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response._content = body_path.read_bytes()
+        response._content_consumed = True
+        response.encoding = meta.get("encoding")
+        response.from_cache = True
+
+        # Touch for LRU eviction.
+        now = time.time()
+        os.utime(meta_path, (now, now))
+
+        return response
+
+    def _write(self, key: str, url: str, params: Optional[Dict], response) -> None:
+        """Store a response."""
+        body_path, meta_path = self._paths(key)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        content = response.content
+        meta = {
+            "url": url,
+            "params": {
+                k: str(v)
+                for k, v in (params or {}).items()
+                if k not in __secret_params__
+            },
+            "status_code": response.status_code,
+            "headers": {
+                h: response.headers[h]
+                for h in __cached_headers__
+                if h in response.headers
+            },
+            "encoding": response.encoding,
+            "created": time.time(),
+        }
+
+        # Write to temporary files first; readers never see partial files.
+        tmp_body = body_path.with_suffix(f".body.{os.getpid()}.tmp")
+        tmp_meta = meta_path.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp_body.write_bytes(content)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_body, body_path)
+        os.replace(tmp_meta, meta_path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(content)
+        self._evict()
+
+    def _refresh(self, key: str, meta: Dict) -> None:
+        """Restart TTL of a cached response after 304 Not Modified."""
+        _, meta_path = self._paths(key)
+        meta["created"] = time.time()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def _evict(self) -> None:
+        """Remove least recently used responses until the cache fits max_size."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(
+                    p.stat().st_size for p in self.cache_dir.glob("*/*.body")
+                )
+            if self._size <= self.max_size:
+                return
+
+            entries = []
+            for meta_path in self.cache_dir.glob("*/*.json"):
+                body_path = meta_path.with_suffix(".body")
+                try:
+                    size = body_path.stat().st_size
+                    entries.append((meta_path.stat().st_mtime, size, meta_path))
+                except OSError:
+                    continue
+
+            # Evict down to 90% of max_size not to evict at every write.
+            for _, size, meta_path in sorted(entries):
+                if self._size <= self.max_size * 0.9:
+                    break
+                meta_path.unlink(missing_ok=True)
+                meta_path.with_suffix(".body").unlink(missing_ok=True)
+                self._size -= size
+            logger.info(f"Response cache evicted down to {self._size} bytes.")
+
+    def get(
+        self, fetch: Callable, url: str, ttl: Any = __url_ttl__, **kwargs
+    ) -> requests.Response:
+        """Return a cached response of URL and params or fetch and store it.
+
+        fetch: Function to send a GET request; e.g. requests.get.
+        ttl: Seconds until the response expires, None never expires; TTL of URL if omitted.
+        kwargs: Keyword arguments of fetch; params are a part of the cache key.
+            Streamed and partial requests are sent as is without the cache.
+        """
+        if kwargs.get("stream") or "Range" in CaseInsensitiveDict(
+            kwargs.get("headers") or {}
+        ):
+            return fetch(url, **kwargs)
+
+        params = kwargs.get("params")
+        key = self.key(url, params)
+        meta = self._read(key)
+
+        if meta is not None:
+            if ttl is __url_ttl__:
+                ttl = self.ttl(url)
+            if ttl is None or time.time() - meta["created"] < ttl:
+                logger.debug(f"Response cache hit: {url}")
+                return self._response(key, meta)
+
+            # Revalidate an expired response if validators are available.
+            conditional = {}
+            if "ETag" in meta["headers"]:
+                conditional["If-None-Match"] = meta["headers"]["ETag"]
+            if "Last-Modified" in meta["headers"]:
+                conditional["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+            if conditional:
+                kwargs["headers"] = {**(kwargs.get("headers") or {}), **conditional}
+
+        response = fetch(url, **kwargs)
+
+        if meta is not None and response.status_code == 304:
+            logger.debug(f"Response cache revalidated: {url}")
+            self._refresh(key, meta)
+            return self._response(key, meta)
+        if response.status_code == 200:
+            self._write(key, url, params, response)
+
+        return response
+
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        with self._lock:
+            for path in self.cache_dir.glob("*/*"):
+                path.unlink(missing_ok=True)
+            self._size = 0
+
+
+def set_response_cache(config: Optional[Dict] = None) -> ResponseCache:
+    """Enable the response cache with variables of ResponseCacheConfig."""
+    global __response_cache__
+
+    with __response_cache_lock__:
+        __response_cache__ = ResponseCache(**(config or {}))
+    logger.info(f"Response cache enabled: {__response_cache__.cache_dir}")
+
+    return __response_cache__
+
+
+def disable_response_cache() -> None:
+    """Disable the response cache."""
+    global __response_cache__
+
+    with __response_cache_lock__:
+        __response_cache__ = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the response cache; None if disabled."""
+    global __response_cache__
+
+    with __response_cache_lock__:
+        if __response_cache__ is False:
+            value = os.getenv(__cache_env__)
+            if not value or value.lower() in ("0", "false"):
+                __response_cache__ = None
+            elif value.lower() in ("1", "true"):
+                __response_cache__ = ResponseCache()
+            else:
+                __response_cache__ = ResponseCache(cache_dir=value)
+
+        return __response_cache__
+
+
+def cached_get(
+    fetch: Callable, url: str, ttl: Any = __url_ttl__, **kwargs
+) -> requests.Response:
+    """Send a GET request through the response cache if it is enabled.
+
+    ttl: Seconds until the response expires, None never expires; TTL of URL if omitted.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return fetch(url, **kwargs)
+
+    return cache.get(fetch, url, ttl=ttl, **kwargs)
@@ -2,17 +2,35 @@
 Updated v1 to v2 on 2026-01-25.
 Ref: https://jpx-jquants.com/ja/spec
 
+All requests are sent within the rate limit of "jquants" (dfolks.data.ratelimit) and
+transient failures are retried. JQuantsAsyncClient sends many requests concurrently
+through one connection pool.
+Responses are reused from the response cache (dfolks.data.httpcache) if it is enabled.
+Responses are paginated; iter_* functions yield pages as they arrive and get_* functions
+combine all pages into one DataFrame.
+
 Need to do
 0) Add more api calls.
 1) Add loggers with HTTP status codes.
 """
 
+import asyncio
 import os
+import queue
+import threading
+from functools import partial
 from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from dfolks.core.modules import start_thread
+from dfolks.data.httpcache import cached_get, get_response_cache
+from dfolks.data.ratelimit import RateLimiter, get_rate_limiter
+from dfolks.utils.utils import run_coroutine
 
 # Define the path to the .env file
 env_path = Path(__file__).resolve().parents[3] / "env" / ".env"
@@ -20,6 +38,80 @@ env_path = Path(__file__).resolve().parents[3] / "env" / ".env"
 # Load environment variables from .env file
 load_dotenv(dotenv_path=env_path)
 
+# Base URL of J-Quants API v2.
+__jquants_api_url__ = "https://api.jquants.com/v2"
+# Rate limits of J-Quants API v2 plans; 5, 60, 120 and 500 requests per minute.
+__jquants_rate_limits__ = {
+    "free": {"requests_per_second": 5 / 60, "burst": 1},
+    "light": {"requests_per_second": 1.0, "burst": 1},
+    "standard": {"requests_per_second": 2.0, "burst": 2},
+    "premium": {"requests_per_second": 500 / 60, "burst": 8},
+}
+# Sentinel of the end of pages streamed from a background thread.
+__end_of_pages__ = object()
+
+
+def _get(url: str, **kwargs) -> requests.Response:
+    """Send a GET request within the rate limit of J-Quants and retry transient failures.
+
+    Responses are reused from the response cache if it is enabled.
+    """
+    fetch = partial(get_rate_limiter("jquants").call, requests.get)
+    return cached_get(fetch, url, **kwargs)
+
+
+def jquants_rate_limit(rate_limit: Union[str, Dict, None]) -> Optional[Dict]:
+    """Return the rate limit of a J-Quants plan, e.g. "standard"; a dict is returned as is."""
+    if not isinstance(rate_limit, str):
+        return rate_limit
+    if rate_limit not in __jquants_rate_limits__:
+        raise ValueError(
+            f"Unsupported J-Quants plan '{rate_limit}'. "
+            f"Choose from {list(__jquants_rate_limits__)} or define a rate limit."
+        )
+    return __jquants_rate_limits__[rate_limit]
+
+
+def _concat_pages(pages: List[pd.DataFrame]) -> pd.DataFrame:
+    """Combine pages into one DataFrame, ignoring empty pages."""
+    pages = [page for page in pages if not page.empty]
+    if len(pages) == 0:
+        return pd.DataFrame()
+    return pd.concat(pages, ignore_index=True)
+
+
+def _iter_pages(
+    url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None
+) -> Iterator[pd.DataFrame]:
+    """Yield pages of a J-Quants response as DataFrames, following pagination keys."""
+    params = dict(params or {})
+
+    while True:
+        r = _get(url, params=params, headers=headers)
+        r.raise_for_status()
+        body = r.json()
+        yield pd.DataFrame(body.get("data"))
+
+        # Follow a pagination key until the last page.
+        if not body.get("pagination_key"):
+            break
+        params["pagination_key"] = body["pagination_key"]
+
+
+def iter_jquants_pages_v2(
+    api_key: str, endpoint: str, params: Optional[Dict] = None
+) -> Iterator[pd.DataFrame]:
+    """Yield pages of J-Quants data of an endpoint as they arrive.
+
+    endpoint: e.g. "fins/summary" or "equities/bars/daily".
+    """
+    if api_key is None:
+        raise ValueError("API key is required to use J-Quants API v2.")
+
+    yield from _iter_pages(
+        f"{__jquants_api_url__}/{endpoint}", params, headers={"x-api-key": api_key}
+    )
+
 
 def get_jquants_api_key_v2() -> str:
     """Get J-Quants API key from environment variables."""
@@ -39,9 +131,9 @@ def get_jquants_corporate_list_v2(api_key: str) -> list:
         raise ValueError("API key is required to use J-Quants API v2.")
 
     headers = {"x-api-key": api_key}
-    r = requests.get("https://api.jquants.com/v2/equities/master", headers=headers)
+    pages = _iter_pages(f"{__jquants_api_url__}/equities/master", headers=headers)
 
-    df = pd.DataFrame(r.json().get("data"))
+    df = _concat_pages(list(pages))
 
     return df
 
@@ -60,20 +152,20 @@ def get_jquants_fin_report_v2(
     headers = {"x-api-key": api_key}
     # API call based on given parameters
     if code is None and date is not None:
-        r = requests.get(
-            "https://api.jquants.com/v2/fins/summary",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/fins/summary",
             params={"date": date},
             headers=headers,
         )
     elif code is not None and date is None:
-        r = requests.get(
-            "https://api.jquants.com/v2/fins/summary",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/fins/summary",
             params={"code": code},
             headers=headers,
         )
     elif code is not None and date is not None:
-        r = requests.get(
-            "https://api.jquants.com/v2/fins/summary",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/fins/summary",
             params={"code": code, "date": date},
             headers=headers,
         )
@@ -82,7 +174,7 @@ def get_jquants_fin_report_v2(
             "Process was not properly handled; check whether code and date are correct values and type."
         )
 
-    df = pd.DataFrame(r.json()["data"])
+    df = _concat_pages(list(pages))
 
     return df
 
@@ -113,31 +205,31 @@ def get_jquants_stock_price_v2(
     headers = {"x-api-key": api_key}
     # API call based on given parameters
     if code is not None and date is not None:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/bars/daily",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/bars/daily",
             params={"code": code, "date": date},
             headers=headers,
         )
     elif code is not None and date_from and date_to:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/bars/daily",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/bars/daily",
             params={"code": code, "from": date_from, "to": date_to},
             headers=headers,
         )
     elif code is None and date is not None:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/bars/daily",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/bars/daily",
             params={"date": date},
             headers=headers,
         )
     else:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/bars/daily",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/bars/daily",
             params={"code": code},
             headers=headers,
         )
 
-    df = pd.DataFrame(r.json()["data"])
+    df = _concat_pages(list(pages))
 
     return df
 
@@ -155,29 +247,237 @@ def get_jquants_industry_report_v2(
     headers = {"x-api-key": api_key}
     # API call based on given parameters
     if section is not None and date_from is not None and date_to is not None:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/investor-types",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/investor-types",
             params={"section": section, "from": date_from, "to": date_to},
             headers=headers,
         )
     elif section is not None and date_from is None and date_to is None:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/investor-types",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/investor-types",
             params={"section": section},
             headers=headers,
         )
     elif section is None and date_from is not None and date_to is not None:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/investor-types",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/investor-types",
             params={"from": date_from, "to": date_to},
             headers=headers,
         )
     else:
-        r = requests.get(
-            "https://api.jquants.com/v2/equities/investor-types",
+        pages = _iter_pages(
+            f"{__jquants_api_url__}/equities/investor-types",
             headers=headers,
         )
 
-    df = pd.DataFrame(r.json().get("data"))
+    df = _concat_pages(list(pages))
 
     return df
+
+
+def filter_jquants_codes(df: pd.DataFrame, codes: List[str]) -> pd.DataFrame:
+    """Filter data of all corporations by codes; 4-digit codes match 5-digit codes ending 0."""
+    if df.empty:
+        return df
+
+    codes = {str(code) for code in codes}
+    codes |= {code + "0" for code in codes if len(code) == 4}
+
+    return df[df["Code"].astype(str).isin(codes)].reset_index(drop=True)
+
+
+class JQuantsAsyncClient:
+    """asyncio client for J-Quants API v2.
+
+    All requests share one connection pool; a requests.Session is run in worker threads.
+    Concurrent requests are bounded by max_concurrency and the rate limiter of "jquants".
+    Pagination keys are followed and pages are combined into one DataFrame.
+
+    Key methods
+    ----------
+    iter_pages: Yield pages of an endpoint as they arrive.
+    get: Get data of an endpoint, e.g. "fins/summary" or "equities/bars/daily".
+    get_many: Get data of an endpoint for multiple parameters concurrently.
+    close: Close the connection pool.
+    ----------
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = 8,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        """Initialize class."""
+        if api_key is None:
+            raise ValueError("API key is required to use J-Quants API v2.")
+
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or get_rate_limiter("jquants")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Share one connection pool for all requests.
+        self.session = requests.Session()
+        self.session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency),
+        )
+        self.session.headers.update({"x-api-key": api_key})
+
+    def __enter__(self) -> "JQuantsAsyncClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection pool."""
+        self.session.close()
+
+    async def _request(self, endpoint: str, params: Dict) -> Dict:
+        """Send a request within the concurrency and rate limits."""
+        url = f"{__jquants_api_url__}/{endpoint}"
+        cache = get_response_cache()
+        async with self._semaphore:
+            if cache is None:
+                r = await self.rate_limiter.call_async(
+                    self.session.get, url, params=params
+                )
+            else:
+                fetch = partial(self.rate_limiter.call, self.session.get)
+                r = await asyncio.to_thread(cache.get, fetch, url, params=params)
+
+        r.raise_for_status()
+
+        return r.json()
+
+    async def iter_pages(
+        self, endpoint: str, params: Optional[Dict] = None
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Yield pages of an endpoint as they arrive, following pagination keys."""
+        params = dict(params or {})
+
+        while True:
+            body = await self._request(endpoint, params)
+            yield pd.DataFrame(body.get("data"))
+
+            # Follow a pagination key until the last page.
+            if not body.get("pagination_key"):
+                break
+            params["pagination_key"] = body["pagination_key"]
+
+    async def get(self, endpoint: str, params: Optional[Dict] = None) -> pd.DataFrame:
+        """Get all pages of an endpoint as a DataFrame."""
+        return _concat_pages([page async for page in self.iter_pages(endpoint, params)])
+
+    async def get_many(
+        self, endpoint: str, params_list: List[Dict]
+    ) -> List[pd.DataFrame]:
+        """Get data of an endpoint for each parameters concurrently, in the same order."""
+        return await asyncio.gather(
+            *(self.get(endpoint, params) for params in params_list)
+        )
+
+
+def get_jquants_many_v2(
+    api_key: str,
+    endpoint: str,
+    params_list: List[Dict],
+    max_concurrency: int = 8,
+) -> pd.DataFrame:
+    """Get J-Quants data of an endpoint for multiple parameters concurrently."""
+    with JQuantsAsyncClient(api_key, max_concurrency=max_concurrency) as client:
+        dfs = run_coroutine(client.get_many(endpoint, params_list))
+
+    return _concat_pages(dfs)
+
+
+def iter_jquants_many_v2(
+    api_key: str,
+    endpoint: str,
+    params_list: List[Dict],
+    max_concurrency: int = 8,
+) -> Iterator[pd.DataFrame]:
+    """Yield pages of an endpoint for multiple parameters as they arrive.
+
+    Requests are sent concurrently by JQuantsAsyncClient in a background thread and pages
+    are yielded in the order of arrival. At most max_concurrency pages are buffered until
+    they are consumed; requests stop when the iterator is closed.
+    """
+    pages = queue.Queue(maxsize=max_concurrency)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        """Put an item to pages; False if the iterator was closed."""
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def _fetch(client: JQuantsAsyncClient, params: Dict) -> None:
+        if stop.is_set():
+            return
+        async for page in client.iter_pages(endpoint, params):
+            if not await asyncio.to_thread(_put, page):
+                return
+
+    async def _fetch_all() -> None:
+        with JQuantsAsyncClient(api_key, max_concurrency=max_concurrency) as client:
+            fetches = asyncio.gather(
+                *(_fetch(client, params) for params in params_list)
+            )
+            while not stop.is_set() and not fetches.done():
+                await asyncio.wait([fetches], timeout=0.1)
+
+            # Cancel requests in flight and retries once the iterator is closed.
+            if not fetches.done():
+                fetches.cancel()
+                await asyncio.gather(fetches, return_exceptions=True)
+            else:
+                fetches.result()
+
+    def _produce() -> None:
+        try:
+            asyncio.run(_fetch_all())
+        except Exception as e:
+            _put(e)
+        else:
+            _put(__end_of_pages__)
+
+    producer = start_thread(_produce)
+    try:
+        while True:
+            item = pages.get()
+            if item is __end_of_pages__:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def get_jquants_fin_reports_v2(
+    api_key: str, params_list: List[Dict], **kwargs
+) -> pd.DataFrame:
+    """Get J-Quants financial statements v2 for multiple codes or dates concurrently.
+
+    params_list: e.g. [{"code": "86970"}, {"code": "86970", "date": "2025-01-01"}]
+    kwargs: max_concurrency of JQuantsAsyncClient.
+    """
+    return get_jquants_many_v2(api_key, "fins/summary", params_list, **kwargs)
+
+
+def get_jquants_stock_prices_v2(
+    api_key: str, params_list: List[Dict], **kwargs
+) -> pd.DataFrame:
+    """Get J-Quants daily stock prices v2 for multiple codes or dates concurrently.
+
+    params_list: e.g. [{"code": "86970", "from": "2025-01-01", "to": "2025-01-31"}]
+    kwargs: max_concurrency of JQuantsAsyncClient.
+    """
+    return get_jquants_many_v2(api_key, "equities/bars/daily", params_list, **kwargs)
@@ -0,0 +1,206 @@
+"""Ledger of documents processed by data ingestion workflows.
+
+1) DocumentLedger: persistent ledger of documents of a data source; e.g. "edinet".
+
+Ledger is a SQLite file below Home directory/DataHive/ledger by default, and keeps
+1) listings: dates whose document lists were fetched after the date ended in JST,
+   thus they are not fetched again.
+2) documents: documents of listings with their status and output location.
+
+Status of a document is one of __ledger_statuses__;
+"listed" and "failed" documents are processed again at the next run.
+
+Need to do
+0) Documentation.
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date as Date
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+# Set up shared logger
+logger = logging.getLogger("shared")
+
+# Default path of the ledger.
+__ledger_path__ = Path.joinpath(Path.home(), "DataHive", "ledger", "ledger.sqlite")
+# Time zone of dates of listings; e.g. submission dates of EDINET.
+__ledger_tz__ = ZoneInfo("Asia/Tokyo")
+# Status of documents.
+# listed: in a listing, not processed yet.
+# saved: parsed and saved in output.
+# empty: processed, but no data to be parsed.
+# failed: failed to download or parse; processed again at the next run.
+__ledger_statuses__ = ["listed", "saved", "empty", "failed"]
+# Status of documents to be processed.
+__pending_statuses__ = ["listed", "failed"]
+
+__ledger_tables__ = [
+    """CREATE TABLE IF NOT EXISTS listings (
+        source TEXT NOT NULL,
+        date TEXT NOT NULL,
+        n_documents INTEGER NOT NULL,
+        listed_at TEXT NOT NULL,
+        PRIMARY KEY (source, date)
+    )""",
+    """CREATE TABLE IF NOT EXISTS documents (
+        source TEXT NOT NULL,
+        doc_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        code TEXT,
+        status TEXT NOT NULL,
+        output TEXT,
+        error TEXT,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (source, doc_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS documents_date ON documents (source, date)",
+]
+
+
+def _date_str(date) -> str:
+    """Return a date as YYYY-MM-DD."""
+    if isinstance(date, (datetime, Date, pd.Timestamp)):
+        return date.strftime("%Y-%m-%d")
+    return str(date)[:10]
+
+
+class DocumentLedger:
+    """Persistent ledger of documents of a data source.
+
+    Key methods
+    ----------
+    is_listed: Return True if a document list of a date was fetched after the date ended.
+    add_listing: Record documents of a date.
+    documents: Return documents of dates.
+    pending: Return IDs of documents to be processed.
+    set_status: Update status and output location of documents.
+    ----------
+    """
+
+    def __init__(self, source: str, path: Optional[str] = None):
+        self.source = source
+        self.path = Path(path) if path else __ledger_path__
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            for table in __ledger_tables__:
+                conn.execute(table)
+
+    @contextmanager
+    def _connect(self):
+        """Yield a connection; committed and closed on exit."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def is_listed(self, date) -> bool:
+        """Return True if a document list of a date was fetched after the date ended in JST."""
+        date = _date_str(date)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT listed_at FROM listings WHERE source = ? AND date = ?",
+                (self.source, date),
+            ).fetchone()
+
+        return row is not None and row[0][:10] > date
+
+    def add_listing(
+        self,
+        date,
+        docs: pd.DataFrame,
+        id_col: str = "docID",
+        code_col: Optional[str] = "secCode",
+    ) -> None:
+        """Record documents of a date; status of recorded documents is kept."""
+        date = _date_str(date)
+        now = datetime.now(__ledger_tz__).isoformat(timespec="seconds")
+        codes = (
+            docs[code_col].tolist()
+            if code_col is not None and code_col in docs.columns
+            else [None] * len(docs)
+        )
+        rows = [
+            (self.source, doc_id, date, code, "listed", now)
+            for doc_id, code in zip(docs[id_col].tolist(), codes)
+        ]
+
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                """INSERT INTO documents
+                (source, doc_id, date, code, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, doc_id) DO UPDATE SET code = excluded.code""",
+                rows,
+            )
+            conn.execute(
+                """INSERT OR REPLACE INTO listings
+                (source, date, n_documents, listed_at) VALUES (?, ?, ?, ?)""",
+                (self.source, date, len(rows), now),
+            )
+
+    def documents(self, dates: Optional[Iterable] = None) -> pd.DataFrame:
+        """Return documents of dates; all documents if None."""
+        query = "SELECT * FROM documents WHERE source = ?"
+        params: List = [self.source]
+        if dates is not None:
+            dates = [_date_str(date) for date in dates]
+            query += f" AND date IN ({', '.join('?' * len(dates))})"
+            params += dates
+
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                query + " ORDER BY date, doc_id", conn, params=params
+            )
+
+    def pending(self, doc_ids: Iterable[str]) -> List[str]:
+        """Return IDs of documents to be processed; unknown documents are included."""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        done = set()
+        with self._connect() as conn:
+            # Split not to exceed the limit of SQLite variables.
+            for i in range(0, len(doc_ids), 500):
+                chunk = doc_ids[i : i + 500]
+                done.update(
+                    row[0]
+                    for row in conn.execute(
+                        f"""SELECT doc_id FROM documents
+                        WHERE source = ? AND doc_id IN ({', '.join('?' * len(chunk))})
+                        AND status NOT IN ({', '.join('?' * len(__pending_statuses__))})""",
+                        [self.source, *chunk, *__pending_statuses__],
+                    )
+                )
+
+        return [doc_id for doc_id in doc_ids if doc_id not in done]
+
+    def set_status(
+        self,
+        doc_ids: Iterable[str],
+        status: str,
+        output: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Update status and output location of documents."""
+        if status not in __ledger_statuses__:
+            raise ValueError(
+                f"Unsupported status '{status}'. Choose from {__ledger_statuses__}."
+            )
+
+        now = datetime.now(__ledger_tz__).isoformat(timespec="seconds")
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                """UPDATE documents SET status = ?, output = ?, error = ?, updated_at = ?
+                WHERE source = ? AND doc_id = ?""",
+                [(status, output, error, now, self.source, d) for d in doc_ids],
+            )
@@ -32,6 +32,34 @@ __support_file_types__ = ["csv", "parquet"]
 __support_write_modes__ = ["overwrite", "append", "upsert", "archive", "incremental"]
 
 
+def get_file_path(file_db: Optional[str], file_path: Optional[str]):
+    """Return a path of a file; Home directory/DataHive/file_db/file_path if file_db is defined."""
+    # If file_db is defined then data will be stored in DataHive.
+    if file_db is not None:
+        logger.info(f"DataFrame will be stored in DataHive with {file_db}/{file_path}")
+
+        global __user_dic__
+
+        # Set up folder path to be stored.
+        folder_path = Path.joinpath(__user_dic__, file_db)
+
+        # Check if the folder exists and create it if necessary.
+        if not folder_path.exists():
+            folder_path.mkdir(parents=True, exist_ok=True)
+            logger.info(f"Folder created: {folder_path}")
+        else:
+            logger.info(f"Folder already exists: {folder_path}")
+
+        final_path = Path.joinpath(folder_path, file_path)
+    elif file_db is None and file_path is not None:
+        logger.info(f"DataFrame will be stored in the defined path: {file_path}")
+        final_path = file_path
+    else:
+        raise ValueError("Either 'file_db' or 'file_path' should be provided.")
+
+    return final_path
+
+
 class SaveFile(NormalClassRegistery):
     """Class for saving DataFrame to a file.
 
@@ -160,35 +188,7 @@ class SaveFile(NormalClassRegistery):
         # Load variables.
         v = self.variables
 
-        file_db = v["file_db"]
-        file_path = v["file_path"]
-
-        # If file_db is defined then data will be stored in DataHive.
-        if file_db is not None:
-            logger.info(
-                f"DataFrame will be stored in DataHive with {file_db}/{file_path}"
-            )
-
-            global __user_dic__
-
-            # Set up folder path to be stored.
-            folder_path = Path.joinpath(__user_dic__, file_db)
-
-            # Check if the folder exists and create it if necessary.
-            if not folder_path.exists():
-                folder_path.mkdir(parents=True, exist_ok=True)
-                logger.info(f"Folder created: {folder_path}")
-            else:
-                logger.info(f"Folder already exists: {folder_path}")
-
-            final_path = Path.joinpath(folder_path, file_path)
-        elif file_db is None and file_path is not None:
-            logger.info(f"DataFrame will be stored in the defined path: {file_path}")
-            final_path = file_path
-        else:
-            raise ValueError("Either 'file_db' or 'file_path' should be provided.")
-
-        return final_path
+        return get_file_path(v["file_db"], v["file_path"])
 
     def write_func(self, df: pd.DataFrame, path: str) -> None:
         v = self.variables
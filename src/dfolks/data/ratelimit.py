@@ -0,0 +1,283 @@
+"""Rate limiters for remote API calls.
+
+1) RateLimit: variables of a rate limit defined in job YAMLs.
+2) TokenBucket: token bucket rate limiter shared by threads and asyncio tasks.
+3) RateLimiter: token bucket which retries transient failures with backoff.
+4) get_rate_limiter/set_rate_limit: rate limiters shared per data source; e.g. "edinet".
+
+Retries honor Retry-After of responses; all requests of the source are paused
+until then, not only the request which was throttled.
+
+Need to do
+0) Documentation.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from pydantic import BaseModel, Field
+
+# Set up shared logger
+logger = logging.getLogger("shared")
+
+# HTTP status codes of transient failures to be retried.
+__retry_status_codes__ = {429, 500, 502, 503, 504}
+# Exceptions of transient failures to be retried.
+__retry_exceptions__ = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+# Rate limiters shared per data source.
+__rate_limiters__: Dict[str, "RateLimiter"] = {}
+__rate_limiters_lock__ = threading.Lock()
+
+
+class RateLimit(BaseModel):
+    """Variables of a rate limit.
+
+    Variables
+    ----------
+    requests_per_second: Requests allowed per second. None for no limit.
+        Optional[float] = None
+    burst: Requests which can be sent at once.
+        int = 1
+    max_retries: Retries of a request on transient failures; 429, 5xx or connection errors.
+        int = 3
+    backoff: Seconds to wait before the first retry, doubled at each retry.
+        float = 1.0
+    max_backoff: Maximum seconds to wait before a retry, including Retry-After.
+        float = 60.0
+    ----------
+    """
+
+    requests_per_second: Optional[float] = Field(default=None, gt=0)
+    burst: int = Field(default=1, ge=1)
+    max_retries: int = Field(default=3, ge=0)
+    backoff: float = Field(default=1.0, ge=0)
+    max_backoff: float = Field(default=60.0, ge=0)
+
+
+class TokenBucket:
+    """Token bucket rate limiter.
+
+    Tokens are refilled at requests_per_second up to burst and each request takes a token.
+    A request waits until its token is refilled; tokens are reserved in order of requests.
+
+    Key methods
+    ----------
+    acquire: Wait for a token by sleeping a thread.
+    acquire_async: Wait for a token without blocking an event loop.
+    pause: Hold all requests for seconds.
+    ----------
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None, burst: int = 1):
+        """Initialize class; validated by RateLimit."""
+        rate_limit = RateLimit(requests_per_second=requests_per_second, burst=burst)
+        self.requests_per_second = rate_limit.requests_per_second
+        self.burst = rate_limit.burst
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return seconds to wait until the token is refilled."""
+        with self._lock:
+            now = time.monotonic()
+            paused = max(0.0, self._paused_until - now)
+            if self.requests_per_second is None:
+                return paused
+
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._updated) * self.requests_per_second,
+            )
+            self._updated = now
+            self._tokens -= 1
+
+            if self._tokens >= 0:
+                return paused
+            return max(paused, -self._tokens / self.requests_per_second)
+
+    def pause(self, seconds: float) -> None:
+        """Hold all requests for seconds; e.g. after 429 Too Many Requests."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self) -> None:
+        """Wait for a token."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait for a token in an event loop."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def retry_after(response: Any) -> Optional[float]:
+    """Return seconds of Retry-After header of a response; None if not defined."""
+    headers = getattr(response, "headers", None)
+    if not isinstance(headers, Mapping) or headers.get("Retry-After") is None:
+        return None
+    value = headers["Retry-After"]
+
+    # Retry-After is seconds or an HTTP date.
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter(TokenBucket):
+    """Token bucket rate limiter which retries transient failures.
+
+    A call is retried if it returns a response with a status code in __retry_status_codes__
+    or raises an exception in __retry_exceptions__ (or retry_exceptions of the call).
+    Wait before a retry is Retry-After of the response if defined, otherwise exponential
+    backoff with jitter. The response of the last retry is returned as is.
+
+    Key methods
+    ----------
+    call: Call a function within the rate limit and retry transient failures.
+    call_async: Call a blocking function in a worker thread within the rate limit.
+    configure: Update the rate limit in place.
+    ----------
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        burst: int = 1,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        """Initialize class; validated by RateLimit."""
+        super().__init__(requests_per_second, burst)
+        self.configure(
+            requests_per_second=requests_per_second,
+            burst=burst,
+            max_retries=max_retries,
+            backoff=backoff,
+            max_backoff=max_backoff,
+        )
+
+    def configure(self, **kwargs) -> "RateLimiter":
+        """Update the rate limit with variables of RateLimit."""
+        rate_limit = RateLimit.model_validate(kwargs)
+        with self._lock:
+            self.requests_per_second = rate_limit.requests_per_second
+            self.burst = rate_limit.burst
+            self._tokens = min(self._tokens, float(self.burst))
+        self.max_retries = rate_limit.max_retries
+        self.backoff = rate_limit.backoff
+        self.max_backoff = rate_limit.max_backoff
+
+        return self
+
+    def _retry_wait(self, attempt: int, response: Any = None) -> float:
+        """Return seconds to wait before a retry."""
+        wait = retry_after(response)
+        if wait is None:
+            wait = self.backoff * 2**attempt * random.uniform(0.5, 1.0)
+        return min(wait, self.max_backoff)
+
+    def _should_retry(self, attempt: int, response: Any) -> bool:
+        """Return True if a response is a transient failure to be retried."""
+        status_code = getattr(response, "status_code", None)
+        return attempt < self.max_retries and status_code in __retry_status_codes__
+
+    def call(
+        self,
+        func: Callable,
+        *args,
+        retry_exceptions: Tuple[type, ...] = (),
+        **kwargs,
+    ) -> Any:
+        """Call a function within the rate limit and retry transient failures."""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                response = func(*args, **kwargs)
+            except __retry_exceptions__ + tuple(retry_exceptions) as e:
+                if attempt >= self.max_retries:
+                    raise
+                wait = self._retry_wait(attempt)
+                logger.warning(f"Retry in {wait:.1f}s after {type(e).__name__}: {e}")
+            else:
+                if not self._should_retry(attempt, response):
+                    return response
+                wait = self._retry_wait(attempt, response)
+                logger.warning(
+                    f"Retry in {wait:.1f}s after HTTP status {response.status_code}."
+                )
+            # Hold all requests of the source, not only this request.
+            self.pause(wait)
+            attempt += 1
+
+    async def call_async(
+        self,
+        func: Callable,
+        *args,
+        retry_exceptions: Tuple[type, ...] = (),
+        **kwargs,
+    ) -> Any:
+        """Call a blocking function in a worker thread within the rate limit."""
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            try:
+                response = await asyncio.to_thread(func, *args, **kwargs)
+            except __retry_exceptions__ + tuple(retry_exceptions) as e:
+                if attempt >= self.max_retries:
+                    raise
+                wait = self._retry_wait(attempt)
+                logger.warning(f"Retry in {wait:.1f}s after {type(e).__name__}: {e}")
+            else:
+                if not self._should_retry(attempt, response):
+                    return response
+                wait = self._retry_wait(attempt, response)
+                logger.warning(
+                    f"Retry in {wait:.1f}s after HTTP status {response.status_code}."
+                )
+            self.pause(wait)
+            attempt += 1
+
+
+def get_rate_limiter(source: str) -> RateLimiter:
+    """Return the rate limiter of a data source; no limit until set_rate_limit is called."""
+    with __rate_limiters_lock__:
+        if source not in __rate_limiters__:
+            __rate_limiters__[source] = RateLimiter()
+        return __rate_limiters__[source]
+
+
+def set_rate_limit(source: str, rate_limit: Optional[Dict] = None) -> RateLimiter:
+    """Set the rate limit of a data source, e.g. from "rate_limit" of a job YAML.
+
+    The rate limiter is updated in place, thus it is shared by running requests.
+    """
+    limiter = get_rate_limiter(source)
+    limiter.configure(**(rate_limit or {}))
+    logger.info(f"Rate limit of {source}: {RateLimit(**(rate_limit or {}))}")
+
+    return limiter
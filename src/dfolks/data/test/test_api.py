@@ -3,40 +3,59 @@
 Need to do:
 """
 
+import asyncio
 import datetime
 import io
 import os
 import tempfile
+import threading
+import time
 import zipfile
 from functools import wraps
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import pandas as pd
 import pytest
+import requests
 import yfinance as yf
 
+import dfolks.data.httpcache as httpcache
 from dfolks.data.data import add_ingestion_metadata
 from dfolks.data.edinet_apis import (
+    __xbrl_members__,
     download_edinet_document,
     download_edinet_documents,
     get_edinet_document,
     get_edinet_document_list,
+    iter_edinet_document_lists,
+    iter_edinet_documents,
     unzip_file,
 )
 from dfolks.data.jquants_apis import (
+    JQuantsAsyncClient,
+    filter_jquants_codes,
     get_jquants_corporate_list_v2,
     get_jquants_fin_report_v2,
     get_jquants_industry_report_v2,
     get_jquants_stock_price_v2,
+    get_jquants_stock_prices_v2,
+    iter_jquants_many_v2,
+    iter_jquants_pages_v2,
+    jquants_rate_limit,
 )
 from dfolks.data.yfinance_apis import (
+    download_yfinance_data,
     get_yfinance_balance_sheet,
     get_yfinance_cash_flow,
     get_yfinance_data,
     get_yfinance_dividends,
+    get_yfinance_fin_report,
+    get_yfinance_fin_reports,
     get_yfinance_income_statement,
     get_yfinance_info,
     get_yfinance_ticker,
+    stack_tickers,
+    yfinance_checkpoint_dir,
 )
 
 """Data utility tests."""
@@ -152,6 +171,123 @@ def test_get_jquants_stock_price(mock_get):
     assert df["Close"].iloc[0] == 110
 
 
+def _jquants_response(params):
+    """Fake response of J-Quants; 2 pages for each code."""
+    r = MagicMock(status_code=200)
+    if params.get("pagination_key"):
+        r.json.return_value = {"data": [{"Code": params["code"], "Page": 2}]}
+    else:
+        r.json.return_value = {
+            "data": [{"Code": params["code"], "Page": 1}],
+            "pagination_key": "next",
+        }
+    return r
+
+
+# Test: JQuantsAsyncClient
+@patch("dfolks.data.jquants_apis.requests.Session.get")
+def test_get_jquants_stock_prices_v2_pagination_and_order(mock_get):
+    mock_get.side_effect = lambda url, params: _jquants_response(params)
+
+    params_list = [{"code": code} for code in ["1111", "2222", "3333"]]
+    df = get_jquants_stock_prices_v2("dummy_api_key", params_list, max_concurrency=2)
+
+    assert mock_get.call_count == 6
+    assert df["Code"].tolist() == ["1111", "1111", "2222", "2222", "3333", "3333"]
+    assert df["Page"].tolist() == [1, 2] * 3
+    assert mock_get.call_args.args[0].endswith("/equities/bars/daily")
+
+
+@patch("dfolks.data.jquants_apis.requests.Session.get")
+def test_jquants_async_client_error(mock_get):
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = "0"
+    mock_get.return_value = response
+
+    with JQuantsAsyncClient("dummy_api_key") as client:
+        with pytest.raises(requests.HTTPError, match="429"):
+            asyncio.run(client.get("fins/summary", {"code": "1111"}))
+
+
+def test_jquants_rate_limit():
+    assert jquants_rate_limit("light") == {"requests_per_second": 1.0, "burst": 1}
+    assert jquants_rate_limit({"burst": 2}) == {"burst": 2}
+    with pytest.raises(ValueError, match="Unsupported J-Quants plan"):
+        jquants_rate_limit("unknown")
+
+
+def test_jquants_async_client_requires_api_key():
+    with pytest.raises(ValueError):
+        JQuantsAsyncClient(None)
+
+
+# Test: iter_jquants_pages_v2
+@patch("dfolks.data.jquants_apis.requests.get")
+def test_iter_jquants_pages_v2(mock_get):
+    mock_get.side_effect = lambda url, params, headers: _jquants_response(params)
+
+    pages = iter_jquants_pages_v2("dummy_api_key", "fins/summary", {"code": "1111"})
+    assert [page["Page"].tolist() for page in pages] == [[1], [2]]
+    assert mock_get.call_args.kwargs["params"] == {
+        "code": "1111",
+        "pagination_key": "next",
+    }
+
+
+# Test: get_jquants_stock_price follows pagination keys
+@patch("dfolks.data.jquants_apis.requests.get")
+def test_get_jquants_stock_price_pagination(mock_get):
+    mock_get.side_effect = lambda url, params, headers: _jquants_response(params)
+
+    df = get_jquants_stock_price_v2(api_key="dummy_api_key", code="1111")
+    assert df["Page"].tolist() == [1, 2]
+
+
+# Test: iter_jquants_many_v2
+@patch("dfolks.data.jquants_apis.requests.Session.get")
+def test_iter_jquants_many_v2(mock_get):
+    mock_get.side_effect = lambda url, params: _jquants_response(params)
+
+    params_list = [{"code": code} for code in ["1111", "2222", "3333"]]
+    pages = list(iter_jquants_many_v2("dummy_api_key", "fins/summary", params_list))
+    assert len(pages) == 6
+    assert sorted(page["Code"].iloc[0] for page in pages) == sorted(
+        ["1111", "2222", "3333"] * 2
+    )
+
+
+@patch("dfolks.data.jquants_apis.requests.Session.get")
+def test_iter_jquants_many_v2_close_and_error(mock_get):
+    mock_get.side_effect = lambda url, params: _jquants_response(params)
+
+    params_list = [{"code": str(code)} for code in range(100)]
+    pages = iter_jquants_many_v2(
+        "dummy_api_key", "fins/summary", params_list, max_concurrency=2
+    )
+    next(pages)
+    pages.close()
+    # Requests stop once the iterator is closed.
+    assert mock_get.call_count < 200
+
+    mock_get.side_effect = None
+    mock_get.return_value = requests.Response()
+    mock_get.return_value.status_code = 404
+    with pytest.raises(requests.HTTPError, match="404"):
+        list(iter_jquants_many_v2("dummy_api_key", "fins/summary", params_list[:1]))
+
+
+# Test: filter_jquants_codes
+def test_filter_jquants_codes():
+    df = pd.DataFrame(
+        {"Code": ["11110", "22220", "22225", "33330"], "Close": [1, 2, 3, 4]}
+    )
+
+    df_filtered = filter_jquants_codes(df, ["1111", "22225"])
+    assert df_filtered["Code"].tolist() == ["11110", "22225"]
+    assert df_filtered.index.tolist() == [0, 1]
+
+
 # Test: get_jquants_industry_report
 @patch("dfolks.data.jquants_apis.requests.get")
 def test_get_jquants_industry_report(mock_get):
@@ -243,6 +379,34 @@ def test_get_edinet_document_list(mock_get):
     assert df["docID"].iloc[0] == "ABC1234"
 
 
+# Test: iter_edinet_document_lists
+@patch("dfolks.data.edinet_apis.requests.Session.get")
+def test_iter_edinet_document_lists(mock_get):
+    def get(url, params):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"results": [{"docID": params["date"]}]}
+        return response
+
+    mock_get.side_effect = get
+    dates = pd.date_range("2025-01-01", "2025-01-05")
+
+    with patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}):
+        lists = dict(iter_edinet_document_lists(dates, max_workers=2))
+
+    assert mock_get.call_count == 5
+    assert sorted(lists) == list(dates)
+    assert all(lists[d]["docID"].iloc[0] == d.strftime("%Y-%m-%d") for d in dates)
+
+
+@patch("dfolks.data.edinet_apis.requests.Session.get")
+def test_iter_edinet_document_lists_error(mock_get):
+    mock_get.return_value.status_code = 404
+
+    with patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}):
+        with pytest.raises(Exception, match="404"):
+            list(iter_edinet_document_lists(["2025-01-01", "2025-01-02"]))
+
+
 @pytest.fixture
 def fake_zip_bytes():
     memory_zip = io.BytesIO()
@@ -285,6 +449,69 @@ def test_download_edinet_document(mock_get, fake_zip_bytes, temp_dir):
     assert content == fake_zip_bytes
 
 
+# Test: download_edinet_document streams without the cache and releases the connection
+@patch("dfolks.data.edinet_apis.requests.get")
+def test_download_edinet_document_stream(mock_get, temp_dir, monkeypatch):
+    cache = httpcache.ResponseCache(cache_dir=os.path.join(temp_dir, "cache"))
+    monkeypatch.setattr(httpcache, "__response_cache__", cache)
+
+    def iter_content(chunk_size):
+        yield b"part"
+        raise requests.ConnectionError("reset")
+
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.iter_content = iter_content
+
+    with patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}):
+        with pytest.raises(requests.ConnectionError):
+            download_edinet_document("ABC1234", temp_dir)
+
+    assert mock_get.call_args.kwargs["stream"] is True
+    mock_get.return_value.__exit__.assert_called_once()
+    assert not list(cache.cache_dir.glob("*/*"))
+    # The partial download is kept to be resumed.
+    with open(os.path.join(temp_dir, "ABC1234.zip.part"), "rb") as f:
+        assert f.read() == b"part"
+
+
+# Test: download_edinet_document downloads again if the range is not satisfiable
+@patch("dfolks.data.edinet_apis.requests.get")
+def test_download_edinet_document_range_not_satisfiable(
+    mock_get, fake_zip_bytes, temp_dir
+):
+    with open(os.path.join(temp_dir, "ABC1234.zip.part"), "wb") as f:
+        f.write(fake_zip_bytes)
+    not_satisfiable = MagicMock(status_code=416)
+    whole = MagicMock(status_code=200)
+    whole.iter_content = lambda chunk_size: [fake_zip_bytes]
+    mock_get.side_effect = [not_satisfiable, whole]
+
+    with patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}):
+        download_edinet_document("ABC1234", temp_dir)
+
+    assert mock_get.call_args_list[0].kwargs["headers"] == {
+        "Range": f"bytes={len(fake_zip_bytes)}-"
+    }
+    assert mock_get.call_args_list[1].kwargs["headers"] is None
+    not_satisfiable.close.assert_called_once()
+    assert not os.path.exists(os.path.join(temp_dir, "ABC1234.zip.part"))
+    with open(os.path.join(temp_dir, "ABC1234.zip"), "rb") as f:
+        assert f.read() == fake_zip_bytes
+
+
+# Test: get_edinet_document retries transient failures
+@patch("dfolks.data.edinet_apis.requests.get")
+def test_get_edinet_document_retry(mock_get, fake_zip_bytes):
+    failure = MagicMock(status_code=503, headers={"Retry-After": "0"})
+    success = MagicMock(status_code=200)
+    mock_get.side_effect = [failure, success]
+
+    with patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}):
+        response = get_edinet_document("ABC1234")
+    assert response.status_code == 200
+    assert mock_get.call_count == 2
+
+
 # Test: download_edinet_document failure
 @patch("dfolks.data.edinet_apis.requests.get")
 def test_download_edinet_document_failure(mock_get, temp_dir):
@@ -318,6 +545,33 @@ def test_unzip_file_extracts_and_removes_zip(temp_dir):
         assert f.read() == "sample data"
 
 
+# Test: unzip_file extracts only XBRL and taxonomy files
+def test_unzip_file_extracts_selected_members(temp_dir):
+    doc_id = "S100ABC"
+    names = [
+        "XBRL/PublicDoc/jpcrp030000-asr-001.xbrl",
+        "XBRL/PublicDoc/jpcrp030000-asr-001.xsd",
+        "XBRL/PublicDoc/jpcrp030000-asr-001_lab.xml",
+        "XBRL/PublicDoc/0101010_honbun.htm",
+        "XBRL/PublicDoc/image.jpg",
+        "XBRL/AuditDoc/jpaud-aar-cn-001.xbrl",
+        "S100ABC.pdf",
+    ]
+    with zipfile.ZipFile(os.path.join(temp_dir, f"{doc_id}.zip"), "w") as zf:
+        for name in names:
+            zf.writestr(name, "sample data")
+
+    unzip_file(file_name=doc_id, folder_path=temp_dir, members=__xbrl_members__)
+
+    extracted = sorted(
+        os.path.relpath(os.path.join(root, f), os.path.join(temp_dir, doc_id))
+        for root, _, files in os.walk(os.path.join(temp_dir, doc_id))
+        for f in files
+    )
+    assert extracted == sorted(names[:3])
+    assert not os.path.exists(os.path.join(temp_dir, f"{doc_id}.tmp"))
+
+
 # Test: download_edinet_documents
 @patch("dfolks.data.edinet_apis.download_edinet_document")
 @patch("dfolks.data.edinet_apis.unzip_file")
@@ -332,6 +586,95 @@ def test_download_edinet_documents(mock_unzip, mock_download, temp_dir):
     assert mock_unzip.call_count == 2
 
 
+# Test: download_edinet_documents downloads documents of lists as they are yielded
+@patch("dfolks.data.edinet_apis.download_edinet_document")
+@patch("dfolks.data.edinet_apis.unzip_file")
+def test_download_edinet_documents_iterable(mock_unzip, mock_download, temp_dir):
+    yielded = []
+
+    def doc_lists():
+        for doc_ids in (["DOC1", "DOC2"], [], ["DOC2", "DOC3"]):
+            yielded.append(mock_download.call_count)
+            yield pd.DataFrame({"docID": doc_ids})
+
+    with patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}):
+        download_edinet_documents(doc_lists(), temp_dir, max_workers=1)
+
+    assert sorted(c.kwargs["doc_id"] for c in mock_download.call_args_list) == [
+        "DOC1",
+        "DOC2",
+        "DOC3",
+    ]
+    assert mock_unzip.call_count == 3
+    assert len(yielded) == 3
+
+
+# Test: iter_edinet_documents downloads at most max_pending documents ahead
+@patch("dfolks.data.edinet_apis.download_edinet_document")
+@patch("dfolks.data.edinet_apis.unzip_file")
+def test_iter_edinet_documents_max_pending(mock_unzip, mock_download, temp_dir):
+    consumed = []
+    ahead = []
+    mock_download.side_effect = lambda doc_id, folder_path: ahead.append(
+        mock_download.call_count - len(consumed)
+    )
+    doc_list = pd.DataFrame({"docID": [f"DOC{i}" for i in range(10)]})
+
+    for doc_id, error in iter_edinet_documents(
+        doc_list, temp_dir, max_workers=4, max_pending=2
+    ):
+        assert error is None
+        consumed.append(doc_id)
+
+    assert sorted(consumed) == sorted(doc_list["docID"])
+    assert max(ahead) <= 2
+
+
+# Test: download_edinet_document resumes a partial download
+@patch("dfolks.data.edinet_apis.requests.get")
+def test_download_edinet_document_resume(mock_get, fake_zip_bytes, temp_dir):
+    doc_id = "ABC1234"
+    with open(os.path.join(temp_dir, f"{doc_id}.zip.part"), "wb") as f:
+        f.write(fake_zip_bytes[:10])
+
+    mock_get.return_value.status_code = 206
+    mock_get.return_value.iter_content = lambda chunk_size: [fake_zip_bytes[10:]]
+
+    with patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}):
+        download_edinet_document(doc_id, temp_dir)
+
+    assert mock_get.call_args.kwargs["headers"] == {"Range": "bytes=10-"}
+    assert not os.path.exists(os.path.join(temp_dir, f"{doc_id}.zip.part"))
+    with open(os.path.join(temp_dir, f"{doc_id}.zip"), "rb") as f:
+        assert f.read() == fake_zip_bytes
+
+
+# Test: download_edinet_documents skips unzipped documents and collects errors
+@patch("dfolks.data.edinet_apis.download_edinet_document")
+def test_download_edinet_documents_resume_and_errors(
+    mock_download, fake_zip_bytes, temp_dir
+):
+    def download(doc_id, folder_path):
+        if doc_id == "DOC3":
+            raise Exception("Error fetching data from EDINET API: 404")
+        with open(os.path.join(folder_path, f"{doc_id}.zip"), "wb") as f:
+            f.write(fake_zip_bytes)
+
+    mock_download.side_effect = download
+    os.makedirs(os.path.join(temp_dir, "DOC1"))
+    doc_list = pd.DataFrame({"docID": ["DOC1", "DOC2", "DOC3"]})
+
+    with pytest.raises(Exception, match="DOC3"):
+        download_edinet_documents(doc_list, temp_dir, max_workers=2)
+
+    assert sorted(c.kwargs["doc_id"] for c in mock_download.call_args_list) == [
+        "DOC2",
+        "DOC3",
+    ]
+    assert os.path.exists(os.path.join(temp_dir, "DOC2", "testfile.txt"))
+    assert not os.path.exists(os.path.join(temp_dir, "DOC2.zip"))
+
+
 """yahoo finance API tests."""
 # Mock up yf.ticker
 
@@ -448,6 +791,39 @@ def test_get_yfinance_dividends(monkeypatch):
     assert df["ticker"].iloc[0] == ticker
 
 
+def test_get_yfinance_fin_report_uses_one_ticker(monkeypatch):
+    tickers = []
+    monkeypatch.setattr(yf, "Ticker", lambda t: tickers.append(t) or MockTicker(t))
+
+    reports = get_yfinance_fin_report("TEST")
+
+    assert tickers == ["TEST"]
+    assert [len(df) for df in reports] == [2, 2, 2, 3]
+    assert all(df["ticker"].iloc[0] == "TEST" for df in reports)
+
+
+@mock_yfinance_ticker
+def test_get_yfinance_fin_reports(monkeypatch):
+    tickers = [f"{i}.T" for i in range(10)]
+
+    reports = get_yfinance_fin_reports(tickers + ["0.T"], max_workers=4)
+
+    assert list(reports) == tickers
+    assert all(reports[t][0]["ticker"].iloc[0] == t for t in tickers)
+
+
+def test_get_yfinance_fin_reports_errors(monkeypatch):
+    def ticker(t):
+        if t == "BROKEN":
+            raise ValueError("No data")
+        return MockTicker(t)
+
+    monkeypatch.setattr(yf, "Ticker", ticker)
+
+    with pytest.raises(Exception, match="BROKEN"):
+        get_yfinance_fin_reports(["A", "BROKEN", "B"], max_workers=2)
+
+
 # Mock up yf.download
 def mock_yfinance_download(func):
     @wraps(func)
@@ -484,3 +860,124 @@ def test_get_yfinance_data(monkeypatch):
     assert set(expected_cols).issubset(df.columns)
     assert df.shape[0] == 1  # One date entry
     assert df["ticker"].iloc[0] == ticker
+
+
+# Compared with the previous implementation of stack, which is deprecated.
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("drop_column", [False, True])
+def test_stack_tickers_same_as_stack(drop_column):
+    cols = pd.MultiIndex.from_product(
+        [["B.T", "A.T", "C.T"], ["Open", "Close", "Volume"]],
+        names=["Ticker", "Price"],
+    )
+    df = pd.DataFrame(
+        [[float(i * 9 + j) for j in range(9)] for i in range(3)],
+        index=pd.DatetimeIndex(
+            ["2025-01-01", "2025-01-02", "2025-01-03"], name="Date", tz="Asia/Tokyo"
+        ),
+        columns=cols,
+    )
+    # A ticker without any value on a date and a value missing.
+    df.loc[df.index[1], "A.T"] = None
+    df.loc[df.index[2], ("C.T", "Close")] = None
+    if drop_column:
+        df = df.drop(columns=[("B.T", "Volume")])
+
+    expected = df.stack(level=0, future_stack=False).reset_index()
+
+    pd.testing.assert_frame_equal(stack_tickers(df), expected)
+
+
+def fake_chunk_download(calls, fail=()):
+    """Return yf.download of tickers recording downloaded chunks."""
+
+    def download(tickers, *args, **kwargs):
+        calls.append(list(tickers))
+        if any(t in fail for t in tickers):
+            raise ValueError("Download failed")
+        cols = pd.MultiIndex.from_product(
+            [tickers, ["Open", "Close"]], names=["Ticker", "Price"]
+        )
+        df = pd.DataFrame(
+            [[1.0, 2.0] * len(tickers)],
+            index=pd.DatetimeIndex(["2025-01-01"], name="Date"),
+            columns=cols,
+        )
+        return df
+
+    return download
+
+
+def test_download_yfinance_data_chunks(monkeypatch):
+    calls = []
+    monkeypatch.setattr(yf, "download", fake_chunk_download(calls))
+    tickers = [f"{i}.T" for i in range(7)]
+
+    df = download_yfinance_data(tickers, chunk_size=3, max_workers=2, period="1d")
+
+    assert sorted(len(c) for c in calls) == [1, 3, 3]
+    assert df["ticker"].tolist() == tickers
+    assert set(["date", "Open", "Close"]).issubset(df.columns)
+
+
+def test_download_yfinance_data_serialised(monkeypatch):
+    calls = []
+    download = fake_chunk_download(calls)
+    lock = threading.Lock()
+    active = [0]
+    overlaps = []
+
+    def serialised(tickers, *args, **kwargs):
+        with lock:
+            active[0] += 1
+            overlaps.append(active[0] > 1)
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return download(tickers, *args, **kwargs)
+
+    monkeypatch.setattr(yf, "download", serialised)
+    tickers = [f"{i}.T" for i in range(4)]
+
+    df = download_yfinance_data(tickers, chunk_size=1, max_workers=4, period="1d")
+
+    assert len(overlaps) == 4 and not any(overlaps)
+    assert df["ticker"].tolist() == tickers
+
+
+def test_download_yfinance_data_resume(monkeypatch, tmp_path):
+    calls = []
+    tickers = [f"{i}.T" for i in range(7)]
+    checkpoint_dir = yfinance_checkpoint_dir(
+        tickers, str(tmp_path), chunk_size=3, period="1d"
+    )
+    monkeypatch.setattr(yf, "download", fake_chunk_download(calls, fail=["4.T"]))
+
+    with pytest.raises(Exception, match=r"1 of 3 chunks: \[1\]"):
+        download_yfinance_data(
+            tickers, chunk_size=3, checkpoint_dir=checkpoint_dir, period="1d"
+        )
+    assert sorted(p.name for p in checkpoint_dir.iterdir()) == [
+        "chunk_0.pkl",
+        "chunk_2.pkl",
+    ]
+
+    # Only the missing chunk is downloaded again.
+    calls.clear()
+    monkeypatch.setattr(yf, "download", fake_chunk_download(calls))
+    df = download_yfinance_data(
+        tickers, chunk_size=3, checkpoint_dir=checkpoint_dir, period="1d"
+    )
+
+    assert calls == [["3.T", "4.T", "5.T"]]
+    assert df["ticker"].tolist() == tickers
+
+
+def test_yfinance_checkpoint_dir(tmp_path):
+    root = str(tmp_path)
+    path = yfinance_checkpoint_dir(["A", "B"], root, chunk_size=2, period="1d")
+
+    assert path.parent == tmp_path
+    assert path == yfinance_checkpoint_dir(["A", "B"], root, chunk_size=2, period="1d")
+    assert path != yfinance_checkpoint_dir(["A", "B"], root, chunk_size=1, period="1d")
+    assert path != yfinance_checkpoint_dir(["A"], root, chunk_size=2, period="1d")
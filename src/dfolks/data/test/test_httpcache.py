@@ -0,0 +1,206 @@
+"""Test for httpcache.
+
+Need to do:
+"""
+
+import datetime
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+import dfolks.data.httpcache as httpcache
+from dfolks.data.httpcache import ResponseCache, cached_get
+
+
+def _response(status_code=200, content=b"body", headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(cache_dir=str(tmp_path))
+
+
+@pytest.fixture
+def reset_response_cache(monkeypatch):
+    monkeypatch.setattr(httpcache, "__response_cache__", False)
+
+
+def test_cache_hit(cache):
+    fetch = MagicMock(return_value=_response(content=b'{"data": []}'))
+
+    first = cache.get(fetch, "https://example.com/a", params={"code": "1"})
+    second = cache.get(fetch, "https://example.com/a", params={"code": "1"})
+
+    assert fetch.call_count == 1
+    assert second.status_code == 200
+    assert second.json() == {"data": []}
+    assert list(second.iter_content(chunk_size=2)) == [
+        b'{"',
+        b"da",
+        b"ta",
+        b'":',
+        b" [",
+        b"]}",
+    ]
+    assert not getattr(first, "from_cache", False)
+    assert second.from_cache
+
+    # Different params are different keys.
+    cache.get(fetch, "https://example.com/a", params={"code": "2"})
+    assert fetch.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"stream": True}, {"headers": {"range": "bytes=10-"}}]
+)
+def test_streamed_and_partial_requests_are_not_cached(cache, tmp_path, kwargs):
+    fetch = MagicMock(return_value=_response(content=b"zip"))
+
+    cache.get(fetch, "https://example.com/documents/S100ABC", **kwargs)
+    cache.get(fetch, "https://example.com/documents/S100ABC", **kwargs)
+
+    assert fetch.call_count == 2
+    assert not list(tmp_path.glob("*/*"))
+
+
+def test_cache_key_excludes_secrets():
+    assert ResponseCache.key(
+        "u", {"a": 1, "Subscription-Key": "x"}
+    ) == ResponseCache.key("u", {"a": "1", "Subscription-Key": "y"})
+    assert ResponseCache.key("u", {"a": 1, "b": 2}) == ResponseCache.key(
+        "u", {"b": 2, "a": 1}
+    )
+
+
+def test_cache_does_not_store_failures(cache):
+    fetch = MagicMock(return_value=_response(status_code=500))
+
+    cache.get(fetch, "https://example.com/a")
+    cache.get(fetch, "https://example.com/a")
+    assert fetch.call_count == 2
+
+
+def test_cache_ttl(tmp_path):
+    cache = ResponseCache(
+        cache_dir=str(tmp_path), default_ttl=10, ttls={"/bars/": 0, "/bars/daily": 5}
+    )
+    assert cache.ttl("https://example.com/other") == 10
+    assert cache.ttl("https://example.com/bars/daily") == 5
+    assert cache.ttl("https://example.com/bars/minute") == 0
+    # Default TTLs of endpoints.
+    assert cache.ttl("https://api.edinet-fsa.go.jp/api/v2/documents/S100ABC") is None
+
+
+def test_cache_expired_and_revalidated(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), default_ttl=0)
+    fetch = MagicMock(return_value=_response(headers={"ETag": '"v1"'}))
+    cache.get(fetch, "https://example.com/a")
+
+    fetch.return_value = _response(status_code=304, content=b"")
+    response = cache.get(fetch, "https://example.com/a", headers={"x-api-key": "k"})
+
+    assert response.status_code == 200
+    assert response.content == b"body"
+    assert fetch.call_args.kwargs["headers"] == {
+        "x-api-key": "k",
+        "If-None-Match": '"v1"',
+    }
+
+
+def test_cache_ttl_of_request(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), default_ttl=0)
+    fetch = MagicMock(return_value=_response())
+
+    cache.get(fetch, "https://example.com/a", ttl=None)
+    cache.get(fetch, "https://example.com/a", ttl=None)
+    assert fetch.call_count == 1
+    # TTL of URL is used if omitted.
+    cache.get(fetch, "https://example.com/a")
+    assert fetch.call_count == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), max_size_mb=2.5 / 1024)
+    fetch = MagicMock(side_effect=lambda url: _response(content=b"x" * 1024))
+
+    cache.get(fetch, "https://example.com/1")
+    time.sleep(0.01)
+    cache.get(fetch, "https://example.com/2")
+    time.sleep(0.01)
+    # Use 1 so that 2 is the least recently used.
+    cache.get(fetch, "https://example.com/1")
+    time.sleep(0.01)
+    cache.get(fetch, "https://example.com/3")
+    assert fetch.call_count == 3
+
+    cache.get(fetch, "https://example.com/1")
+    cache.get(fetch, "https://example.com/3")
+    assert fetch.call_count == 3
+    cache.get(fetch, "https://example.com/2")
+    assert fetch.call_count == 4
+
+
+def test_cached_get_disabled(reset_response_cache, monkeypatch):
+    monkeypatch.delenv("DFOLKS_HTTP_CACHE", raising=False)
+    fetch = MagicMock(return_value=_response())
+
+    cached_get(fetch, "https://example.com/a", params={"a": 1})
+    cached_get(fetch, "https://example.com/a", params={"a": 1})
+    assert fetch.call_count == 2
+    fetch.assert_called_with("https://example.com/a", params={"a": 1})
+
+
+def test_cached_get_enabled_by_env(reset_response_cache, monkeypatch, tmp_path):
+    monkeypatch.setenv("DFOLKS_HTTP_CACHE", str(tmp_path))
+    fetch = MagicMock(return_value=_response())
+
+    cached_get(fetch, "https://example.com/a")
+    cached_get(fetch, "https://example.com/a")
+    assert fetch.call_count == 1
+    assert httpcache.get_response_cache().cache_dir == tmp_path
+
+    httpcache.disable_response_cache()
+    cached_get(fetch, "https://example.com/a")
+    assert fetch.call_count == 2
+
+
+def test_edinet_document_list_of_past_date_never_expires(
+    reset_response_cache, tmp_path
+):
+    from dfolks.data.edinet_apis import __edinet_tz__, get_edinet_document_list
+
+    httpcache.set_response_cache(
+        {"cache_dir": str(tmp_path), "ttls": {"/documents.json": 0}}
+    )
+    content = b'{"results": [{"docID": "S100ABC"}]}'
+    today = datetime.datetime.now(__edinet_tz__).strftime("%Y-%m-%d")
+    with (
+        patch("dfolks.data.edinet_apis.requests.get") as mock_get,
+        patch.dict("os.environ", {"EDINET_API_TOKEN": "fake_token"}),
+    ):
+        mock_get.return_value = _response(content=content)
+        for date in ["2025-01-01", "2025-01-01", today, today]:
+            df = get_edinet_document_list(date)
+            assert df["docID"].tolist() == ["S100ABC"]
+    # The list of today expires at TTL of /documents.json.
+    assert mock_get.call_count == 3
+
+
+def test_jquants_api_uses_response_cache(reset_response_cache, tmp_path):
+    from dfolks.data.jquants_apis import get_jquants_stock_price_v2
+
+    httpcache.set_response_cache({"cache_dir": str(tmp_path)})
+    content = b'{"data": [{"Code": "1111", "Close": 1}]}'
+    with patch("dfolks.data.jquants_apis.requests.get") as mock_get:
+        mock_get.return_value = _response(content=content)
+        for _ in range(2):
+            df = get_jquants_stock_price_v2(api_key="dummy_api_key", code="1111")
+            assert df["Close"].tolist() == [1]
+    assert mock_get.call_count == 1
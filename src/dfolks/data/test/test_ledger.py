@@ -0,0 +1,92 @@
+"""Test for ledger.
+
+Need to do:
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+import dfolks.data.ledger as ledger_module
+from dfolks.data.ledger import DocumentLedger, __ledger_tz__
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return DocumentLedger("edinet", str(tmp_path / "ledger.sqlite"))
+
+
+@pytest.fixture
+def docs():
+    return pd.DataFrame(
+        {"docID": ["DOC1", "DOC2", "DOC3"], "secCode": ["1", "2", None]}
+    )
+
+
+def test_add_listing(ledger, docs):
+    assert not ledger.is_listed("2024-01-01")
+
+    ledger.add_listing(pd.Timestamp("2024-01-01"), docs)
+
+    assert ledger.is_listed("2024-01-01")
+    documents = ledger.documents(dates=[pd.Timestamp("2024-01-01")])
+    assert documents["doc_id"].tolist() == ["DOC1", "DOC2", "DOC3"]
+    assert documents["code"].tolist() == ["1", "2", None]
+    assert (documents["status"] == "listed").all()
+    assert ledger.documents(dates=["2024-01-02"]).empty
+
+
+def test_listing_of_today_is_not_complete(ledger, docs):
+    today = datetime.now(__ledger_tz__).strftime("%Y-%m-%d")
+    ledger.add_listing(today, docs)
+
+    # Documents may be submitted later today.
+    assert not ledger.is_listed(today)
+
+
+def test_listing_date_is_in_jst(ledger, docs, monkeypatch):
+    # 20:00 in JST is already the next day on a host in UTC+14.
+    instant = datetime(2024, 1, 1, 20, 0, tzinfo=__ledger_tz__)
+
+    class HostDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            if tz is None:
+                return instant.astimezone(timezone(timedelta(hours=14))).replace(
+                    tzinfo=None
+                )
+            return instant.astimezone(tz)
+
+    monkeypatch.setattr(ledger_module, "datetime", HostDatetime)
+    ledger.add_listing("2024-01-01", docs)
+
+    # Documents may still be submitted on 2024-01-01 in JST.
+    assert not ledger.is_listed("2024-01-01")
+
+
+def test_pending_and_set_status(ledger, docs, tmp_path):
+    ledger.add_listing("2024-01-01", docs)
+    ledger.set_status(["DOC1"], "saved", output="edinet/jp_fin_report.csv")
+    ledger.set_status(["DOC2"], "failed", error="404")
+
+    assert ledger.pending(["DOC1", "DOC2", "DOC3", "DOC4"]) == ["DOC2", "DOC3", "DOC4"]
+
+    # Status is kept when the date is listed again and persisted in the file.
+    ledger.add_listing("2024-01-01", docs)
+    documents = DocumentLedger("edinet", str(tmp_path / "ledger.sqlite")).documents()
+    assert documents.set_index("doc_id")["status"].to_dict() == {
+        "DOC1": "saved",
+        "DOC2": "failed",
+        "DOC3": "listed",
+    }
+    assert documents["output"].iloc[0] == "edinet/jp_fin_report.csv"
+    assert documents["error"].iloc[1] == "404"
+
+    # Ledgers of other sources are independent.
+    assert DocumentLedger("other", str(tmp_path / "ledger.sqlite")).documents().empty
+
+
+def test_set_status_unsupported(ledger):
+    with pytest.raises(ValueError, match="Unsupported status"):
+        ledger.set_status(["DOC1"], "unknown")
@@ -0,0 +1,151 @@
+"""Test for ratelimit.
+
+Need to do:
+"""
+
+import asyncio
+import email.utils
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from pydantic import ValidationError
+
+from dfolks.data.ratelimit import (
+    RateLimit,
+    RateLimiter,
+    TokenBucket,
+    get_rate_limiter,
+    retry_after,
+    set_rate_limit,
+)
+
+
+def test_rate_limit_validation():
+    assert RateLimit().requests_per_second is None
+    with pytest.raises(ValidationError):
+        RateLimit(requests_per_second=0)
+    with pytest.raises(ValidationError):
+        RateLimit(burst=0)
+
+
+def test_token_bucket_unlimited():
+    bucket = TokenBucket()
+    start = time.monotonic()
+    for _ in range(100):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+def test_token_bucket_waits_after_burst():
+    bucket = TokenBucket(requests_per_second=20, burst=2)
+    start = time.monotonic()
+    # 2 tokens at once, then 4 tokens at 20 per second.
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.19
+
+
+def test_token_bucket_async_reserves_in_order():
+    bucket = TokenBucket(requests_per_second=50, burst=1)
+
+    async def _acquire_all():
+        await asyncio.gather(*(bucket.acquire_async() for _ in range(6)))
+
+    start = time.monotonic()
+    asyncio.run(_acquire_all())
+    assert time.monotonic() - start >= 0.09
+
+
+def test_token_bucket_pause():
+    bucket = TokenBucket()
+    bucket.pause(0.1)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_retry_after():
+    assert retry_after(MagicMock(headers={"Retry-After": "3"})) == 3.0
+    assert retry_after(MagicMock(headers={})) is None
+    assert retry_after(MagicMock()) is None
+
+    date = email.utils.format_datetime(
+        datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True
+    )
+    assert 20 < retry_after(MagicMock(headers={"Retry-After": date})) <= 30
+
+
+def test_rate_limiter_retries_status_codes():
+    responses = [
+        MagicMock(status_code=429, headers={"Retry-After": "0.05"}),
+        MagicMock(status_code=503, headers={}),
+        MagicMock(status_code=200),
+    ]
+    func = MagicMock(side_effect=responses)
+    limiter = RateLimiter(backoff=0.01)
+
+    start = time.monotonic()
+    assert limiter.call(func, "url", params={"a": 1}).status_code == 200
+    assert time.monotonic() - start >= 0.05
+    assert func.call_count == 3
+    func.assert_called_with("url", params={"a": 1})
+
+
+def test_rate_limiter_returns_last_response():
+    func = MagicMock(return_value=MagicMock(status_code=500, headers={}))
+    limiter = RateLimiter(max_retries=2, backoff=0)
+
+    assert limiter.call(func).status_code == 500
+    assert func.call_count == 3
+
+
+def test_rate_limiter_does_not_retry_client_errors():
+    func = MagicMock(return_value=MagicMock(status_code=404))
+    assert RateLimiter().call(func).status_code == 404
+    assert func.call_count == 1
+
+
+def test_rate_limiter_retries_exceptions():
+    class CustomError(Exception):
+        pass
+
+    func = MagicMock(side_effect=[requests.exceptions.ConnectionError(), "ok"])
+    assert RateLimiter(backoff=0).call(func) == "ok"
+
+    func = MagicMock(side_effect=CustomError())
+    with pytest.raises(CustomError):
+        RateLimiter(max_retries=1, backoff=0).call(
+            func, retry_exceptions=(CustomError,)
+        )
+    assert func.call_count == 2
+
+    func = MagicMock(side_effect=ValueError())
+    with pytest.raises(ValueError):
+        RateLimiter(backoff=0).call(func)
+    assert func.call_count == 1
+
+
+def test_rate_limiter_call_async():
+    func = MagicMock(side_effect=[MagicMock(status_code=502, headers={}), "ok"])
+    limiter = RateLimiter(backoff=0)
+
+    assert asyncio.run(limiter.call_async(func, 1, key="value")) == "ok"
+    func.assert_called_with(1, key="value")
+
+
+def test_set_rate_limit_updates_shared_limiter():
+    limiter = get_rate_limiter("test_source")
+    assert get_rate_limiter("test_source") is limiter
+
+    set_rate_limit(
+        "test_source", {"requests_per_second": 5, "burst": 2, "max_retries": 1}
+    )
+    assert limiter.requests_per_second == 5
+    assert limiter.burst == 2
+    assert limiter.max_retries == 1
+
+    with pytest.raises(ValidationError):
+        set_rate_limit("test_source", {"requests_per_second": -1})
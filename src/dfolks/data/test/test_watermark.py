@@ -0,0 +1,111 @@
+"""Test for watermark.
+
+Need to do:
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from dfolks.data.watermark import (
+    earliest_watermark,
+    filter_after_watermarks,
+    missing_ranges,
+    read_watermarks,
+    update_watermarks,
+)
+
+
+@pytest.fixture
+def prices(tmp_path):
+    path = tmp_path / "jp_stock_price.csv"
+    pd.DataFrame(
+        {
+            "Date": ["2024-01-04", "2024-01-05", "2024-01-04"],
+            "Ticker": ["72030", "72030", "130A0"],
+            "Close": [1.0, 2.0, 3.0],
+        }
+    ).to_csv(path, index=False)
+    return path
+
+
+def test_read_watermarks(prices, tmp_path):
+    assert read_watermarks(tmp_path / "none.csv") == {}
+    assert read_watermarks(prices) == {"72030": "2024-01-05", "130A0": "2024-01-04"}
+    assert os.path.exists(f"{prices}.watermarks.json")
+
+
+def test_stored_watermarks(prices, monkeypatch):
+    read_watermarks(prices)
+
+    # Stored watermarks are used without reading the file.
+    def read_csv(*args, **kwargs):
+        raise AssertionError("read_csv")
+
+    with monkeypatch.context() as m:
+        m.setattr(pd, "read_csv", read_csv)
+        assert read_watermarks(prices)["72030"] == "2024-01-05"
+
+    # A file modified without updating watermarks is read again.
+    with open(prices, "a") as f:
+        f.write("2024-01-09,72030,4.0\n")
+    assert read_watermarks(prices)["72030"] == "2024-01-09"
+
+
+def test_update_watermarks(prices, monkeypatch):
+    watermarks = read_watermarks(prices)
+    new = pd.DataFrame(
+        {"Date": pd.to_datetime(["2024-01-09", "2024-01-08"]), "Ticker": ["72030"] * 2}
+    )
+    with open(prices, "a") as f:
+        f.write("2024-01-09,72030,4.0\n2024-01-08,72030,5.0\n")
+
+    assert update_watermarks(prices, new, watermarks) == {
+        "72030": "2024-01-09",
+        "130A0": "2024-01-04",
+    }
+
+    monkeypatch.setattr(pd, "read_csv", None)
+    assert read_watermarks(prices)["72030"] == "2024-01-09"
+
+
+def test_missing_ranges():
+    watermarks = {"72030": "2024-01-05", "130A0": "2024-01-09"}
+
+    assert missing_ranges(
+        ["72030", "130A0", "99840"], watermarks, "2024-01-01", "2024-01-09"
+    ) == {
+        "72030": ("2024-01-06", "2024-01-09"),
+        "99840": ("2024-01-01", "2024-01-09"),
+    }
+    assert missing_ranges(["72030", "99840"], watermarks) == {
+        "72030": ("2024-01-06", None),
+        "99840": (None, None),
+    }
+
+
+def test_earliest_watermark():
+    watermarks = {"72030": "2024-01-05", "130A0": "2024-01-09"}
+
+    assert earliest_watermark(watermarks) == "2024-01-05"
+    assert earliest_watermark(watermarks, ["130A0"]) == "2024-01-09"
+    # Keys without a watermark are fetched in full.
+    assert earliest_watermark(watermarks, ["130A0", "99840"]) is None
+    assert earliest_watermark({}) is None
+
+
+def test_filter_after_watermarks():
+    df = pd.DataFrame(
+        {
+            "Date": ["2024-01-05", "2024-01-08", "2024-01-08", "2024-01-05"],
+            "Code": ["72030", "72030", "130A0", "99840"],
+        }
+    )
+    watermarks = {"72030": "2024-01-05", "130A0": "2024-01-09"}
+
+    assert filter_after_watermarks(df, watermarks, "Code").values.tolist() == [
+        ["2024-01-08", "72030"],
+        ["2024-01-05", "99840"],
+    ]
+    assert filter_after_watermarks(df, {}, "Code") is df
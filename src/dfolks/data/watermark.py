@@ -0,0 +1,175 @@
+"""Watermarks of data saved in a file; the latest date of each key, e.g. a ticker.
+
+1) read_watermarks: Return the latest date of each key in a file.
+2) update_watermarks: Update watermarks of a file by data saved in the file.
+3) missing_ranges: Return date ranges of keys after their watermarks.
+4) earliest_watermark: Return the earliest watermark of keys, e.g. to fetch by date.
+5) filter_after_watermarks: Keep rows after the watermark of their key.
+
+Watermarks are stored next to a file as <file>.watermarks.json with the size and
+modified time of the file. If the file was modified without updating them, e.g. by
+another workflow, watermarks are read from the key and date columns of the file again.
+
+Need to do
+0) Documentation.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+# Set up shared logger
+logger = logging.getLogger("shared")
+
+# Suffix of a watermark file stored next to a file.
+__watermark_suffix__ = ".watermarks.json"
+
+
+def _watermark_path(path) -> Path:
+    """Return a path of the watermark file of a file."""
+    return Path(f"{path}{__watermark_suffix__}")
+
+
+def _file_stamp(path) -> Dict:
+    """Return size and modified time of a file to detect modifications."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _latest_dates(df: pd.DataFrame, key_col: str, date_col: str) -> Dict[str, str]:
+    """Return the latest date of each key as YYYY-MM-DD."""
+    dates = pd.to_datetime(df[date_col], errors="coerce")
+    latest = dates.groupby(df[key_col].astype(str)).max().dropna()
+
+    return latest.dt.strftime("%Y-%m-%d").to_dict()
+
+
+def _write_watermarks(
+    path, watermarks: Dict[str, str], key_col: str, date_col: str
+) -> None:
+    """Write watermarks of a file with its current size and modified time."""
+    index = {
+        "columns": [key_col, date_col],
+        "file": _file_stamp(path),
+        "watermarks": watermarks,
+    }
+    index_path = _watermark_path(path)
+    tmp_path = index_path.with_name(f"{index_path.name}.tmp")
+    tmp_path.write_text(json.dumps(index, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, index_path)
+
+
+def read_watermarks(
+    path, key_col: str = "Ticker", date_col: str = "Date"
+) -> Dict[str, str]:
+    """Return the latest date of each key in a file; empty if the file does not exist.
+
+    Stored watermarks are used if the file was not modified since they were written,
+    otherwise only key_col and date_col of the file are read and watermarks are stored.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+
+    try:
+        index = json.loads(_watermark_path(path).read_text(encoding="utf-8"))
+        if index["columns"] == [key_col, date_col] and index["file"] == _file_stamp(
+            path
+        ):
+            return index["watermarks"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    logger.info(f"Reading watermarks from {path}.")
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path, columns=[key_col, date_col])
+    else:
+        df = pd.read_csv(path, usecols=[key_col, date_col], dtype={key_col: str})
+    watermarks = _latest_dates(df, key_col, date_col)
+    _write_watermarks(path, watermarks, key_col, date_col)
+
+    return watermarks
+
+
+def update_watermarks(
+    path,
+    df: pd.DataFrame,
+    watermarks: Optional[Dict[str, str]] = None,
+    key_col: str = "Ticker",
+    date_col: str = "Date",
+) -> Dict[str, str]:
+    """Update watermarks of a file by data just saved in the file and return them.
+
+    watermarks: Watermarks of the file before df was saved, e.g. by read_watermarks;
+        None if df replaced the file.
+    """
+    watermarks = dict(watermarks or {})
+    for key, date in _latest_dates(df, key_col, date_col).items():
+        if key not in watermarks or watermarks[key] < date:
+            watermarks[key] = date
+    _write_watermarks(path, watermarks, key_col, date_col)
+
+    return watermarks
+
+
+def missing_ranges(
+    keys: Iterable[str],
+    watermarks: Dict[str, str],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """Return (start, end) dates of keys to fetch; keys up to end_date are excluded.
+
+    A key starts from the day after its watermark, or from start_date if the key has no
+    watermark. end_date is inclusive; None for no limit.
+    """
+    end_date = None if end_date is None else pd.Timestamp(end_date)
+    ranges = {}
+    for key in dict.fromkeys(keys):
+        if key in watermarks:
+            start = pd.Timestamp(watermarks[key]) + pd.Timedelta(days=1)
+        else:
+            start = None if start_date is None else pd.Timestamp(start_date)
+        if start is not None and end_date is not None and start > end_date:
+            continue
+        ranges[key] = tuple(
+            None if date is None else date.strftime("%Y-%m-%d")
+            for date in (start, end_date)
+        )
+
+    return ranges
+
+
+def earliest_watermark(
+    watermarks: Dict[str, str], keys: Optional[List[str]] = None
+) -> Optional[str]:
+    """Return the earliest watermark of keys; None if any key has no watermark.
+
+    keys: None for all keys with watermarks.
+    """
+    if keys is None:
+        return min(watermarks.values(), default=None)
+    if not keys or any(key not in watermarks for key in keys):
+        return None
+
+    return min(watermarks[key] for key in keys)
+
+
+def filter_after_watermarks(
+    df: pd.DataFrame,
+    watermarks: Dict[str, str],
+    key_col: str = "Ticker",
+    date_col: str = "Date",
+) -> pd.DataFrame:
+    """Return rows of df after the watermark of their key; keys without one are kept."""
+    if df.empty or not watermarks:
+        return df
+
+    marks = pd.to_datetime(df[key_col].astype(str).map(watermarks))
+    dates = pd.to_datetime(df[date_col], errors="coerce")
+
+    return df[marks.isna() | (dates > marks)].reset_index(drop=True)
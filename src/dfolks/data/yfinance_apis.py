@@ -1,67 +1,194 @@
 """API calls to get data from Yahoo finance.
 
+All requests are sent within the rate limit of "yfinance" (dfolks.data.ratelimit);
+YFRateLimitError is retried with backoff.
+Functions of a ticker accept a code or a yf.Ticker, thus one Ticker can be shared
+by all statements of a code; e.g. get_yfinance_fin_report.
+download_yfinance_data downloads many tickers in chunks; each chunk is checkpointed
+below Home directory/DataHive/checkpoint/yfinance, thus a failed run is resumed.
+
 Need to do
 0) Add more api calls.
 """
 
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
 import pandas as pd
 import yfinance as yf
+from yfinance.exceptions import YFRateLimitError
+
+from dfolks.core.modules import ContextThreadPoolExecutor
+from dfolks.data.ratelimit import get_rate_limiter
+
+# Set up shared logger
+logger = logging.getLogger("shared")
+
+# Default folder of checkpoints of chunked downloads.
+__checkpoint_dir__ = Path.joinpath(Path.home(), "DataHive", "checkpoint", "yfinance")
+
+# yf.download keeps its results in module globals; one download runs at a time.
+__download_lock__ = threading.Lock()
+
 
+def _fetch(func, *args, **kwargs):
+    """Call yfinance within the rate limit of yfinance and retry rate limit errors."""
+    return get_rate_limiter("yfinance").call(
+        func, *args, retry_exceptions=(YFRateLimitError,), **kwargs
+    )
 
-def get_yfinance_ticker(ticker: str) -> yf.Ticker:
-    """Get yfinance Ticker object."""
+
+def get_yfinance_ticker(ticker: Union[str, yf.Ticker]) -> yf.Ticker:
+    """Get yfinance Ticker object; a Ticker is returned as is."""
+    if not isinstance(ticker, str):
+        return ticker
     return yf.Ticker(ticker)
 
 
-def get_yfinance_info(ticker: str) -> pd.DataFrame:
+def get_yfinance_info(ticker: Union[str, yf.Ticker]) -> pd.DataFrame:
     """Get yfinance Ticker info."""
     yf_ticker = get_yfinance_ticker(ticker)
-    df = pd.DataFrame(yf_ticker.info.items(), columns=["key", "value"])
+    df = pd.DataFrame(
+        _fetch(getattr, yf_ticker, "info").items(), columns=["key", "value"]
+    )
     df_pivot = df.set_index("key").transpose().reset_index(drop=True)
 
     return df_pivot
 
 
-def get_yfinance_income_statement(ticker: str) -> pd.DataFrame:
+def get_yfinance_income_statement(ticker: Union[str, yf.Ticker]) -> pd.DataFrame:
     """Get yfinance Ticker income statement."""
     yf_ticker = get_yfinance_ticker(ticker)
-    df = yf_ticker.income_stmt.transpose().reset_index()
-    df["ticker"] = ticker
+    df = _fetch(getattr, yf_ticker, "income_stmt").transpose().reset_index()
+    df["ticker"] = yf_ticker.ticker
     df.rename(columns={"index": "date"}, inplace=True)
 
     return df
 
 
-def get_yfinance_balance_sheet(ticker: str) -> pd.DataFrame:
+def get_yfinance_balance_sheet(ticker: Union[str, yf.Ticker]) -> pd.DataFrame:
     """Get yfinance Ticker balance sheet."""
     yf_ticker = get_yfinance_ticker(ticker)
-    df = yf_ticker.balance_sheet.transpose().reset_index()
-    df["ticker"] = ticker
+    df = _fetch(getattr, yf_ticker, "balance_sheet").transpose().reset_index()
+    df["ticker"] = yf_ticker.ticker
     df.rename(columns={"index": "date"}, inplace=True)
 
     return df
 
 
-def get_yfinance_cash_flow(ticker: str) -> pd.DataFrame:
+def get_yfinance_cash_flow(ticker: Union[str, yf.Ticker]) -> pd.DataFrame:
     """Get yfinance Ticker cash flow statement."""
     yf_ticker = get_yfinance_ticker(ticker)
-    df = yf_ticker.cashflow.transpose().reset_index()
-    df["ticker"] = ticker
+    df = _fetch(getattr, yf_ticker, "cashflow").transpose().reset_index()
+    df["ticker"] = yf_ticker.ticker
     df.rename(columns={"index": "date"}, inplace=True)
 
     return df
 
 
-def get_yfinance_dividends(ticker: str) -> pd.DataFrame:
+def get_yfinance_dividends(ticker: Union[str, yf.Ticker]) -> pd.DataFrame:
     """Get yfinance Ticker dividends."""
     yf_ticker = get_yfinance_ticker(ticker)
-    df = pd.DataFrame(yf_ticker.dividends).reset_index()
-    df["ticker"] = ticker
+    df = pd.DataFrame(_fetch(getattr, yf_ticker, "dividends")).reset_index()
+    df["ticker"] = yf_ticker.ticker
     df.rename(columns={"Date": "date"}, inplace=True)
 
     return df
 
 
+def get_yfinance_fin_report(
+    ticker: Union[str, yf.Ticker],
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Get income statement, balance sheet, cash flow and dividends by one Ticker."""
+    yf_ticker = get_yfinance_ticker(ticker)
+
+    return (
+        get_yfinance_income_statement(yf_ticker),
+        get_yfinance_balance_sheet(yf_ticker),
+        get_yfinance_cash_flow(yf_ticker),
+        get_yfinance_dividends(yf_ticker),
+    )
+
+
+def get_yfinance_fin_reports(
+    tickers: List[str], max_workers: int = 8
+) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+    """Get financial reports of tickers by get_yfinance_fin_report; in the order of tickers.
+
+    Tickers are fetched concurrently by max_workers threads within the rate limit of
+    "yfinance". Errors are raised after all other tickers are fetched.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    results = {}
+    errors = {}
+    with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(get_yfinance_fin_report, ticker): ticker
+            for ticker in tickers
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            ticker = futures[future]
+            try:
+                results[ticker] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to fetch {ticker}: {e}")
+                errors[ticker] = e
+            if i % 100 == 0:
+                logger.info(f"Fetched {i} of {len(tickers)} tickers.")
+
+    if errors:
+        raise Exception(f"Failed to fetch {len(errors)} tickers: {list(errors)}")
+
+    return {ticker: results[ticker] for ticker in tickers}
+
+
+def stack_tickers(df: pd.DataFrame) -> pd.DataFrame:
+    """Reshape a download grouped by ticker into rows of date and ticker.
+
+    Same as df.stack(level=0).reset_index(): tickers are sorted, fields keep their
+    order and rows without any value are dropped. Values are gathered from a view of
+    the NumPy block of df into each output column at once, without intermediate frames.
+    """
+    date_name = df.index.name or "Date"
+    ticker_name = df.columns.names[0] or "Ticker"
+    tickers = df.columns.get_level_values(0).unique()
+    fields = df.columns.get_level_values(1).unique()
+
+    # Columns of a ticker must be adjacent in the order of fields.
+    columns = pd.MultiIndex.from_product([tickers, fields], names=df.columns.names)
+    if not df.columns.equals(columns):
+        df = df.reindex(columns=columns)
+
+    # A view of the block if df has one dtype: (tickers, fields, dates).
+    values = df.to_numpy().T.reshape(len(tickers), len(fields), len(df))
+
+    # Rows of sorted tickers by date with any value.
+    order = np.argsort(tickers.to_numpy(), kind="stable")
+    has_value = ~pd.isna(values).all(axis=1)
+    dates, positions = np.nonzero(has_value[order].T)
+    positions = order[positions]
+
+    data = {
+        date_name: df.index.take(dates),
+        ticker_name: tickers.take(positions).to_numpy(),
+    }
+    for j, field in enumerate(fields):
+        data[field] = values[positions, j, dates]
+
+    df_long = pd.DataFrame(data, copy=False)
+    df_long.columns.name = df.columns.names[1]
+
+    return df_long
+
+
 def get_yfinance_data(
     tickers: list,
     period: str = None,
@@ -69,7 +196,11 @@ def get_yfinance_data(
     start_date: str = None,
     end_date: str = None,
 ) -> pd.DataFrame:
-    """Download yfinance Ticker data."""
+    """Download yfinance Ticker data.
+
+    yf.download is not safe to call concurrently, thus downloads are serialised by
+    __download_lock__; tickers of a download are fetched by threads of yfinance.
+    """
     if period is not None and (start_date is not None and end_date is not None):
         raise ValueError(
             "If period provided then start_date or end_date is not required."
@@ -79,25 +210,120 @@ def get_yfinance_data(
             "If period is not provided then start_date and end_date are required."
         )
 
-    if period is not None:
-        if interval is not None:
-            yf_stock = yf.download(
+    with __download_lock__:
+        if period is not None:
+            if interval is not None:
+                yf_stock = _fetch(
+                    yf.download,
+                    tickers,
+                    period=period,
+                    interval=interval,
+                    group_by="ticker",
+                    threads=True,
+                )
+            else:
+                yf_stock = _fetch(
+                    yf.download, tickers, period=period, group_by="ticker", threads=True
+                )
+        elif period is None and (start_date is not None and end_date is not None):
+            yf_stock = _fetch(
+                yf.download,
                 tickers,
-                period=period,
-                interval=interval,
+                start=start_date,
+                end=end_date,
                 group_by="ticker",
                 threads=True,
             )
-        else:
-            yf_stock = yf.download(
-                tickers, period=period, group_by="ticker", threads=True
-            )
-    elif period is None and (start_date is not None and end_date is not None):
-        yf_stock = yf.download(
-            tickers, start=start_date, end=end_date, group_by="ticker", threads=True
-        )
 
-    df = yf_stock.stack(level=0).reset_index()
+    df = stack_tickers(yf_stock)
     df.rename(columns={"Date": "date", "Ticker": "ticker"}, inplace=True)
 
     return df
+
+
+def yfinance_checkpoint_dir(
+    tickers: List[str], checkpoint_dir: Optional[str] = None, **params
+) -> Path:
+    """Return a checkpoint folder of a chunked download of tickers with params.
+
+    The folder is specific to tickers and params; e.g. chunk_size, period or start_date.
+    A download by period is relative to today, thus also specific to today.
+    """
+    root = Path(checkpoint_dir) if checkpoint_dir else __checkpoint_dir__
+    if params.get("period") is not None:
+        params["today"] = datetime.date.today().isoformat()
+    raw = json.dumps([list(tickers), sorted(params.items())], default=str)
+
+    return root / hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def download_yfinance_data(
+    tickers: List[str],
+    chunk_size: int = 100,
+    max_workers: int = 4,
+    checkpoint_dir: Optional[Union[str, Path]] = None,
+    period: str = None,
+    interval: str = None,
+    start_date: str = None,
+    end_date: str = None,
+) -> pd.DataFrame:
+    """Download yfinance data of tickers in chunks by get_yfinance_data.
+
+    Chunks of chunk_size tickers are downloaded one at a time within the rate limit of
+    "yfinance", thus a wide frame of a download is bounded by chunk_size. max_workers
+    threads overlap a download with reshaping and checkpoints of other chunks.
+    Chunks are combined in the order of tickers.
+
+    checkpoint_dir: Folder to save each chunk when downloaded; e.g. yfinance_checkpoint_dir.
+        Chunks saved in the folder are read instead of downloaded, thus a failed run is
+        resumed by running it again. None for no checkpoints.
+    Errors are raised after all other chunks are downloaded.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    chunks = [tickers[i : i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+    if checkpoint_dir is not None:
+        checkpoint_dir = Path(checkpoint_dir)
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    def download(i):
+        path = None if checkpoint_dir is None else checkpoint_dir / f"chunk_{i}.pkl"
+        if path is not None and path.exists():
+            logger.info(f"Chunk {i} is read from checkpoint {path}.")
+            return pd.read_pickle(path)
+
+        df = get_yfinance_data(
+            chunks[i],
+            period=period,
+            interval=interval,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        if path is not None:
+            # Write to a temporary file first; a partial chunk is never read.
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            df.to_pickle(temp_path)
+            os.replace(temp_path, path)
+
+        return df
+
+    results = {}
+    errors = {}
+    logger.info(f"Downloading {len(tickers)} tickers in {len(chunks)} chunks.")
+    with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(download, i): i for i in range(len(chunks))}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to download chunk {i}: {e}")
+                errors[i] = e
+
+    if errors:
+        raise Exception(
+            f"Failed to download {len(errors)} of {len(chunks)} chunks: {sorted(errors)}"
+        )
+
+    if not results:
+        return pd.DataFrame(columns=["date", "ticker"])
+    return pd.concat([results[i] for i in range(len(chunks))], ignore_index=True)
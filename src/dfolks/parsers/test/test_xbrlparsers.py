@@ -3,12 +3,25 @@
 Need to do:
 """
 
+import pickle
 from types import SimpleNamespace
 
 import pandas as pd
 import pytest
 
-from dfolks.parsers.xbrlparser import EdinetXbrlParser
+from dfolks.core.classfactory import load_class
+from dfolks.parsers import xbrlparser
+from dfolks.parsers.xbrlparser import (
+    EdinetXbrlParser,
+    EdinetXbrlStreamParser,
+    XbrlFactAccumulator,
+    XbrlInstance,
+    get_xbrl_tag_map,
+    iter_extract_edinet_xbrl_files,
+    parse_edinet_xbrl_files,
+    set_arelle_cache,
+    warm_arelle_cache,
+)
 
 
 class MockQName:
@@ -79,3 +92,366 @@ def test_parse_edinet_xbrl(mock_model_xbrl):
     # Check numeric conversion
     assert pd.api.types.is_numeric_dtype(df["Net sales"])
     assert df["Net sales"].iloc[0] == 100000
+
+
+def test_parse_edinet_xbrl_single_pass(mock_model_xbrl):
+    # DEI facts after financial facts and facts of other periods.
+    facts = mock_model_xbrl.facts[5:] + [
+        MockFact("OperatingIncome", "10000", "ctx_Prior1YearDuration"),
+        MockFact("NumberOfEmployees", "100", "ctx_CurrentYearInstant"),
+    ]
+    facts += mock_model_xbrl.facts[:5]
+    parser = EdinetXbrlParser(
+        model_xbrl=SimpleNamespace(facts=facts), source_path="mock_file.xbrl"
+    )
+    df = parser.parse()
+
+    assert len(df) == 1
+    assert df["Ticker"].iloc[0] == "7203"
+    assert df["Operating profit"].iloc[0] == 20000
+    assert df["Employees"].iloc[0] == 100
+
+
+def test_parse_edinet_xbrl_unknown_standard(mock_model_xbrl):
+    facts = [
+        (
+            MockFact("AccountingStandardsDEI", "Unknown GAAP")
+            if f.concept.qname.localName == "AccountingStandardsDEI"
+            else f
+        )
+        for f in mock_model_xbrl.facts
+    ]
+    parser = EdinetXbrlParser(
+        model_xbrl=SimpleNamespace(facts=facts), source_path="mock_file.xbrl"
+    )
+
+    assert parser.parse().empty
+
+
+class MockModelManager:
+    def __init__(self, models):
+        self.models = models
+
+    def load(self, file):
+        return self.models[file]
+
+
+@pytest.fixture
+def mock_arelle_controller(monkeypatch, mock_model_xbrl, tmp_path):
+    models = {
+        "a.xbrl": SimpleNamespace(facts=mock_model_xbrl.facts, close=lambda: None),
+        "b.xbrl": SimpleNamespace(facts=mock_model_xbrl.facts, close=lambda: None),
+        # No AccountingStandardsDEI.
+        "broken.xbrl": SimpleNamespace(
+            facts=[MockFact("OperatingIncome", "20000")], close=lambda: None
+        ),
+    }
+    controller = SimpleNamespace(
+        modelManager=MockModelManager(models),
+        webCache=SimpleNamespace(cacheDir=None, workOffline=False),
+    )
+    monkeypatch.setattr(xbrlparser, "__arelle_controller__", controller)
+    monkeypatch.setattr(
+        xbrlparser,
+        "__arelle_cache_config__",
+        xbrlparser.ArelleCacheConfig(cache_dir=str(tmp_path)),
+    )
+    return controller
+
+
+def test_get_arelle_controller_is_reused(mock_arelle_controller):
+    assert xbrlparser.get_arelle_controller() is mock_arelle_controller
+    assert xbrlparser.get_arelle_controller() is mock_arelle_controller
+
+
+def test_parse_edinet_xbrl_files(mock_arelle_controller):
+    df = parse_edinet_xbrl_files(["b.xbrl", "a.xbrl"], max_workers=1)
+
+    assert len(df) == 2
+    assert df["source_path"].tolist() == ["b.xbrl", "a.xbrl"]
+
+
+def test_parse_edinet_xbrl_files_errors(mock_arelle_controller):
+    with pytest.raises(Exception, match="broken.xbrl"):
+        parse_edinet_xbrl_files(["a.xbrl", "broken.xbrl"], max_workers=1)
+
+
+def test_parse_edinet_xbrl_files_process_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(xbrlparser, "__arelle_cache_config__", None)
+    files = [str(tmp_path / "missing_1.xbrl"), str(tmp_path / "missing_2.xbrl")]
+    cache_dir = tmp_path / "arelle_cache"
+
+    # Arelle loads no facts from missing files.
+    df = parse_edinet_xbrl_files(
+        files, max_workers=2, cache={"cache_dir": str(cache_dir)}
+    )
+
+    assert df.empty
+    # Workers use the taxonomy cache of the caller.
+    assert cache_dir.is_dir()
+
+
+def test_set_arelle_cache_updates_controller(mock_arelle_controller, tmp_path):
+    set_arelle_cache({"cache_dir": str(tmp_path / "cache"), "work_offline": True})
+
+    assert mock_arelle_controller.webCache.cacheDir == str(tmp_path / "cache")
+    assert mock_arelle_controller.webCache.workOffline is True
+    assert (tmp_path / "cache").is_dir()
+
+
+def test_warm_arelle_cache(mock_arelle_controller, tmp_path):
+    models = mock_arelle_controller.modelManager.models
+    models["a.xsd"] = SimpleNamespace(modelDocument=object(), close=lambda: None)
+    models["missing.xsd"] = SimpleNamespace(modelDocument=None, close=lambda: None)
+
+    failed = warm_arelle_cache(
+        ["a.xsd", "missing.xsd"],
+        {"cache_dir": str(tmp_path), "work_offline": True},
+    )
+
+    assert failed == ["missing.xsd"]
+    # Taxonomy files are fetched while warming the cache.
+    assert mock_arelle_controller.webCache.workOffline is False
+    assert mock_arelle_controller.webCache.cacheDir == str(tmp_path)
+
+
+@pytest.fixture
+def xbrl_instance(tmp_path):
+    path = tmp_path / "instance.xbrl"
+    path.write_text(
+        """<?xml version="1.0" encoding="UTF-8"?>
+<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance"
+    xmlns:dei="http://disclosure.edinet-fsa.go.jp/taxonomy/jpdei/2013-08-31/jpdei_cor"
+    xmlns:crp="http://disclosure.edinet-fsa.go.jp/taxonomy/jpcrp/2024-11-01/jpcrp_cor"
+    xmlns:pfs="http://disclosure.edinet-fsa.go.jp/taxonomy/jppfs/2024-11-01/jppfs_cor">
+  <xbrli:context id="CurrentYearDuration">
+    <xbrli:entity><xbrli:identifier scheme="x">E00001</xbrli:identifier></xbrli:entity>
+  </xbrli:context>
+  <dei:SecurityCodeDEI contextRef="FilingDateInstant">7203</dei:SecurityCodeDEI>
+  <dei:EDINETCodeDEI contextRef="FilingDateInstant">E00001</dei:EDINETCodeDEI>
+  <dei:AccountingStandardsDEI contextRef="FilingDateInstant">
+    Japan GAAP
+  </dei:AccountingStandardsDEI>
+  <dei:CurrentFiscalYearStartDateDEI contextRef="FilingDateInstant">
+    2024-04-01
+  </dei:CurrentFiscalYearStartDateDEI>
+  <dei:CurrentFiscalYearEndDateDEI contextRef="FilingDateInstant">
+    2025-03-31
+  </dei:CurrentFiscalYearEndDateDEI>
+  <crp:NetSalesSummaryOfBusinessResults contextRef="CurrentYearDuration" unitRef="JPY">
+    100000
+  </crp:NetSalesSummaryOfBusinessResults>
+  <crp:NetSalesSummaryOfBusinessResults contextRef="Prior1YearDuration" unitRef="JPY">
+    90000
+  </crp:NetSalesSummaryOfBusinessResults>
+  <pfs:OperatingIncome contextRef="CurrentYearDuration" unitRef="JPY">
+    20000
+  </pfs:OperatingIncome>
+  <crp:ProfitLossAttributableToOwnersOfParentSummaryOfBusinessResults
+    contextRef="CurrentYearInstant" unitRef="JPY"
+  >15000</crp:ProfitLossAttributableToOwnersOfParentSummaryOfBusinessResults>
+  <pfs:CashAndDeposits contextRef="CurrentYearInstant" unitRef="JPY">5000</pfs:CashAndDeposits>
+</xbrli:xbrl>
+""",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_xbrl_instance_facts(xbrl_instance):
+    facts = list(XbrlInstance(xbrl_instance, frozenset({"OperatingIncome"})).facts)
+
+    assert len(facts) == 1
+    assert facts[0].concept.qname.localName == "OperatingIncome"
+    assert facts[0].contextID == "CurrentYearDuration"
+    assert facts[0].value == "20000"
+    assert facts[0].unitID == "JPY"
+    # Elements without contextRef are not facts.
+    assert len(list(XbrlInstance(xbrl_instance).facts)) == 10
+
+
+def test_parse_edinet_xbrl_stream(xbrl_instance, mock_model_xbrl):
+    parser = load_class({"kind": "EdinetXbrlStreamParser", "source_path": "x.xbrl"})
+    assert isinstance(parser, EdinetXbrlStreamParser)
+
+    df = EdinetXbrlStreamParser(source_path=xbrl_instance).parse()
+    df_arelle = EdinetXbrlParser(
+        model_xbrl=mock_model_xbrl, source_path=xbrl_instance
+    ).parse()
+
+    pd.testing.assert_frame_equal(df, df_arelle)
+
+
+def test_parse_edinet_xbrl_files_stream(xbrl_instance):
+    df = parse_edinet_xbrl_files(
+        [xbrl_instance], max_workers=1, parser="EdinetXbrlStreamParser"
+    )
+
+    assert df["Net sales"].iloc[0] == 100000
+    assert df["source_path"].iloc[0] == xbrl_instance
+
+
+def test_parse_edinet_xbrl_files_unknown_parser(xbrl_instance):
+    with pytest.raises(Exception, match="instance.xbrl"):
+        parse_edinet_xbrl_files([xbrl_instance], max_workers=1, parser="Unknown")
+
+
+def test_iter_extract_edinet_xbrl_files(monkeypatch, xbrl_instance, tmp_path):
+    monkeypatch.setattr(xbrlparser, "__arelle_cache_config__", None)
+    taken = []
+
+    def files():
+        for i in range(5):
+            taken.append(i)
+            yield xbrl_instance if i != 2 else str(tmp_path / "missing.xbrl")
+
+    parsed = []
+    for file, result, error in iter_extract_edinet_xbrl_files(
+        files(),
+        max_workers=2,
+        cache={"cache_dir": str(tmp_path / "arelle_cache")},
+        parser="EdinetXbrlStreamParser",
+        max_pending=2,
+    ):
+        # Files are taken only when pending files are yielded.
+        assert len(taken) - len(parsed) <= 2
+        parsed.append(file)
+        if file == xbrl_instance:
+            assert error is None
+            assert result.to_frame()["Net sales"].iloc[0] == 100000
+        else:
+            assert result is None
+            assert error is not None
+
+    assert len(parsed) == 5
+
+
+@pytest.fixture
+def xbrl_tags_yaml(tmp_path):
+    path = tmp_path / "xbrl_tags.yaml"
+    path.write_text(
+        """version: "test"
+tags:
+  "Japan GAAP":
+    NetSalesSummaryOfBusinessResults: "Net sales"
+    OperatingIncome: "Operating profit"
+overrides:
+  2025:
+    "Japan GAAP":
+      OperatingIncome: "Operating income"
+      NumberOfEmployees: "Employees"
+  2030:
+    "IFRS":
+      RevenueIFRSSummaryOfBusinessResults: "Net sales"
+""",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_get_xbrl_tag_map():
+    tag_map = get_xbrl_tag_map()
+
+    assert tag_map is get_xbrl_tag_map()
+    assert tag_map.get("Japan GAAP")["OperatingIncome"] == "Operating profit"
+    assert "RevenueIFRSSummaryOfBusinessResults" in tag_map.all_tags
+    with pytest.raises(TypeError):
+        tag_map.get("Japan GAAP")["OperatingIncome"] = "Changed"
+
+
+def test_get_xbrl_tag_map_overrides(xbrl_tags_yaml):
+    tag_map = get_xbrl_tag_map(f"file://{xbrl_tags_yaml}")
+
+    assert tag_map.version == "test"
+    assert tag_map is get_xbrl_tag_map(xbrl_tags_yaml)
+    assert tag_map.get("Japan GAAP", 2024)["OperatingIncome"] == "Operating profit"
+    assert tag_map.get("Japan GAAP", 2025)["OperatingIncome"] == "Operating income"
+    assert tag_map.get("Japan GAAP", 2031) is tag_map.get("Japan GAAP", 2031)
+    assert "NumberOfEmployees" not in tag_map.get("Japan GAAP")
+    assert tag_map.get("IFRS", 2030) == {
+        "RevenueIFRSSummaryOfBusinessResults": "Net sales"
+    }
+    assert "NumberOfEmployees" in tag_map.all_tags
+
+
+def test_parse_edinet_xbrl_tag_path(mock_model_xbrl, xbrl_tags_yaml):
+    parser = EdinetXbrlParser(
+        model_xbrl=mock_model_xbrl, source_path="x.xbrl", tag_path=xbrl_tags_yaml
+    )
+    df = parser.parse()
+
+    # Fiscal year of the filing ends in 2025.
+    assert "Operating income" in df.columns
+    assert "Operating profit" not in df.columns
+    assert "Profit" not in df.columns
+
+
+def _accumulate(accumulator, ticker, source_path, facts):
+    file_id = accumulator.add_file(
+        **{
+            "Ticker": ticker,
+            "Edinet code": f"E{ticker}",
+            "Period start date": "2024-04-01",
+            "Period end date": "2025-03-31",
+            "Account standard": "Japan GAAP",
+            "source_path": source_path,
+        }
+    )
+    for attribute, context, value in facts:
+        accumulator.add_fact(file_id, attribute, attribute, context, value, "JPY")
+    return accumulator
+
+
+def test_xbrl_fact_accumulator():
+    accumulator = XbrlFactAccumulator()
+    _accumulate(
+        accumulator,
+        "1000",
+        "a.xbrl",
+        [
+            ("Net sales", "CurrentYearDuration", "100"),
+            ("Net sales", "CurrentYearDuration_NonConsolidatedMember", "50"),
+            # Duplicated facts are counted once.
+            ("Net sales", "CurrentYearDuration_NonConsolidatedMember", "50"),
+        ],
+    )
+    # Workers return accumulators which are combined in the order of files.
+    other = pickle.loads(
+        pickle.dumps(
+            _accumulate(
+                XbrlFactAccumulator(),
+                "2000",
+                "b.xbrl",
+                [
+                    ("Profit", "CurrentYearDuration", "10"),
+                    ("Net sales", "CurrentYearDuration", "-"),
+                ],
+            )
+        )
+    )
+    _accumulate(other, "3000", "c.xbrl", [("Employees", "CurrentYearInstant", "-")])
+    accumulator.extend(other)
+
+    df = accumulator.to_frame()
+
+    assert len(accumulator) == 6
+    assert accumulator.n_files == 3
+    # c.xbrl has no numeric values; Employees is dropped.
+    assert df.columns.tolist() == [
+        "Ticker",
+        "Edinet code",
+        "Period start date",
+        "Period end date",
+        "Account standard",
+        "Net sales",
+        "Profit",
+        "source_path",
+    ]
+    assert df["source_path"].tolist() == ["a.xbrl", "b.xbrl"]
+    assert df["Net sales"].iloc[0] == 75
+    assert pd.isna(df["Net sales"].iloc[1])
+    assert df["Profit"].iloc[1] == 10
+
+
+def test_xbrl_fact_accumulator_empty():
+    assert XbrlFactAccumulator().to_frame().empty
@@ -1,20 +1,377 @@
 """XBRL parsers.
 
+1) EdinetXbrlParser: map facts of an EDINET XBRL model to a DataFrame.
+2) EdinetXbrlStreamParser: map facts of an EDINET XBRL instance read by lxml iterparse.
+   Taxonomies are neither loaded nor validated; much faster than loading by Arelle.
+3) parse_edinet_xbrl_file/parse_edinet_xbrl_files: load XBRL files and parse them.
+   Facts are extracted into a XbrlFactAccumulator and pivoted at once for all files.
+   iter_extract_edinet_xbrl_files yields facts of files as they are parsed.
+4) get_xbrl_tag_map: tags of financial data loaded from a YAML file once per process.
+5) ArelleCacheConfig/set_arelle_cache: on-disk cache of taxonomy files used by Arelle.
+6) warm_arelle_cache: download taxonomy files of entry points into the cache in advance.
+
+XBRL files are parsed in a process pool; each worker process keeps one Arelle
+controller for all files it parses. Taxonomy files referenced by XBRL files are
+fetched once into the cache (Home directory/DataHive/arelle_cache by default);
+with work_offline, they are never fetched again, e.g. after warm_arelle_cache.
+
 Need to do
 0) XBRL input: not valiable but def?
 1) More add functionality and values
 """
 
+import argparse
 import logging
-from typing import Any, ClassVar, Dict
+import math
+import os
+import threading
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from types import MappingProxyType
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sized,
+    Tuple,
+)
 
+import numpy as np
 import pandas as pd
+from lxml import etree
+from pydantic import BaseModel
 
-from dfolks.core.classfactory import NormalClassRegistery
+from dfolks.core.classfactory import NormalClassRegistery, get_class
+from dfolks.core.mixin import FILEPREFIX, ExternalFileMixin
+from dfolks.core.modules import set_logger
 
 # Set up shared logger
 logger = logging.getLogger("shared")
 
+# Default folder of the taxonomy cache of Arelle.
+__arelle_cache_dir__ = Path.joinpath(Path.home(), "DataHive", "arelle_cache")
+
+# Arelle controller of the process; created at first use and kept for all files.
+__arelle_controller__ = None
+# Taxonomy cache of Arelle controllers of the process.
+__arelle_cache_config__ = None
+
+# DEI tags of common metadata; XBRL localName -> column.
+__dei_tags__ = {
+    "SecurityCodeDEI": "Ticker",
+    "EDINETCodeDEI": "Edinet code",
+    "AccountingStandardsDEI": "Account standard",
+    "CurrentFiscalYearStartDateDEI": "Period start date",
+    "CurrentFiscalYearEndDateDEI": "Period end date",
+}
+# Columns of metadata of a file; keys of parsed DataFrames and source_path.
+__file_columns__ = [
+    "Ticker",
+    "Edinet code",
+    "Period start date",
+    "Period end date",
+    "Account standard",
+    "source_path",
+]
+# Suffixes of context IDs of the current fiscal year.
+__current_year_contexts__ = (
+    "CurrentYearDuration",
+    "CurrentYearDuration_NonConsolidatedMember",
+    "CurrentYearInstant",
+    "CurrentYearInstant_NonConsolidatedMember",
+)
+# Default YAML of tags of financial data; XBRL localName -> attribute by accounting standard.
+__xbrl_tags_path__ = (
+    Path(__file__).resolve().parents[1] / "schema" / "edinet_xbrl_tags.yaml"
+)
+# Compiled tags shared by parsers of the process; path -> XbrlTagMap.
+__xbrl_tag_maps__: Dict[str, "XbrlTagMap"] = {}
+__xbrl_tag_maps_lock__ = threading.Lock()
+
+
+class XbrlTagMapping(BaseModel):
+    """Tags of financial data of EDINET XBRL parsers.
+
+    Variables
+    ----------
+    version: Version of the tags.
+        str
+    tags: XBRL localName -> attribute by accounting standard.
+        Dict[str, Dict[str, str]]
+    overrides: Tags added or replaced for filings of fiscal years ending in or after a year.
+        Dict[int, Dict[str, Dict[str, str]]] = {}
+    ----------
+    """
+
+    version: str
+    tags: Dict[str, Dict[str, str]]
+    overrides: Dict[int, Dict[str, Dict[str, str]]] = {}
+
+
+class XbrlTagFile(ExternalFileMixin):
+    """Tags of financial data loaded from a YAML file; mapping: "file://<path>"."""
+
+    mapping: XbrlTagMapping
+
+
+class XbrlTagMap:
+    """Compiled tags of financial data; immutable and shared by parsers.
+
+    Key methods
+    ----------
+    get: Return tags of an accounting standard for a fiscal year.
+    all_tags: frozenset of tags of any accounting standard and year.
+    ----------
+    """
+
+    def __init__(self, mapping: XbrlTagMapping):
+        self.version = mapping.version
+        self._tags = {
+            standard: MappingProxyType(dict(tags))
+            for standard, tags in mapping.tags.items()
+        }
+        self._overrides = sorted(mapping.overrides.items())
+        self.all_tags = frozenset(
+            tag
+            for tag_dicts in [mapping.tags] + [o for _, o in self._overrides]
+            for tags in tag_dicts.values()
+            for tag in tags
+        )
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def get(self, acc_standard: str, year: Optional[int] = None) -> Mapping[str, str]:
+        """Return tags of an accounting standard with overrides up to a fiscal year."""
+        overrides = [
+            tags.get(acc_standard, {})
+            for override_year, tags in self._overrides
+            if year is not None and override_year <= year
+        ]
+        if not any(overrides):
+            return self._tags.get(acc_standard, MappingProxyType({}))
+
+        # Compile tags once per accounting standard and applied overrides.
+        key = (acc_standard, len(overrides))
+        with self._lock:
+            if key not in self._compiled:
+                tags = dict(self._tags.get(acc_standard, {}))
+                for override in overrides:
+                    tags.update(override)
+                self._compiled[key] = MappingProxyType(tags)
+            return self._compiled[key]
+
+
+def get_xbrl_tag_map(path: Optional[str] = None) -> XbrlTagMap:
+    """Return tags of a YAML file compiled once per process; default __xbrl_tags_path__.
+
+    path: Absolute path or path from the project root, as "file://" of job YAMLs.
+    """
+    path = str(path or __xbrl_tags_path__)
+    if path.startswith(FILEPREFIX):
+        path = path[len(FILEPREFIX) :]
+
+    with __xbrl_tag_maps_lock__:
+        if path not in __xbrl_tag_maps__:
+            tag_file = XbrlTagFile(mapping=f"{FILEPREFIX}{path}")
+            __xbrl_tag_maps__[path] = XbrlTagMap(tag_file.mapping)
+            logger.info(
+                f"XBRL tags version {tag_file.mapping.version} loaded from {path}"
+            )
+        return __xbrl_tag_maps__[path]
+
+
+class XbrlInstanceFact:
+    """Fact of an XBRL instance read by lxml.
+
+    Attributes used by EdinetXbrlParser are compatible with facts of Arelle;
+    concept is the fact itself and its label is the localName of the concept.
+    """
+
+    __slots__ = ("localName", "contextID", "value", "unitID")
+
+    def __init__(self, localName, contextID, value, unitID=None):
+        self.localName = localName
+        self.contextID = contextID
+        self.value = value
+        self.unitID = unitID
+
+    @property
+    def concept(self) -> "XbrlInstanceFact":
+        return self
+
+    @property
+    def qname(self) -> "XbrlInstanceFact":
+        return self
+
+    def label(self) -> str:
+        return self.localName
+
+
+class XbrlInstance:
+    """XBRL instance read by lxml iterparse.
+
+    facts yields facts of tags one by one while reading the file; elements are
+    cleared after they are read, thus memory does not grow with the file.
+    """
+
+    def __init__(self, source_path: str, tags: Optional[frozenset] = None):
+        self.source_path = source_path
+        self.tags = tags
+
+    @property
+    def facts(self):
+        """Yield facts of tags; all facts if tags is None."""
+        for _, elem in etree.iterparse(self.source_path, events=("end",)):
+            context_id = elem.get("contextRef")
+            if context_id is not None:
+                local_name = etree.QName(elem).localname
+                if self.tags is None or local_name in self.tags:
+                    value = elem.text.strip() if elem.text is not None else None
+                    yield XbrlInstanceFact(
+                        local_name, context_id, value, elem.get("unitRef")
+                    )
+
+            # Clear children of the root which were read.
+            parent = elem.getparent()
+            if parent is not None and parent.getparent() is None:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+
+class ArelleCacheConfig(BaseModel):
+    """Variables of the taxonomy cache of Arelle.
+
+    Variables
+    ----------
+    cache_dir: Folder of cached taxonomy files. None for Home directory/DataHive/arelle_cache.
+        Optional[str] = None
+    work_offline: Use cached taxonomy files only and never fetch them.
+        bool = False
+    ----------
+    """
+
+    cache_dir: Optional[str] = None
+    work_offline: bool = False
+
+
+def _fiscal_year(date: Any) -> Optional[int]:
+    """Return year of a date of DEI facts; None if not a date."""
+    try:
+        return int(str(date)[:4])
+    except ValueError:
+        return None
+
+
+def _to_float(value: Any) -> float:
+    """Return a value of a fact as float; NaN if not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class XbrlFactAccumulator:
+    """Columnar accumulator of facts of XBRL files.
+
+    Metadata of files (DEI and source_path) are stored once per file and facts
+    refer to their file by id; values are stored in a typed array. Facts of all
+    files are pivoted at once by to_frame, instead of a DataFrame per file.
+
+    Key methods
+    ----------
+    add_file: Add metadata of a file and return its id.
+    add_fact: Add a fact of a file.
+    extend: Add files and facts of another accumulator; e.g. of a worker process.
+    to_frame: Return a DataFrame of files with attributes as columns.
+    ----------
+    """
+
+    def __init__(self):
+        self.files = {column: [] for column in __file_columns__}
+        self.file_ids = array("q")
+        self.attributes = []
+        self.labels = []
+        self.contexts = []
+        self.values = array("d")
+        self.units = []
+
+    def __len__(self) -> int:
+        """Return number of facts."""
+        return len(self.file_ids)
+
+    @property
+    def n_files(self) -> int:
+        """Return number of files."""
+        return len(self.files["source_path"])
+
+    def add_file(self, **metadata) -> int:
+        """Add metadata of a file; columns of __file_columns__."""
+        for column, values in self.files.items():
+            values.append(metadata.get(column))
+        return self.n_files - 1
+
+    def add_fact(self, file_id, attribute, label, context, value, unit) -> None:
+        """Add a fact of a file."""
+        self.file_ids.append(file_id)
+        self.attributes.append(attribute)
+        self.labels.append(label)
+        self.contexts.append(context)
+        self.values.append(_to_float(value))
+        self.units.append(unit)
+
+    def extend(self, other: "XbrlFactAccumulator") -> "XbrlFactAccumulator":
+        """Add files and facts of another accumulator."""
+        offset = self.n_files
+        for column, values in self.files.items():
+            values.extend(other.files[column])
+        self.file_ids.extend(file_id + offset for file_id in other.file_ids)
+        self.attributes.extend(other.attributes)
+        self.labels.extend(other.labels)
+        self.contexts.extend(other.contexts)
+        self.values.extend(other.values)
+        self.units.extend(other.units)
+
+        return self
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return a DataFrame of files with attributes as columns; a row per file."""
+        if len(self) == 0:
+            logger.warning("No data extracted from XBRL files.")
+            return pd.DataFrame()  # Return empty DataFrame if no data was extracted
+
+        facts = pd.DataFrame(
+            {
+                "file_id": np.frombuffer(self.file_ids, dtype=np.int64),
+                "attribute": self.attributes,
+                "label": self.labels,
+                "context": self.contexts,
+                "value": np.frombuffer(self.values, dtype=np.float64),
+                "unit": self.units,
+            }
+        ).drop_duplicates()
+
+        logger.info(f"Pivoting {len(facts)} facts of {self.n_files} files.")
+        df_pivot = facts.pivot_table(
+            index="file_id", columns="attribute", values="value"
+        )
+        df_pivot.columns.name = None
+
+        # Files without any metadata of keys are dropped as by pivot_table of keys.
+        files = pd.DataFrame(self.files).dropna(subset=__file_columns__[:-1])
+        df = files.drop(columns="source_path").join(df_pivot, how="inner")
+        df["source_path"] = files["source_path"]
+
+        logger.info("Finished pivoting DataFrame.")
+
+        return df.reset_index(drop=True)
+
 
 class EdinetXbrlParser(NormalClassRegistery):
     """EDINET XBRL parser.
@@ -25,196 +382,363 @@ class EdinetXbrlParser(NormalClassRegistery):
         Any
     source_path: Source of ingestion, e.g. file name.
         str
+    tag_path: YAML of tags of financial data; e.g. with overrides of new concepts.
+        Optional[str] = None; __xbrl_tags_path__ if None.
     ----------
     """
 
     nmclss: ClassVar[str] = "EdinetXbrlParser"
+    # Load model_xbrl by Arelle before parsing.
+    load_model: ClassVar[bool] = True
     model_xbrl: Any
     source_path: str
+    tag_path: Optional[str] = None
 
     @property
     def variables(self) -> Dict:
         return super().variables
 
     @property
-    def _tag_lists(self) -> Dict:
-        tag_dict = {
-            "Japan GAAP": {
-                "NetSalesSummaryOfBusinessResults": "Net sales",  # 売上高
-                "OrdinaryIncomeSummaryOfBusinessResults": "Net sales",  # 売上高
-                "OperatingRevenue1SummaryOfBusinessResults": "Net sales",  # 売上高
-                "OperatingRevenue2SummaryOfBusinessResults": "Net sales",  # 売上高
-                "RevenueKeyFinancialData": "Net sales",  # 売上高
-                "RevenueSummaryOfBusinessResults": "Net sales",  # 売上高
-                "OperatingIncomeINS": "Net sales",  # 売上高
-                "OperatingIncome": "Operating profit",  # 営業利益
-                "OperatingRevenue1": "Operating profit",  # 営業利益
-                "IncomeBeforeIncomeTaxes": "Earnings before interest and taxes",  # 税引前利益
-                "ProfitLossAttributableToOwnersOfParentSummaryOfBusinessResults": "Profit",  # 当期純利益
-                "NetIncomeLossSummaryOfBusinessResults": "Profit",  # 当期純利益
-                "ComprehensiveIncomeSummaryOfBusinessResults": "Comprehensive profit",  # 包括利益
-                "NetCashProvidedByUsedInOperatingActivitiesSummaryOfBusinessResults": "Operating cashflow",
-                # 営業活動によるキャッシュフロー
-                "NetCashProvidedByUsedInInvestingActivitiesSummaryOfBusinessResults": "Investing cashflow",
-                # 投資活動によるキャッシュフロー
-                "NetCashProvidedByUsedInFinancingActivitiesSummaryOfBusinessResults": "Financing cashflow",
-                # 財務活動によるキャッシュフロー
-                "CashAndCashEquivalentsSummaryOfBusinessResults": "Cash equilavents",  # 現金及び現金同等物
-                "NetAssetsSummaryOfBusinessResults": "Equity",  # 純資産
-                "TotalAssetsSummaryOfBusinessResults": "Total assests",  # 総資産
-                "EquityToAssetRatioSummaryOfBusinessResults": "Equity to assets",  # 自己資本比率
-                "NetAssetsPerShareSummaryOfBusinessResults": "Book value per share",  # 一株当たり純資産, BPS
-                "BasicEarningsLossPerShareSummaryOfBusinessResults": "Earning per share",  # 一株当たり当期純利益, EPS
-                "PriceEarningsRatioSummaryOfBusinessResults": "Price earnings ratios",  # 株価収益率, PER
-                "NumberOfEmployees": "Employees",  # 従業員
-            },
-            "IFRS": {
-                "RevenueIFRSSummaryOfBusinessResults": "Net sales",  # 売上高
-                "SalesAndFinancialServicesRevenueIFRSKeyFinancialData": "Net sales",  # 売上高
-                "OperatingRevenuesIFRSKeyFinancialData": "Net sales",  # 売上高
-                "NetSalesIFRSKeyFinancialData": "Net sales",  # 売上高
-                "NetSalesIFRSSummaryOfBusinessResults": "Net sales",  # 売上高
-                "InsuranceRevenueIFRSKeyFinancialData": "Net sales",  # 売上高
-                "OperatingProfitLossIFRSKeyFinancialData": "Operating profit",  # 営業利益
-                "OperatingProfitLossIFRS": "Operating profit",  # 営業利益
-                "ProfitLossBeforeTaxIFRSSummaryOfBusinessResults": "Earnings before interest and taxes",  # 税引前利益
-                "ProfitLossBeforeTaxIFRS": "Earnings before interest and taxes",  # 税引前利益
-                "ProfitBeforeFinancingAndIncomeTaxIFRSKeyFinancialData": "Earnings before interest and taxes",  # 税引前利益
-                "ProfitLossAttributableToOwnersOfParentIFRSSummaryOfBusinessResults": "Profit",  # 当期純利益
-                "ComprehensiveIncomeAttributableToOwnersOfParentIFRSSummaryOfBusinessResults": "Comprehensive profit",
-                # 包括利益
-                "ComprehensiveIncomeIFRSSummaryOfBusinessResults": "Comprehensive profit",  # 包括利益
-                "CashFlowsFromUsedInOperatingActivitiesIFRSSummaryOfBusinessResults": "Operating cashflow",
-                # 営業活動によるキャッシュフロー
-                "CashFlowsFromUsedInInvestingActivitiesIFRSSummaryOfBusinessResults": "Investing cashflow",
-                # 投資活動によるキャッシュフロー
-                "CashFlowsFromUsedInFinancingActivitiesIFRSSummaryOfBusinessResults": "Financing cashflow",
-                # 財務活動によるキャッシュフロー
-                "CashAndCashEquivalentsIFRSSummaryOfBusinessResults": "Cash equilavents",  # 現金及び現金同等物
-                "EquityIFRS": "Equity",  # 純資産
-                "TotalAssetsIFRSSummaryOfBusinessResults": "Total assests",  # 総資産
-                "RatioOfOwnersEquityToGrossAssetsIFRSSummaryOfBusinessResults": "Equity to assets",  # 自己資本比率
-                "EquityToAssetRatioIFRSSummaryOfBusinessResults": "Book value per share",  # 一株当たり純資産, BPS
-                "BasicEarningsLossPerShareIFRSSummaryOfBusinessResults": "Earning per share",  # 一株当たり当期純利益, EPS
-                "PriceEarningsRatioIFRSSummaryOfBusinessResults": "Price earnings ratios",  # 株価収益率, PER
-                "NumberOfEmployees": "Employees",  # 従業員
-            },
-            "US GAAP": {
-                "RevenuesUSGAAPSummaryOfBusinessResults": "Net sales",  # 売上高
-                "OperatingIncomeLossUSGAAPSummaryOfBusinessResults": "Operating profit",  # 営業利益
-                "ProfitLossBeforeTaxUSGAAPSummaryOfBusinessResults": "Earnings before interest and taxes",  # 税引前利益
-                "NetIncomeLossAttributableToOwnersOfParentUSGAAPSummaryOfBusinessResults": "Profit",  # 当期純利益
-                "ComprehensiveIncomeUSGAAPSummaryOfBusinessResults": "Comprehensive profit",  # 包括利益
-                "ComprehensiveIncomeAttributableToOwnersOfParentUSGAAPSummaryOfBusinessResults": "Comprehensive profit",
-                # 包括利益
-                "CashFlowsFromUsedInOperatingActivitiesUSGAAPSummaryOfBusinessResults": "Operating cashflow",
-                # 営業活動によるキャッシュフロー
-                "CashFlowsFromUsedInInvestingActivitiesUSGAAPSummaryOfBusinessResults": "Investing cashflow",
-                # 投資活動によるキャッシュフロー
-                "CashFlowsFromUsedInFinancingActivitiesUSGAAPSummaryOfBusinessResults": "Financing cashflow",
-                # 財務活動によるキャッシュフロー
-                "CashAndCashEquivalentsUSGAAPSummaryOfBusinessResults": "Cash equilavents",  # 現金及び現金同等物
-                "EquityIncludingPortionAttributableToNonControllingInterestUSGAAPSummaryOfBusinessResults": "Equity",
-                # 純資産
-                "NetAssetsSummaryOfBusinessResults": "Equity",  # 純資産
-                "TotalAssetsUSGAAPSummaryOfBusinessResults": "Total assests",  # 総資産
-                "EquityToAssetRatioUSGAAPSummaryOfBusinessResults": "Equity to assets",  # 自己資本比率
-                "EquityAttributableToOwnersOfParentPerShareUSGAAPSummaryOfBusinessResults": "Book value per share",
-                # 一株当たり純資産, BPS
-                "BasicEarningsLossPerShareUSGAAPSummaryOfBusinessResults": "Earning per share",  # 一株当たり当期純利益, EPS
-                "PriceEarningsRatioUSGAAPSummaryOfBusinessResults": "Price earnings ratios",  # 株価収益率, PER
-                "NumberOfEmployees": "Employees",  # 従業員
-            },
-        }
-
-        return tag_dict
+    def _tag_lists(self) -> XbrlTagMap:
+        return get_xbrl_tag_map(self.tag_path)
 
     def load(self):
         return self.model_xbrl
 
-    def parse(self):
-        tag_dict = self._tag_lists
-        rows = []
-        df = []
-
-        logger.info("Map common metadata from XBRL files.")
-        for fct in self.model_xbrl.facts:
-            if fct.concept.qname.localName == "SecurityCodeDEI":
-                stock_code = fct.value
-
-            if fct.concept.qname.localName == "EDINETCodeDEI":
-                edinet_code = fct.value
-
-            if fct.concept.qname.localName == "AccountingStandardsDEI":
-                acc_standard = fct.value
-
-            if fct.concept.qname.localName == "CurrentFiscalYearStartDateDEI":
-                fy_start_date = fct.value
-
-            if fct.concept.qname.localName == "CurrentFiscalYearEndDateDEI":
-                fy_end_date = fct.value
-
-        logger.info("Map financial data from XBRL files.")
-        for fct in self.model_xbrl.facts:
-            tag_dicts = tag_dict.get(acc_standard, {})
-            if len(tag_dicts) == 0:
-                logger.error(f"No tags defined for accounting standard: {acc_standard}")
-                continue
-            else:
-                lists = tag_dicts.keys()
-            if fct.concept.qname.localName in lists:
-                if (
-                    fct.contextID.endswith("CurrentYearDuration")
-                    or fct.contextID.endswith(
-                        "CurrentYearDuration_NonConsolidatedMember"
-                    )
-                    or fct.contextID.endswith("CurrentYearInstant")
-                    or fct.contextID.endswith(
-                        "CurrentYearInstant_NonConsolidatedMember"
-                    )
-                ):
-                    rows.append(
-                        {
-                            "Ticker": stock_code,
-                            "Edinet code": edinet_code,
-                            "attribute": tag_dicts.get(fct.concept.qname.localName),
-                            "label": fct.concept.label(),
-                            "context": fct.contextID,
-                            "value": fct.value,
-                            "Period start date": fy_start_date,
-                            "Period end date": fy_end_date,
-                            "unit": fct.unitID,
-                            "Account standard": acc_standard,
-                        }
-                    )
+    def extract(
+        self, accumulator: Optional["XbrlFactAccumulator"] = None
+    ) -> "XbrlFactAccumulator":
+        """Add facts of the XBRL file to an accumulator; a new one if None."""
+        if accumulator is None:
+            accumulator = XbrlFactAccumulator()
+        tag_map = self._tag_lists
+        # Tags of any accounting standard; the standard is known after DEI facts.
+        all_tags = tag_map.all_tags
+        dei = {}
+        candidates = []
+
+        logger.info("Map metadata and financial data from XBRL files.")
+        # Single pass; DEI facts and facts of the current year with known tags.
+        for fct in self.load().facts:
+            local_name = fct.concept.qname.localName
+            if local_name in __dei_tags__:
+                dei[__dei_tags__[local_name]] = fct.value
+            elif local_name in all_tags and fct.contextID.endswith(
+                __current_year_contexts__
+            ):
+                candidates.append((local_name, fct))
+
+        if not candidates:
+            logger.warning("No data extracted from XBRL file.")
+            return accumulator
+
+        acc_standard = dei.get("Account standard")
+        if acc_standard is None:
+            raise ValueError(f"AccountingStandardsDEI not found: {self.source_path}")
+        tag_dicts = tag_map.get(acc_standard, _fiscal_year(dei.get("Period end date")))
+        if len(tag_dicts) == 0:
+            logger.error(f"No tags defined for accounting standard: {acc_standard}")
+
+        file_id = accumulator.add_file(
+            **{column: dei.get(column) for column in __dei_tags__.values()},
+            source_path=self.source_path,
+        )
+        n_facts = len(accumulator)
+        for local_name, fct in candidates:
+            if local_name in tag_dicts:
+                accumulator.add_fact(
+                    file_id,
+                    tag_dicts[local_name],
+                    fct.concept.label(),
+                    fct.contextID,
+                    fct.value,
+                    fct.unitID,
+                )
 
         logger.info(
-            f"Total {len(rows)} financial data points extracted from XBRL file."
+            f"Total {len(accumulator) - n_facts} financial data points extracted "
+            "from XBRL file."
         )
-        df.append(pd.DataFrame(rows))
-        logger.info("Combine extracted data into one DataFrame.")
-        df = pd.concat(df, ignore_index=True).drop_duplicates()
 
-        if df.empty:
-            logger.warning("No data extracted from XBRL file.")
-            return pd.DataFrame()  # Return empty DataFrame if no data was extracted
+        return accumulator
+
+    def parse(self):
+        """Return financial data of the XBRL file with attributes as columns."""
+        return self.extract().to_frame()
+
+
+class EdinetXbrlStreamParser(EdinetXbrlParser):
+    """EDINET XBRL parser reading an XBRL instance by lxml iterparse.
+
+    Only DEI facts and facts of tags are read from source_path, without loading
+    or validating taxonomies. Parsed DataFrame is the same as EdinetXbrlParser
+    except that labels of concepts are their localNames.
+
+    Variables
+    ----------
+    source_path: Path of an XBRL instance file.
+        str
+    tag_path: YAML of tags of financial data.
+        Optional[str] = None; __xbrl_tags_path__ if None.
+    ----------
+    """
+
+    nmclss: ClassVar[str] = "EdinetXbrlStreamParser"
+    load_model: ClassVar[bool] = False
+    model_xbrl: Any = None
+
+    def load(self):
+        tags = self._tag_lists.all_tags.union(__dei_tags__)
+        return XbrlInstance(self.source_path, tags)
+
+
+def _configure_arelle_controller(controller, config: ArelleCacheConfig) -> None:
+    """Set the taxonomy cache of an Arelle controller."""
+    cache_dir = Path(config.cache_dir) if config.cache_dir else __arelle_cache_dir__
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    controller.webCache.cacheDir = str(cache_dir)
+    controller.webCache.workOffline = config.work_offline
+
+
+def set_arelle_cache(config: Optional[Dict] = None) -> ArelleCacheConfig:
+    """Set the taxonomy cache of Arelle with variables of ArelleCacheConfig.
+
+    The controller of the process is updated in place if it was already created.
+    """
+    global __arelle_cache_config__
+
+    __arelle_cache_config__ = ArelleCacheConfig(**(config or {}))
+    if __arelle_controller__ is not None:
+        _configure_arelle_controller(__arelle_controller__, __arelle_cache_config__)
+
+    return __arelle_cache_config__
+
+
+def get_arelle_cache() -> ArelleCacheConfig:
+    """Return the taxonomy cache of Arelle; default if not set."""
+    if __arelle_cache_config__ is None:
+        return set_arelle_cache()
+
+    return __arelle_cache_config__
+
+
+def get_arelle_controller():
+    """Return the Arelle controller of the process; created at first call."""
+    global __arelle_controller__
+
+    if __arelle_controller__ is None:
+        from arelle import Cntlr
+
+        controller = Cntlr.Cntlr()
+        _configure_arelle_controller(controller, get_arelle_cache())
+        __arelle_controller__ = controller
+
+    return __arelle_controller__
+
+
+def warm_arelle_cache(
+    entry_points: List[str], config: Optional[Dict] = None
+) -> List[str]:
+    """Load entry points to fetch their taxonomy files into the cache in advance.
+
+    entry_points: XBRL files or taxonomy schemas; e.g. one filing per taxonomy version.
+    Return entry points which failed to load.
+    """
+    config = set_arelle_cache({**(config or {}), "work_offline": False})
+    model_manager = get_arelle_controller().modelManager
+
+    failed = []
+    for entry_point in entry_points:
+        logger.info(f"Loading taxonomy of {entry_point}")
+        model_xbrl = model_manager.load(entry_point)
+        if model_xbrl is None or model_xbrl.modelDocument is None:
+            logger.error(f"Failed to load {entry_point}")
+            failed.append(entry_point)
+        if model_xbrl is not None:
+            model_xbrl.close()
+
+    logger.info(
+        f"Taxonomy cache of {len(entry_points) - len(failed)} entry points "
+        f"saved in {get_arelle_controller().webCache.cacheDir}"
+    )
+
+    return failed
+
+
+def extract_edinet_xbrl_file(
+    file: str, parser: str = "EdinetXbrlParser", tag_path: Optional[str] = None
+) -> XbrlFactAccumulator:
+    """Extract facts of an EDINET XBRL file by a parser kind; e.g. EdinetXbrlStreamParser.
+
+    XBRL model is loaded by Arelle if load_model of the parser is True.
+    """
+    parser_cls = get_class(parser)
+    if parser_cls is None:
+        raise ValueError(f"Class with kind '{parser}' is not registered.")
+
+    logger.info(f"Parsing file: {file}")
+    if not parser_cls.load_model:
+        accumulator = parser_cls(source_path=file, tag_path=tag_path).extract()
+    else:
+        model_xbrl = get_arelle_controller().modelManager.load(file)
+        try:
+            accumulator = parser_cls(
+                model_xbrl=model_xbrl, source_path=file, tag_path=tag_path
+            ).extract()
+        finally:
+            # Release the model; the controller is reused for other files.
+            model_xbrl.close()
+    logger.info(f"Finished parsing file: {file}")
+
+    return accumulator
+
+
+def parse_edinet_xbrl_file(
+    file: str, parser: str = "EdinetXbrlParser", tag_path: Optional[str] = None
+) -> pd.DataFrame:
+    """Parse an EDINET XBRL file by a parser kind and return a DataFrame."""
+    return extract_edinet_xbrl_file(file, parser, tag_path).to_frame()
+
+
+def iter_extract_edinet_xbrl_files(
+    files: Iterable[str],
+    max_workers: Optional[int] = None,
+    cache: Optional[Dict] = None,
+    parser: str = "EdinetXbrlParser",
+    tag_path: Optional[str] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[Tuple[str, Optional[XbrlFactAccumulator], Optional[Exception]]]:
+    """Extract facts of EDINET XBRL files; yield (file, accumulator, error) as parsed.
+
+    Files are parsed in a process pool of max_workers (None for number of CPUs),
+    or one by one in this process if max_workers is 1. files may be a generator;
+    e.g. files of documents yielded as they are downloaded. At most max_pending files
+    are taken from files before they are yielded (None for 2 * max_workers),
+    thus a file can be removed once it is yielded. error is None if the file was parsed.
+
+    See extract_edinet_xbrl_files for other variables.
+    """
+    config = set_arelle_cache(cache) if cache is not None else get_arelle_cache()
+    max_workers = max_workers or os.cpu_count() or 1
+    if isinstance(files, Sized):
+        max_workers = min(max_workers, max(len(files), 1))
+
+    if max_workers == 1:
+        for file in files:
+            try:
+                result, error = extract_edinet_xbrl_file(file, parser, tag_path), None
+            except Exception as e:
+                result, error = None, e
+            yield file, result, error
+        return
+
+    max_pending = max_pending or 2 * max_workers
+    files = iter(files)
+    logger.info(f"Parsing XBRL files with {max_workers} processes.")
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=set_arelle_cache,
+        initargs=(config.model_dump(),),
+    )
+    futures = {}
+    exhausted = False
+    try:
+        while True:
+            # Submit files until max_pending files are not yielded.
+            while not exhausted and len(futures) < max_pending:
+                file = next(files, None)
+                if file is None:
+                    exhausted = True
+                    break
+                future = executor.submit(
+                    extract_edinet_xbrl_file, file, parser, tag_path
+                )
+                futures[future] = file
+
+            if not futures:
+                break
+            completed, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in completed:
+                file = futures.pop(future)
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                yield file, result, error
+    finally:
+        # Stop parsing if an error is raised or the iterator is closed.
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_edinet_xbrl_files(
+    files: List[str],
+    max_workers: Optional[int] = None,
+    cache: Optional[Dict] = None,
+    parser: str = "EdinetXbrlParser",
+    tag_path: Optional[str] = None,
+    accumulator: Optional[XbrlFactAccumulator] = None,
+    errors: Optional[Dict[str, Exception]] = None,
+) -> XbrlFactAccumulator:
+    """Extract facts of EDINET XBRL files into one accumulator.
+
+    Files are parsed in a process pool of max_workers (None for number of CPUs),
+    or one by one in this process if max_workers is 1. Files are added in the order
+    of files. Errors are raised after all other files are parsed.
+
+    cache: Taxonomy cache of Arelle with variables of ArelleCacheConfig.
+        None for the taxonomy cache of the process.
+    parser: Kind of the parser; EdinetXbrlParser or EdinetXbrlStreamParser.
+    tag_path: YAML of tags of financial data; __xbrl_tags_path__ if None.
+    accumulator: Accumulator to add facts to; e.g. shared by batches of files.
+    errors: Dict to collect errors by file instead of raising them; failed files are skipped.
+    """
+    if accumulator is None:
+        accumulator = XbrlFactAccumulator()
+    raise_errors = errors is None
+    errors = {} if errors is None else errors
+    files = list(files)
+
+    results = {}
+    for file, result, error in iter_extract_edinet_xbrl_files(
+        files, max_workers, cache, parser, tag_path, max_pending=len(files)
+    ):
+        if error is not None:
+            logger.error(f"Failed to parse {file}: {error}")
+            errors[file] = error
+        else:
+            results[file] = result
+
+    if errors and raise_errors:
+        raise Exception(f"Failed to parse {len(errors)} XBRL files: {list(errors)}")
+
+    for file in files:
+        if file in results:
+            accumulator.extend(results[file])
+
+    return accumulator
+
+
+def parse_edinet_xbrl_files(
+    files: List[str],
+    max_workers: Optional[int] = None,
+    cache: Optional[Dict] = None,
+    parser: str = "EdinetXbrlParser",
+    tag_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """Parse EDINET XBRL files and combine them into one DataFrame; a row per file.
+
+    Facts of all files are pivoted at once; see extract_edinet_xbrl_files for variables.
+    """
+    return extract_edinet_xbrl_files(
+        files, max_workers, cache, parser, tag_path
+    ).to_frame()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the taxonomy cache of Arelle.")
+    parser.add_argument("entry_points", nargs="+", help="XBRL files or schemas.")
+    parser.add_argument("--cache-dir", default=None, help="Folder of the cache.")
+    args = parser.parse_args()
 
-        logger.info("Pivoting DataFrame to have attributes as columns.")
-        df["value"] = pd.to_numeric(df["value"], errors="coerce")
-        df_pivot = df.pivot_table(
-            index=[
-                "Ticker",
-                "Edinet code",
-                "Period start date",
-                "Period end date",
-                "Account standard",
-            ],
-            columns="attribute",
-            values="value",
-        ).reset_index()
-
-        df_pivot["source_path"] = self.source_path
-
-        logger.info("Finished parsing XBRL file and pivoting DataFrame.")
-
-        return df_pivot
+    logger = set_logger("shared", logging.INFO, None)
+    warm_arelle_cache(args.entry_points, {"cache_dir": args.cache_dir})
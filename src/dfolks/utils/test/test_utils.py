@@ -1,6 +1,9 @@
+import asyncio
+
 from dfolks.utils.utils import (
     extract_partition_cols,
     extract_primary_keys,
+    run_coroutine,
 )
 
 
@@ -44,3 +47,19 @@ def test_extract_partition_cols_new_column():
     }
 
     assert extract_partition_cols(variables) == ["dt"]
+
+
+async def _double(x):
+    await asyncio.sleep(0)
+    return x * 2
+
+
+def test_run_coroutine_without_running_loop():
+    assert run_coroutine(_double(2)) == 4
+
+
+def test_run_coroutine_in_running_loop():
+    async def main():
+        return run_coroutine(_double(3))
+
+    assert asyncio.run(main()) == 6
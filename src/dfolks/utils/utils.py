@@ -1,6 +1,9 @@
 """Utils."""
 
-from typing import Dict, List
+import asyncio
+from typing import Any, Coroutine, Dict, List
+
+from dfolks.core.modules import ContextThreadPoolExecutor
 
 
 def extract_primary_keys(variables: Dict) -> List:
@@ -30,3 +33,17 @@ def extract_partition_cols(variables: Dict) -> List:
                 partition_keys.append(col)
 
     return partition_keys
+
+
+def run_coroutine(coro: Coroutine) -> Any:
+    """Run a coroutine to completion from synchronous code.
+
+    If an event loop is already running (e.g. Jupyter), run it in a separate thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ContextThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
@@ -11,28 +11,41 @@ Need to work:
 import glob
 import logging
 import os
+import shutil
 import tempfile
-import time
+from contextlib import nullcontext
 from datetime import datetime
+from pathlib import Path
 from typing import ClassVar, Dict, List, Optional
 
 import pandas as pd
-from arelle import Cntlr, ModelManager
 from dateutil.relativedelta import relativedelta
 from pydantic import Field
 
 from dfolks.core.classfactory import WorkflowsRegistry
 from dfolks.core.mixin import ExternalFileMixin
 from dfolks.data.data import Validator, add_ingestion_metadata
-from dfolks.data.edinet_apis import download_edinet_documents, get_edinet_document_list
+from dfolks.data.edinet_apis import (
+    __xbrl_members__,
+    download_edinet_documents,
+    iter_edinet_document_lists,
+    iter_edinet_documents,
+)
+from dfolks.data.httpcache import set_response_cache
 from dfolks.data.jquants_apis import (
     get_jquants_api_key_v2,
     get_jquants_corporate_list_v2,
 )
+from dfolks.data.ledger import DocumentLedger
 from dfolks.data.output import (
     SaveFile,
 )
-from dfolks.parsers.xbrlparser import EdinetXbrlParser
+from dfolks.data.ratelimit import set_rate_limit
+from dfolks.parsers.xbrlparser import (
+    XbrlFactAccumulator,
+    extract_edinet_xbrl_files,
+    iter_extract_edinet_xbrl_files,
+)
 from dfolks.utils.utils import extract_primary_keys
 
 # Set up shared logger
@@ -70,6 +83,33 @@ class DataIngestionEdinet(WorkflowsRegistry, ExternalFileMixin):
         Optional[str] = None
     target_path_fin_report: Full file path to save the financial report data.
         Optional[str] = None
+    max_listings: Number of concurrent requests of document lists of dates.
+        int = 4
+    max_downloads: Number of concurrent downloads of documents.
+        int = 4
+    extract_all: Extract all files of documents; otherwise only XBRL and taxonomy files.
+        bool = False
+    stream: Download, parse and remove documents one by one; disk usage does not grow
+        with the date range. Downloaded documents are removed also in temp_folder_path.
+        bool = False
+    max_pending: Documents downloaded but not parsed yet in stream mode.
+        int = 8
+    max_parsers: Number of processes to parse XBRL files. None for number of CPUs.
+        Optional[int] = None
+    arelle_cache: Taxonomy cache of Arelle; cache_dir and work_offline.
+        Optional[Dict] = None; Home directory/DataHive/arelle_cache if None.
+    parser: Kind of XBRL parser; EdinetXbrlStreamParser reads instances without Arelle.
+        str = "EdinetXbrlParser"
+    xbrl_tags: YAML of tags of financial data; e.g. "src/dfolks/schema/edinet_xbrl_tags.yaml".
+        Optional[str] = None; tags of dfolks if None.
+    ledger: Skip documents processed by previous runs; write_mode must not be overwrite.
+        bool = False
+    ledger_path: Path of the ledger of processed documents.
+        Optional[str] = None; Home directory/DataHive/ledger/ledger.sqlite if None.
+    rate_limit: Rate limit of requests; requests_per_second, burst, max_retries and backoff.
+        Dict = {"requests_per_second": 1.0, "burst": 1}
+    cache: Response cache of requests; cache_dir, default_ttl, ttls and max_size_mb.
+        Optional[Dict] = None; enabled by DFOLKS_HTTP_CACHE if None.
     ingestion_source: Data source.
         str
     ----------
@@ -90,6 +130,19 @@ class DataIngestionEdinet(WorkflowsRegistry, ExternalFileMixin):
     target_path_fin_report: Optional[str] = None
     write_mode: str = "overwrite"
     schema_fin_report: Optional[Dict] = Field(description="data_schema.", default=None)
+    max_listings: int = 4
+    max_downloads: int = 4
+    extract_all: bool = False
+    stream: bool = False
+    max_pending: int = Field(default=8, ge=1)
+    max_parsers: Optional[int] = None
+    arelle_cache: Optional[Dict] = None
+    parser: str = "EdinetXbrlParser"
+    xbrl_tags: Optional[str] = None
+    ledger: bool = False
+    ledger_path: Optional[str] = None
+    rate_limit: Dict = {"requests_per_second": 1.0, "burst": 1}
+    cache: Optional[Dict] = None
     ingestion_source: str
 
     def date_range(self, start_date, end_date):
@@ -108,6 +161,195 @@ class DataIngestionEdinet(WorkflowsRegistry, ExternalFileMixin):
 
         return date_range
 
+    def iter_documents(self, dates, corp_lists, ledger=None):
+        """Yield annual documents of corporate codes by date as their lists are fetched.
+
+        Lists are fetched concurrently within the rate limit of EDINET.
+        Dates listed in the ledger are read from the ledger instead of EDINET,
+        and documents processed by previous runs are skipped.
+        """
+        v = self.variables
+        fetch_dates = []
+        for date in dates:
+            if ledger is not None and ledger.is_listed(date):
+                logger.info(f"Documents for date {date} are listed in the ledger.")
+                docs = ledger.documents(dates=[date]).rename(
+                    columns={"doc_id": "docID", "code": "secCode"}
+                )
+                yield self.filter_documents(docs, corp_lists, ledger)
+            else:
+                fetch_dates.append(date)
+
+        logger.info(f"Fetching documents for {len(fetch_dates)} dates.")
+        for date, docs in iter_edinet_document_lists(
+            fetch_dates, max_workers=v["max_listings"]
+        ):
+            # Fetch document list for the date.
+            if docs is None or len(docs) == 0:
+                logger.info(f"No documents found for date: {date}")
+                docs = pd.DataFrame(columns=["docID", "secCode"])
+            else:
+                logger.info(f"Total {len(docs)} documents found for date: {date}.")
+                docs = docs[
+                    (docs["ordinanceCode"] == "010")  # Variable?
+                    & (docs["formCode"] == "030000")  # Variable?
+                ]
+            if ledger is not None:
+                ledger.add_listing(date, docs)
+
+            yield self.filter_documents(docs, corp_lists, ledger)
+
+    def filter_documents(self, docs, corp_lists, ledger=None) -> pd.DataFrame:
+        """Filter documents of corporate codes not processed by previous runs."""
+        docs = docs[docs["secCode"].isin(corp_lists)]
+        if ledger is not None:
+            docs = docs[docs["docID"].isin(ledger.pending(docs["docID"]))]
+
+        return docs
+
+    def parse_documents(self, doc_lists, folder_path, errors=None):
+        """Download and parse documents; return parsed data and XBRL files by docID.
+
+        doc_lists: Documents or an iterable of them; downloaded as they are yielded.
+        errors: Dict to collect errors by docID instead of raising them.
+        """
+        v = self.variables
+        if isinstance(doc_lists, pd.DataFrame):
+            doc_lists = [doc_lists]
+
+        # Keep listed documents while they are downloaded.
+        listed = []
+        listing_errors = []
+
+        def listing():
+            try:
+                for docs in doc_lists:
+                    listed.append(docs)
+                    yield docs
+            except Exception as e:
+                listing_errors.append(e)
+                raise
+
+        try:
+            download_edinet_documents(
+                doc_list=listing(),
+                folder_path=folder_path,
+                max_workers=v["max_downloads"],
+                members=None if v["extract_all"] else __xbrl_members__,
+            )
+        except Exception as e:
+            # Failures of listing documents are not errors of documents.
+            if errors is None or listing_errors:
+                raise
+            logger.error(f"Failed to download documents: {e}")
+
+        doc_ids = list(
+            dict.fromkeys(doc_id for docs in listed for doc_id in docs["docID"])
+        )
+        logger.info(f"Total {len(doc_ids)} documents listed for parsing.")
+
+        # Grab XBRL files of the documents.
+        xbrl_files = {}
+        for doc_id in doc_ids:
+            if not os.path.isdir(os.path.join(folder_path, doc_id)):
+                if errors is not None:
+                    errors[doc_id] = "Failed to download the document."
+                continue
+            xbrl_files[doc_id] = sorted(
+                glob.glob(os.path.join(folder_path, doc_id, "XBRL/PublicDoc/*.xbrl"))
+            )
+
+        files = [file for doc_files in xbrl_files.values() for file in doc_files]
+        logger.info(f"Total {len(files)} XBRL files found for parsing.")
+
+        # Parse XBRL files in a process pool.
+        file_errors = None if errors is None else {}
+        dfs = extract_edinet_xbrl_files(
+            files,
+            max_workers=v["max_parsers"],
+            cache=v["arelle_cache"],
+            parser=v["parser"],
+            tag_path=v["xbrl_tags"],
+            errors=file_errors,
+        ).to_frame()
+
+        for file, e in (file_errors or {}).items():
+            # Path of a file is folder_path/docID/XBRL/PublicDoc/*.xbrl
+            errors[Path(file).parents[2].name] = str(e)
+
+        return dfs, xbrl_files
+
+    def stream_documents(self, doc_lists, folder_path, errors=None):
+        """Download, parse and remove documents one by one; return the same as parse_documents.
+
+        Downloads and parses run concurrently through bounded queues; each document is
+        removed from folder_path once its XBRL files are parsed. Thus at most
+        max_pending documents and a few files per parser are on disk at once,
+        regardless of the number of documents.
+
+        errors: Dict to collect errors by docID instead of raising them.
+        """
+        v = self.variables
+        raise_errors = errors is None
+        errors = {} if errors is None else errors
+        accumulator = XbrlFactAccumulator()
+        xbrl_files = {}
+        # Number of XBRL files of a document not parsed yet.
+        remaining = {}
+
+        def remove(doc_id):
+            shutil.rmtree(os.path.join(folder_path, doc_id), ignore_errors=True)
+
+        def downloaded_files():
+            for doc_id, error in iter_edinet_documents(
+                doc_lists,
+                folder_path,
+                max_workers=v["max_downloads"],
+                members=None if v["extract_all"] else __xbrl_members__,
+                max_pending=v["max_pending"],
+            ):
+                if error is not None:
+                    errors[doc_id] = str(error)
+                    continue
+                files = sorted(
+                    glob.glob(
+                        os.path.join(folder_path, doc_id, "XBRL/PublicDoc/*.xbrl")
+                    )
+                )
+                xbrl_files[doc_id] = files
+                if not files:
+                    remove(doc_id)
+                    continue
+                remaining[doc_id] = len(files)
+                yield from files
+
+        for file, result, error in iter_extract_edinet_xbrl_files(
+            downloaded_files(),
+            max_workers=v["max_parsers"],
+            cache=v["arelle_cache"],
+            parser=v["parser"],
+            tag_path=v["xbrl_tags"],
+        ):
+            # Path of a file is folder_path/docID/XBRL/PublicDoc/*.xbrl
+            doc_id = Path(file).parents[2].name
+            if error is not None:
+                logger.error(f"Failed to parse {file}: {error}")
+                errors[doc_id] = str(error)
+            else:
+                accumulator.extend(result)
+
+            remaining[doc_id] -= 1
+            if remaining[doc_id] == 0:
+                remove(doc_id)
+
+        logger.info(f"Total {len(xbrl_files)} documents parsed; {len(errors)} failed.")
+        if errors and raise_errors:
+            raise Exception(
+                f"Failed to process {len(errors)} documents: {list(errors)}"
+            )
+
+        return accumulator.to_frame(), xbrl_files
+
     def run(self) -> None:
         """Execute workflow."""
         # Get a logger.
@@ -116,8 +358,21 @@ class DataIngestionEdinet(WorkflowsRegistry, ExternalFileMixin):
         # Get variables.
         logger.info("Retrieving workflow variables.")
         v = self.variables
-
-        doc_lists = []
+        # Rate limit of edinet shared by all requests of the workflow.
+        set_rate_limit("edinet", v["rate_limit"])
+        if v["cache"] is not None:
+            set_response_cache(v["cache"])
+
+        # Ledger of processed documents; processed documents are skipped.
+        ledger = None
+        if v["ledger"]:
+            if v["format"] == "df" or v["write_mode"] == "overwrite":
+                raise ValueError(
+                    "ledger skips processed documents; "
+                    "format must save data and write_mode must not be overwrite."
+                )
+            ledger = DocumentLedger("edinet", v["ledger_path"])
+            logger.info(f"Using ledger of processed documents: {ledger.path}")
 
         # Data range
         dates = self.date_range(start_date=v["start_date"], end_date=v["end_date"])
@@ -135,124 +390,77 @@ class DataIngestionEdinet(WorkflowsRegistry, ExternalFileMixin):
             logger.info("Using provided corporate codes for data ingestion.")
             corp_lists = v["corp_codes"]
 
-        for date in dates:
-            logger.info(f"Fetching documents for date: {date}.")
-            docs = get_edinet_document_list(date=date)
-
-            # Fetch document list for the date.
-            if docs is None or len(docs) == 0:
-                logger.info(f"No documents found for date: {date}")
-                time.sleep(1)  # To avoid hitting API rate limits.
-                continue
-            else:
-                logger.info(f"Total {len(docs)} documents found for date: {date}.")
-                logger.info(
-                    "Filtering annual documents for predefined corporate codes."
-                )
-                doc_lists.append(
-                    docs[
-                        (docs["ordinanceCode"] == "010")  # Variable?
-                        & (docs["formCode"] == "030000")  # Variable?
-                        & (docs["secCode"].isin(corp_lists))
-                    ]
-                )
-                time.sleep(1)  # To avoid hitting API rate limits.
-
-        # Combine document lists.
-        logger.info("Combining documents into one dataframe")
-        doc_lists = pd.concat(doc_lists, ignore_index=True)
+        # Documents are downloaded as soon as the list of each date is fetched.
+        doc_lists = self.iter_documents(dates, corp_lists, ledger)
 
         # Download EDINET XBRL files and parse them.
         # If temp_folder_path is None, use system temp folder.
+        # Else use defined temp_folder_path and retain downloaded files.
+        errors = None if ledger is None else {}
         if v["temp_folder_path"] is None:
             logger.info("Using system temporary folder for downloading files.")
-            with tempfile.TemporaryDirectory() as temp_folder_path:
-                logger.info(
-                    f"Temporary folder created at {temp_folder_path} and data will be downloaded there."
-                )
-                download_edinet_documents(
-                    doc_list=doc_lists, folder_path=temp_folder_path
-                )
-
-                # Grab all XBRL files in the temp folder.
-                xbrl_files = glob.glob(
-                    os.path.join(temp_folder_path, "*/XBRL/PublicDoc/*.xbrl"),
-                    recursive=True,
-                )
-
-                logger.info(f"Total {len(xbrl_files)} XBRL files found for parsing.")
-
-                dfs = []
-
-                # Parse each XBRL file.
-                for file in xbrl_files:
-                    logger.info(f"Parsing file: {file}")
-                    ctrl = Cntlr.Cntlr()
-                    model_manager = ModelManager.initialize(ctrl)
-                    model_xbrl = model_manager.load(file)
-
-                    parser = EdinetXbrlParser(model_xbrl=model_xbrl, source_path=file)
-
-                    dfs.append(parser.parse())
-                    logger.info(f"Finished parsing file: {file}")
-
-                logger.info("Combining parsed data into one DataFrame.")
-                dfs = pd.concat(dfs, ignore_index=True)
-
-        # Else use defined temp_folder_path and retain downloaded files.
+            folder = tempfile.TemporaryDirectory()
         else:
             logger.info(f"Using defined temporary folder: {v['temp_folder_path']}")
-            download_edinet_documents(
-                doc_list=doc_lists, folder_path=v["temp_folder_path"]
-            )
-
-            # Grab all XBRL files in the temp folder.
-            xbrl_files = glob.glob(
-                os.path.join(v["temp_folder_path"], "*/XBRL/PublicDoc/*.xbrl"),
-                recursive=True,
-            )
-
-            logger.info(f"Total {len(xbrl_files)} XBRL files found for parsing.")
-
-            dfs = []
-
-            # Parse each XBRL file.
-            for file in xbrl_files:
-                logger.info(f"Parsing file: {file}")
-                ctrl = Cntlr.Cntlr()
-                model_manager = ModelManager.initialize(ctrl)
-                model_xbrl = model_manager.load(file)
-
-                parser = EdinetXbrlParser(model_xbrl=model_xbrl, source_path=file)
-
-                dfs.append(parser.parse())
-                logger.info(f"Finished parsing file: {file}")
-
-            logger.info("Combining parsed data into one DataFrame.")
-            dfs = pd.concat(dfs, ignore_index=True)
-
-        # Add metadata of data ingestion.
-        dfs = add_ingestion_metadata(dfs, v["ingestion_source"])
-
-        # Validate dataframe against schema.
-        logger.info("Apply dataframe validator for parsed dataframe")
-        df_valid = Validator.model_validate(v["schema_fin_report"]).valid(dfs)
+            folder = nullcontext(v["temp_folder_path"])
+        with folder as folder_path:
+            logger.info(f"Data will be downloaded in {folder_path}.")
+            if v["stream"]:
+                logger.info("Streaming documents; each is removed once parsed.")
+                dfs, xbrl_files = self.stream_documents(doc_lists, folder_path, errors)
+            else:
+                dfs, xbrl_files = self.parse_documents(doc_lists, folder_path, errors)
+
+        if not xbrl_files and not errors:
+            logger.info("No new documents to be processed.")
+            return None
+
+        if not dfs.empty:
+            # Add metadata of data ingestion.
+            dfs = add_ingestion_metadata(dfs, v["ingestion_source"])
+
+            # Validate dataframe against schema.
+            logger.info("Apply dataframe validator for parsed dataframe")
+            df_valid = Validator.model_validate(v["schema_fin_report"]).valid(dfs)
+
+            # Output results based on the defined format.
+            if v["format"] == "df":
+                logger.info("Returning DataFrame format.")
+                return df_valid
+            elif v["format"] == "csv":
+                logger.info("Saving DataFrame to CSV format.")
+                SaveFile(
+                    df=df_valid,
+                    file_type=v["format"],
+                    file_db=v["target_db"],
+                    file_path=v["target_path_fin_report"],
+                    primary_keys=extract_primary_keys(v["schema_fin_report"]),
+                ).mode(v["write_mode"]).save()
+
+                logger.info("Data saved to CSV format.")
 
-        # Output results based on the defined format.
-        if v["format"] == "df":
-            logger.info("Returning DataFrame format.")
-            return df_valid
-        elif v["format"] == "csv":
-            logger.info("Saving DataFrame to CSV format.")
-            SaveFile(
-                df=df_valid,
-                file_type=v["format"],
-                file_db=v["target_db"],
-                file_path=v["target_path_fin_report"],
-                primary_keys=extract_primary_keys(v["schema_fin_report"]),
-            ).mode(v["write_mode"]).save()
+            else:
+                raise NotImplementedError("Other type not implemented yet!")
+        else:
+            logger.warning("No data parsed from documents.")
 
-            logger.info("Data saved to CSV format.")
+        # Record processed documents in the ledger.
+        if ledger is not None:
+            output = "/".join(
+                p for p in (v["target_db"], v["target_path_fin_report"]) if p
+            )
+            processed = [d for d in xbrl_files if d not in errors]
+            ledger.set_status(
+                [d for d in processed if xbrl_files[d]], "saved", output=output
+            )
+            ledger.set_status([d for d in processed if not xbrl_files[d]], "empty")
+            for doc_id, error in errors.items():
+                ledger.set_status([doc_id], "failed", error=str(error))
+            logger.info(
+                f"Ledger updated; {len(processed)} processed, {len(errors)} failed."
+            )
 
-        else:
-            raise NotImplementedError("Other type not implemented yet!")
+            if errors:
+                raise Exception(
+                    f"Failed to process {len(errors)} documents: {list(errors)}"
+                )
@@ -10,8 +10,7 @@ Need to work:
 
 import datetime
 import logging
-import time
-from typing import ClassVar, Dict, List, Optional
+from typing import ClassVar, Dict, Iterator, List, Optional, Union
 
 import pandas as pd
 from pydantic import Field, field_validator
@@ -19,19 +18,127 @@ from pydantic import Field, field_validator
 from dfolks.core.classfactory import WorkflowsRegistry
 from dfolks.core.mixin import ExternalFileMixin
 from dfolks.data.data import Validator, add_ingestion_metadata
+from dfolks.data.httpcache import set_response_cache
 from dfolks.data.jquants_apis import (
+    filter_jquants_codes,
     get_jquants_api_key_v2,
     get_jquants_corporate_list_v2,
-    get_jquants_fin_report_v2,
+    get_jquants_fin_reports_v2,
     get_jquants_industry_report_v2,
-    get_jquants_stock_price_v2,
+    get_jquants_stock_prices_v2,
+    iter_jquants_many_v2,
+    jquants_rate_limit,
+)
+from dfolks.data.output import SaveFile, get_file_path
+from dfolks.data.ratelimit import set_rate_limit
+from dfolks.data.watermark import (
+    earliest_watermark,
+    filter_after_watermarks,
+    missing_ranges,
+    read_watermarks,
+    update_watermarks,
 )
-from dfolks.data.output import SaveFile
 from dfolks.utils.utils import extract_primary_keys
 
 # Set up shared logger
 logger = logging.getLogger("shared")
 
+# Supported fetch modes; requests per corporation code or per date for all corporations.
+__support_fetch_modes__ = ["auto", "code", "date"]
+# Rows of pages saved at once by save_pages.
+__save_batch_rows__ = 500_000
+
+
+def select_fetch_mode(
+    fetch_mode: str, requests_by_code: Optional[int], requests_by_date: Optional[int]
+):
+    """Select fetch mode with fewer requests if fetch_mode is "auto".
+
+    requests_by_code: Number of requests by code; None for all corporations.
+    requests_by_date: Number of requests by date; None if all dates are requested,
+        which can be fetched by code only.
+    """
+    if fetch_mode not in __support_fetch_modes__:
+        raise ValueError(
+            f"Unsupported fetch_mode '{fetch_mode}'. Choose from {__support_fetch_modes__}."
+        )
+    if requests_by_date is None:
+        if fetch_mode == "date":
+            raise ValueError(
+                "All dates (single_date='whole') can be fetched by code only."
+            )
+        return "code"
+    if fetch_mode != "auto":
+        return fetch_mode
+
+    if requests_by_code is None or requests_by_date <= requests_by_code:
+        return "date"
+    return "code"
+
+
+def save_pages(
+    pages: Iterator[pd.DataFrame],
+    ingestion_source: str,
+    schema: Optional[Dict],
+    file_db: Optional[str],
+    file_path: str,
+    write_mode: str = "overwrite",
+    watermarks: Optional[Dict[str, str]] = None,
+    batch_rows: int = __save_batch_rows__,
+) -> int:
+    """Validate pages as they arrive and save them in batches; return number of saved rows.
+
+    Pages are buffered until batch_rows rows, thus the file is read and rewritten once per
+    batch, not once per page. Batches after the first one are appended if write_mode is
+    "overwrite".
+    watermarks: Watermarks of the file updated by each saved batch; None for no watermarks.
+    """
+    path = get_file_path(file_db, file_path) if watermarks is not None else None
+    primary_keys = extract_primary_keys(schema)
+    n_rows = 0
+
+    def _save(batch: List[pd.DataFrame]) -> None:
+        nonlocal n_rows, watermarks
+        df_valid = pd.concat(batch, ignore_index=True)
+        # Rows of later pages replace rows of earlier pages as if saved one by one.
+        if write_mode in ["upsert", "incremental"] and primary_keys:
+            df_valid = df_valid.drop_duplicates(
+                primary_keys, keep="last" if write_mode == "upsert" else "first"
+            )
+
+        mode = "append" if n_rows and write_mode == "overwrite" else write_mode
+        SaveFile(
+            df=df_valid,
+            file_db=file_db,
+            file_path=file_path,
+            primary_keys=primary_keys,
+        ).mode(mode).save()
+        if path is not None:
+            watermarks = update_watermarks(
+                path, df_valid, None if mode == "overwrite" else watermarks
+            )
+        n_rows += len(df_valid)
+
+    batch: List[pd.DataFrame] = []
+    n_batch = 0
+    for page in pages:
+        if page.empty:
+            continue
+
+        # Add metadata of data ingestion and validate a page against schema.
+        page = add_ingestion_metadata(page, ingestion_source)
+        batch.append(Validator.model_validate(schema).valid(page))
+        n_batch += len(batch[-1])
+
+        if n_batch >= batch_rows:
+            _save(batch)
+            batch, n_batch = [], 0
+
+    if batch:
+        _save(batch)
+
+    return n_rows
+
 
 class DataIngestionJQuantsFinReport(WorkflowsRegistry, ExternalFileMixin):
     """Workflow for data ingestion from JQuants.
@@ -70,6 +177,18 @@ class DataIngestionJQuantsFinReport(WorkflowsRegistry, ExternalFileMixin):
         str = "overwrite"
     schema: Output data schema.
         Optional[Dict] = Field(description="data_schema.", default=None)
+    fetch_mode: "code" to request each corporation and date, "date" to request reports
+        of all corporations disclosed on each date and filter them, "auto" for fewer requests.
+        str = "auto"
+    stream_pages: Validate and save pages as they arrive instead of combining all of them;
+        only for "csv" format. bool = False
+    max_concurrency: Maximum number of concurrent requests.
+        int = 8
+    rate_limit: J-Quants plan (free, light, standard or premium) or rate limit of requests;
+        requests_per_second, burst, max_retries and backoff.
+        Union[str, Dict] = "standard"
+    cache: Response cache of requests; cache_dir, default_ttl, ttls and max_size_mb.
+        Optional[Dict] = None; enabled by DFOLKS_HTTP_CACHE if None.
     ingestion_source: Data source.
         str
     ----------
@@ -92,6 +211,11 @@ class DataIngestionJQuantsFinReport(WorkflowsRegistry, ExternalFileMixin):
     target_path_fin_report: Optional[str] = None
     write_mode: str = "overwrite"
     schema_fin_report: Optional[Dict] = Field(description="data_schema.", default=None)
+    fetch_mode: str = "auto"
+    stream_pages: bool = False
+    max_concurrency: int = 8
+    rate_limit: Union[str, Dict] = "standard"
+    cache: Optional[Dict] = None
     ingestion_source: str
 
     @field_validator("single_date", mode="before")
@@ -125,18 +249,36 @@ class DataIngestionJQuantsFinReport(WorkflowsRegistry, ExternalFileMixin):
             )
         return value
 
-    def fetch_data(self, api_key, code, date=None):
-        """Fetch data from JQuants."""
-        # Implementation for fetching data from JQuants.
-        fin_report = get_jquants_fin_report_v2(api_key=api_key, code=code, date=date)
+    def fetch_data(self, api_key, params_list):
+        """Fetch data from JQuants concurrently within the rate limit."""
+        v = self.variables
+        fin_report = get_jquants_fin_reports_v2(
+            api_key,
+            params_list,
+            max_concurrency=v["max_concurrency"],
+        )
 
         return fin_report
 
+    def iter_data(self, api_key, params_list) -> Iterator[pd.DataFrame]:
+        """Yield pages of data from JQuants as they arrive."""
+        v = self.variables
+        yield from iter_jquants_many_v2(
+            api_key,
+            "fins/summary",
+            params_list,
+            max_concurrency=v["max_concurrency"],
+        )
+
     def run(self) -> None:
         """Execute workflow."""
         self.logger.info("Starting data ingestion workflow for JQuants.")
         # Get variables.
         v = self.variables
+        # Rate limit of jquants shared by all requests of the workflow.
+        set_rate_limit("jquants", jquants_rate_limit(v["rate_limit"]))
+        if v["cache"] is not None:
+            set_response_cache(v["cache"])
         # Get a logger.
         logger = self.logger
 
@@ -163,67 +305,82 @@ class DataIngestionJQuantsFinReport(WorkflowsRegistry, ExternalFileMixin):
                 .tolist()
             )
 
-        fin_reports = []
+        # Disclosure dates to fetch; None if all dates are requested.
+        if v["single_date"] == "whole":
+            dates = None
+        elif v["single_date"]:
+            dates = [v["single_date"]]
+        else:
+            dates = date_range
 
         logger.info("Get JQuants api key.")
         api_key = get_jquants_api_key_v2()
         logger.info("JQuants api key updated successfully.")
 
-        # If corp_codes is defined, use them; otherwise get all listed corp codes from JQuants.
+        # If corp_codes is defined, use them; None for all listed corporations.
         if v["corp_codes"]:
-            for code in v["corp_codes"]:
-                logger.info(f"Fetching data for code: {code}")
-
-                # If single_date is defined, use it; otherwise use date_range.
-                if v["single_date"]:
-                    logger.info(f"Data ingestion for {v["single_date"]}.")
-                    if v["single_date"] == "whole":
-                        fin_report = self.fetch_data(api_key, code, None)
-                    else:
-                        fin_report = self.fetch_data(api_key, code, v["single_date"])
-                    fin_reports.append(fin_report)
-                else:
-                    for date in date_range:
-                        logger.info(f"Data ingestion for {date}.")
-                        fin_report = self.fetch_data(api_key, code, date)
-                        fin_reports.append(fin_report)
-                        time.sleep(1)  # To avoid hitting rate limits.
-                time.sleep(1)  # To avoid hitting rate limits.
-
-            fin_reports_df = pd.concat(fin_reports, ignore_index=True)
+            corp_lists = v["corp_codes"]
+        elif v["corp_filter"]:
+            corp_lists = get_jquants_corporate_list_v2(api_key=api_key)
+            # Apply corporation filter.
+            corp_lists = corp_lists[
+                corp_lists[v["corp_filter_col"]]
+                .astype(str)
+                .str.contains(v["corp_filter"], regex=True, na=False)
+            ]["Code"].tolist()
+            logger.info(f"Total {len(corp_lists)} corporations after filtering.")
+        else:
+            corp_lists = None
+
+        fetch_mode = select_fetch_mode(
+            v["fetch_mode"],
+            (
+                len(corp_lists) * (len(dates) if dates is not None else 1)
+                if corp_lists is not None
+                else None
+            ),
+            len(dates) if dates is not None else None,
+        )
 
+        # Request parameters for each disclosure date; all corporations at once.
+        if fetch_mode == "date":
+            params_list = [{"date": date} for date in dates]
+        # Request parameters for each code; single_date if defined, otherwise date_range.
         else:
-            corp_lists = get_jquants_corporate_list_v2(api_key=api_key)
-            # Apply corporation filter if defined.
-            if v["corp_filter"]:
-                corp_lists = corp_lists[
-                    corp_lists[v["corp_filter_col"]]
-                    .astype(str)
-                    .str.contains(v["corp_filter"], regex=True, na=False)
-                ]["Code"].tolist()
-                logger.info(f"Total {len(corp_lists)} corporations after filtering.")
-            else:
+            if corp_lists is None:
+                corp_lists = get_jquants_corporate_list_v2(api_key=api_key)
                 corp_lists = corp_lists["Code"].tolist()
 
+            params_list = []
             for code in corp_lists:
-                logger.info(f"Fetching data for code: {code}")
-                # If single_date is defined, use it; otherwise use date_range.
-                if v["single_date"]:
-                    logger.info(f"Data ingestion for {v["single_date"]}.")
-                    if v["single_date"] == "whole":
-                        fin_report = self.fetch_data(api_key, code, None)
-                    else:
-                        fin_report = self.fetch_data(api_key, code, v["single_date"])
-                    fin_reports.append(fin_report)
+                if dates is None:
+                    params_list.append({"code": code})
                 else:
-                    for date in date_range:
-                        logger.info(f"Data ingestion for {date}.")
-                        fin_report = self.fetch_data(api_key, code, date)
-                        fin_reports.append(fin_report)
-                        time.sleep(1)  # To avoid hitting rate limits.
-                time.sleep(1)  # To avoid hitting rate limits.
+                    params_list.extend({"code": code, "date": date} for date in dates)
+
+        logger.info(f"Fetching data by {fetch_mode} with {len(params_list)} requests.")
+
+        # Stream pages into validation and a file without combining all of them.
+        if v["stream_pages"] and v["format"] == "csv" and v["target_path_fin_report"]:
+            pages = self.iter_data(api_key, params_list)
+            if fetch_mode == "date" and corp_lists is not None:
+                pages = (filter_jquants_codes(page, corp_lists) for page in pages)
+            n_rows = save_pages(
+                pages,
+                v["ingestion_source"],
+                v["schema_fin_report"],
+                v["target_db"],
+                v["target_path_fin_report"],
+                v["write_mode"],
+            )
+            logger.info(f"Data saved to CSV format; {n_rows} rows.")
+            return
+
+        fin_reports_df = self.fetch_data(api_key, params_list)
 
-            fin_reports_df = pd.concat(fin_reports, ignore_index=True)
+        # Filter reports of all corporations by corporations to ingest.
+        if fetch_mode == "date" and corp_lists is not None and not fin_reports_df.empty:
+            fin_reports_df = filter_jquants_codes(fin_reports_df, corp_lists)
 
         if fin_reports_df.empty:
             logger.warning("No data fetched from JQuants Fin Report API.")
@@ -295,6 +452,24 @@ class DataIngestionJQuantsStockPrice(WorkflowsRegistry, ExternalFileMixin):
         str = "overwrite"
     schema: Output data schema.
         Optional[Dict] = Field(description="data_schema.", default=None)
+    fetch_mode: "code" to request each corporation, "date" to request all corporations
+        for each trading day and filter them, "auto" for fewer requests.
+        str = "auto"
+    stream_pages: Validate and save pages as they arrive instead of combining all of them;
+        only for "csv" format. bool = False
+    watermark: Fetch each corporation only after the latest Date of its Ticker in
+        target_path_stock, read by read_watermarks; write_mode must not be overwrite.
+        By code, each corporation is requested from the day after its watermark.
+        By date, trading days after the earliest watermark are requested and rows up to
+        the watermark of each corporation are dropped. The date range applies to
+        corporations not saved yet. bool = False
+    max_concurrency: Maximum number of concurrent requests.
+        int = 8
+    rate_limit: J-Quants plan (free, light, standard or premium) or rate limit of requests;
+        requests_per_second, burst, max_retries and backoff.
+        Union[str, Dict] = "standard"
+    cache: Response cache of requests; cache_dir, default_ttl, ttls and max_size_mb.
+        Optional[Dict] = None; enabled by DFOLKS_HTTP_CACHE if None.
     ingestion_source: Data source.
         str
     ----------
@@ -317,6 +492,12 @@ class DataIngestionJQuantsStockPrice(WorkflowsRegistry, ExternalFileMixin):
     target_path_stock: Optional[str] = None
     write_mode: str = "overwrite"
     schema_stock_price: Optional[Dict] = Field(description="data_schema.", default=None)
+    fetch_mode: str = "auto"
+    stream_pages: bool = False
+    watermark: bool = False
+    max_concurrency: int = 8
+    rate_limit: Union[str, Dict] = "standard"
+    cache: Optional[Dict] = None
     ingestion_source: str
 
     @field_validator("single_date", mode="before")
@@ -350,19 +531,27 @@ class DataIngestionJQuantsStockPrice(WorkflowsRegistry, ExternalFileMixin):
             )
         return value
 
-    def fetch_data(self, api_key, code, date=None, start_date=None, end_date=None):
-        """Fetch data from JQuants."""
-        # Implementation for fetching data from JQuants.
-        stock_price = get_jquants_stock_price_v2(
-            api_key=api_key,
-            code=code,
-            date=date,
-            date_from=start_date,
-            date_to=end_date,
+    def fetch_data(self, api_key, params_list):
+        """Fetch data from JQuants concurrently within the rate limit."""
+        v = self.variables
+        stock_price = get_jquants_stock_prices_v2(
+            api_key,
+            params_list,
+            max_concurrency=v["max_concurrency"],
         )
 
         return stock_price
 
+    def iter_data(self, api_key, params_list) -> Iterator[pd.DataFrame]:
+        """Yield pages of data from JQuants as they arrive."""
+        v = self.variables
+        yield from iter_jquants_many_v2(
+            api_key,
+            "equities/bars/daily",
+            params_list,
+            max_concurrency=v["max_concurrency"],
+        )
+
     def run(self) -> None:
         """Execute workflow."""
         # Get a logger.
@@ -371,6 +560,27 @@ class DataIngestionJQuantsStockPrice(WorkflowsRegistry, ExternalFileMixin):
         # Get variables.
         logger.info("Retrieving workflow variables.")
         v = self.variables
+        # Rate limit of jquants shared by all requests of the workflow.
+        set_rate_limit("jquants", jquants_rate_limit(v["rate_limit"]))
+        if v["cache"] is not None:
+            set_response_cache(v["cache"])
+
+        # Watermarks of saved data; only dates after them are fetched.
+        watermarks = None
+        if v["watermark"]:
+            if (
+                v["format"] != "csv"
+                or not v["target_path_stock"]
+                or v["write_mode"] == "overwrite"
+            ):
+                raise ValueError(
+                    "watermark fetches dates after saved data of each corporation; "
+                    "format must be csv with target_path_stock and write_mode must not "
+                    "be overwrite."
+                )
+            target_path = get_file_path(v["target_db"], v["target_path_stock"])
+            watermarks = read_watermarks(target_path)
+            logger.info(f"Watermarks of {len(watermarks)} tickers in {target_path}.")
 
         # If start_date & end_date are defined, generate date range.
         if v["start_date"] and v["end_date"]:
@@ -382,74 +592,133 @@ class DataIngestionJQuantsStockPrice(WorkflowsRegistry, ExternalFileMixin):
             logger.info("Data ingestion for yesterday.")
             v["single_date"] = datetime.date.today() - datetime.timedelta(days=1)
 
-        stock_prices = []
+        # Trading days to fetch by date; None if all dates are requested.
+        if v["single_date"] == "whole":
+            dates = None
+        elif v["single_date"]:
+            dates = [str(v["single_date"])]
+        else:
+            dates = (
+                pd.bdate_range(start=start_date, end=end_date)
+                .strftime("%Y-%m-%d")
+                .tolist()
+            )
 
         logger.info("Get JQuants api key.")
         api_key = get_jquants_api_key_v2()
         logger.info("JQuants api key updated successfully.")
 
-        # If corp_codes is defined, use them; otherwise get all listed corp codes from JQuants.
+        # If corp_codes is defined, use them; None for all listed corporations.
         if v["corp_codes"]:
-            for code in v["corp_codes"]:
-                logger.info(f"Fetching data for code: {code}")
-                # If single_date is defined, use it; otherwise use date_range.
-                if v["single_date"]:
-                    logger.info(f"Fetching data for {v["single_date"]}.")
-                    if v["single_date"] == "whole":
-                        stock_price = self.fetch_data(api_key, code, date=None)
-                    else:
-                        stock_price = self.fetch_data(
-                            api_key, code, date=v["single_date"]
-                        )
-                    stock_prices.append(stock_price)
-                else:
-                    logger.info(f"Fetching data from {start_date} to {end_date}.")
-                    stock_price = self.fetch_data(
-                        api_key, code, start_date=start_date, end_date=end_date
-                    )
-                    stock_prices.append(stock_price)
-                    time.sleep(1)  # To avoid hitting rate limits.
-                time.sleep(1)  # To avoid hitting rate limits.
-
-            logger.info("Combining data into one dataframe")
-            stock_prices_df = pd.concat(stock_prices, ignore_index=True)
+            corp_lists = v["corp_codes"]
+        elif v["corp_filter"]:
+            corp_lists = get_jquants_corporate_list_v2(api_key=api_key)
+            # Apply corporation filter.
+            corp_lists = corp_lists[
+                corp_lists[v["corp_filter_col"]]
+                .astype(str)
+                .str.match(v["corp_filter"], na=False)
+            ]["Code"].tolist()
+            logger.info(f"Total {len(corp_lists)} corporations after filtering.")
+        else:
+            corp_lists = None
+
+        # Only trading days after the earliest watermark are fetched by date; all days
+        # if any corporation to ingest is not saved yet.
+        if watermarks is not None and dates is not None:
+            earliest = earliest_watermark(watermarks, corp_lists)
+            if earliest is not None:
+                dates = [date for date in dates if date > earliest]
+
+        fetch_mode = select_fetch_mode(
+            v["fetch_mode"],
+            len(corp_lists) if corp_lists is not None else None,
+            len(dates) if dates is not None else None,
+        )
 
+        # Request parameters for each trading day; all corporations at once.
+        if fetch_mode == "date":
+            if not dates:
+                logger.info("No new data to fetch from JQuants.")
+                return
+            params_list = [{"date": date} for date in dates]
+        # Request parameters for each code; single_date if defined, otherwise date range.
         else:
-            corp_lists = get_jquants_corporate_list_v2(api_key=api_key)
-            # Apply corporation filter if defined.
-            if v["corp_filter"]:
-                corp_lists = corp_lists[
-                    corp_lists[v["corp_filter_col"]]
-                    .astype(str)
-                    .str.match(v["corp_filter"], na=False)
-                ]["Code"].tolist()
-                logger.info(f"Total {len(corp_lists)} corporations after filtering.")
-            else:
+            if corp_lists is None:
+                corp_lists = get_jquants_corporate_list_v2(api_key=api_key)
                 corp_lists = corp_lists["Code"].tolist()
 
-            for code in corp_lists:
-                logger.info(f"Fetching data for code: {code}")
-                # If single_date is defined, use it; otherwise use date_range.
-                if v["single_date"]:
-                    logger.info(f"Fetching data for {v["single_date"]}.")
+            params_list = []
+            # Request parameters for each code from the day after its watermark.
+            if watermarks is not None:
+                if v["single_date"] == "whole":
+                    start_date = end_date = None
+                elif v["single_date"]:
+                    start_date = end_date = str(v["single_date"])
+                ranges = missing_ranges(corp_lists, watermarks, start_date, end_date)
+                logger.info(
+                    f"{len(corp_lists) - len(ranges)} corporations are up to date."
+                )
+                if not ranges:
+                    logger.info("No new data to fetch from JQuants.")
+                    return
+                for code, (date_from, date_to) in ranges.items():
+                    params = {"code": code}
+                    if date_from is not None:
+                        params["from"] = date_from
+                    if date_to is not None:
+                        params["to"] = date_to
+                    params_list.append(params)
+            else:
+                for code in corp_lists:
                     if v["single_date"] == "whole":
-                        stock_price = self.fetch_data(api_key, code, date=None)
+                        params_list.append({"code": code})
+                    elif v["single_date"]:
+                        params_list.append(
+                            {"code": code, "date": str(v["single_date"])}
+                        )
                     else:
-                        stock_price = self.fetch_data(
-                            api_key, code, date=v["single_date"]
+                        params_list.append(
+                            {"code": code, "from": start_date, "to": end_date}
                         )
-                    stock_prices.append(stock_price)
-                else:
-                    logger.info(f"Fetching data from {start_date} to {end_date}.")
-                    stock_price = self.fetch_data(
-                        api_key, code, start_date=start_date, end_date=end_date
-                    )
-                    stock_prices.append(stock_price)
-                    time.sleep(1)  # To avoid hitting rate limits.
-                time.sleep(1)  # To avoid hitting rate limits.
 
-            logger.info("Combining data into one dataframe")
-            stock_prices_df = pd.concat(stock_prices, ignore_index=True)
+        logger.info(f"Fetching data by {fetch_mode} with {len(params_list)} requests.")
+
+        # Stream pages into validation and a file without combining all of them.
+        if v["stream_pages"] and v["format"] == "csv" and v["target_path_stock"]:
+            pages = self.iter_data(api_key, params_list)
+            if fetch_mode == "date" and corp_lists is not None:
+                pages = (filter_jquants_codes(page, corp_lists) for page in pages)
+            if fetch_mode == "date" and watermarks is not None:
+                pages = (
+                    filter_after_watermarks(page, watermarks, "Code") for page in pages
+                )
+            n_rows = save_pages(
+                pages,
+                v["ingestion_source"],
+                v["schema_stock_price"],
+                v["target_db"],
+                v["target_path_stock"],
+                v["write_mode"],
+                watermarks,
+            )
+            logger.info(f"Data saved to CSV format; {n_rows} rows.")
+            return
+
+        stock_prices_df = self.fetch_data(api_key, params_list)
+
+        # Filter data of all corporations by corporations to ingest.
+        if (
+            fetch_mode == "date"
+            and corp_lists is not None
+            and not stock_prices_df.empty
+        ):
+            stock_prices_df = filter_jquants_codes(stock_prices_df, corp_lists)
+        # Drop rows of trading days already saved for each corporation.
+        if fetch_mode == "date" and watermarks is not None:
+            stock_prices_df = filter_after_watermarks(
+                stock_prices_df, watermarks, "Code"
+            )
 
         if stock_prices_df.empty:
             logger.warning("No data fetched from JQuants Stock Price API.")
@@ -477,6 +746,8 @@ class DataIngestionJQuantsStockPrice(WorkflowsRegistry, ExternalFileMixin):
                     file_path=v["target_path_stock"],
                     primary_keys=extract_primary_keys(v["schema_stock_price"]),
                 ).mode(v["write_mode"]).save()
+                if watermarks is not None:
+                    update_watermarks(target_path, df_valid, watermarks)
             logger.info("Data saved to CSV format.")
 
             if not v["target_path_stock"]:
@@ -523,6 +794,11 @@ class DataIngestionJQuantsIndustryReport(WorkflowsRegistry, ExternalFileMixin):
         str = "overwrite"
     schema: Output data schema.
         Optional[Dict] = Field(description="data_schema.", default=None)
+    rate_limit: J-Quants plan (free, light, standard or premium) or rate limit of requests;
+        requests_per_second, burst, max_retries and backoff.
+        Union[str, Dict] = "standard"
+    cache: Response cache of requests; cache_dir, default_ttl, ttls and max_size_mb.
+        Optional[Dict] = None; enabled by DFOLKS_HTTP_CACHE if None.
     ingestion_source: Data source.
         str
     ----------
@@ -544,6 +820,8 @@ class DataIngestionJQuantsIndustryReport(WorkflowsRegistry, ExternalFileMixin):
     schema_industry_report: Optional[Dict] = Field(
         description="data_schema.", default=None
     )
+    rate_limit: Union[str, Dict] = "standard"
+    cache: Optional[Dict] = None
     ingestion_source: str
 
     @field_validator("latest_data", mode="before")
@@ -577,6 +855,10 @@ class DataIngestionJQuantsIndustryReport(WorkflowsRegistry, ExternalFileMixin):
         # Get variables.
         logger.info("Retrieving workflow variables.")
         v = self.variables
+        # Rate limit of jquants shared by all requests of the workflow.
+        set_rate_limit("jquants", jquants_rate_limit(v["rate_limit"]))
+        if v["cache"] is not None:
+            set_response_cache(v["cache"])
 
         # If neither start_date nor end_date is defined, set date range to last 1 week.
         if v["latest_data"]:
@@ -10,7 +10,7 @@ Need to work:
 
 import datetime
 import logging
-import time
+import shutil
 from typing import ClassVar, Dict, List, Optional
 
 import pandas as pd
@@ -26,13 +26,15 @@ from dfolks.data.jquants_apis import (
     get_jquants_api_key_v2,
     get_jquants_corporate_list_v2,
 )
-from dfolks.data.output import SaveFile
+from dfolks.data.output import SaveFile, get_file_path
+from dfolks.data.ratelimit import set_rate_limit
+from dfolks.data.watermark import missing_ranges, read_watermarks, update_watermarks
 from dfolks.data.yfinance_apis import (
-    get_yfinance_balance_sheet,
-    get_yfinance_cash_flow,
+    download_yfinance_data,
     get_yfinance_data,
-    get_yfinance_dividends,
-    get_yfinance_income_statement,
+    get_yfinance_fin_report,
+    get_yfinance_fin_reports,
+    yfinance_checkpoint_dir,
 )
 from dfolks.utils.utils import extract_primary_keys
 
@@ -87,6 +89,10 @@ class DataIngestionYFinanceFinReport(WorkflowsRegistry, ExternalFileMixin):
         Optional[Dict] = Field(description="data_schema_cash_flow.", default=None)
     schema_dividends: Output data schema of income statement.
         Optional[Dict] = Field(description="data_schema_dividends.", default=None)
+    max_workers: Number of codes fetched concurrently within rate_limit.
+        int = 8
+    rate_limit: Rate limit of requests; requests_per_second, burst, max_retries and backoff.
+        Dict = {"requests_per_second": 2.0, "burst": 4}
     ingestion_source: Data source.
         str
     ----------
@@ -121,6 +127,8 @@ class DataIngestionYFinanceFinReport(WorkflowsRegistry, ExternalFileMixin):
     schema_dividends: Optional[Dict] = Field(
         description="data_schema_dividends.", default=None
     )
+    max_workers: int = Field(default=8, ge=1)
+    rate_limit: Dict = {"requests_per_second": 2.0, "burst": 4}
     ingestion_source: str
 
     @field_validator("corp_filter", mode="before")
@@ -133,11 +141,18 @@ class DataIngestionYFinanceFinReport(WorkflowsRegistry, ExternalFileMixin):
 
     def fetch_data(self, code, cut_date=None):
         """Fetch data via Yahoo finance."""
-        income_statement = get_yfinance_income_statement(ticker=code)
-        balance_sheet = get_yfinance_balance_sheet(ticker=code)
-        cash_flow = get_yfinance_cash_flow(ticker=code)
-        dividends = get_yfinance_dividends(ticker=code)
+        income_statement, balance_sheet, cash_flow, dividends = get_yfinance_fin_report(
+            ticker=code
+        )
+
+        return self.cut_data(
+            income_statement, balance_sheet, cash_flow, dividends, cut_date
+        )
 
+    def cut_data(
+        self, income_statement, balance_sheet, cash_flow, dividends, cut_date=None
+    ):
+        """Keep data after cut_date."""
         if cut_date is not None:
             income_statement = income_statement[income_statement["date"] >= cut_date]
             balance_sheet = balance_sheet[balance_sheet["date"] >= cut_date]
@@ -156,6 +171,8 @@ class DataIngestionYFinanceFinReport(WorkflowsRegistry, ExternalFileMixin):
         # Get variables.
         logger.info("Retrieving workflow variables.")
         v = self.variables
+        # Rate limit of yfinance shared by all requests of the workflow.
+        set_rate_limit("yfinance", v["rate_limit"])
 
         if v["cut_date"] is None:
             cut_date = datetime.datetime.today() - datetime.timedelta(days=30)
@@ -165,31 +182,9 @@ class DataIngestionYFinanceFinReport(WorkflowsRegistry, ExternalFileMixin):
 
         logger.info(f"Data ingestion after {cut_date}.")
 
-        income_statements = []
-        balance_sheets = []
-        cash_flows = []
-        dividends_reports = []
-
         # If corp_codes is defined, use them; otherwise get all listed corp codes from JQuants.
         if v["corp_codes"]:
-            for code in v["corp_codes"]:
-                logger.info(f"Fetching data for code: {code}")
-                logger.info(f"Data ingestion after {cut_date}.")
-                income_statement, balance_sheet, cash_flow, dividends = self.fetch_data(
-                    f"{code[:4]}.T", cut_date
-                )
-                income_statements.append(income_statement)
-                balance_sheets.append(balance_sheet)
-                cash_flows.append(cash_flow)
-                dividends_reports.append(dividends)
-                time.sleep(1)  # To avoid hitting rate limits.
-
-            logger.info("Combining documents into one dataframe")
-            income_statements_df = pd.concat(income_statements, ignore_index=True)
-            balance_sheets_df = pd.concat(balance_sheets, ignore_index=True)
-            cash_flows_df = pd.concat(cash_flows, ignore_index=True)
-            dividends_reports_df = pd.concat(dividends_reports, ignore_index=True)
-
+            corp_lists = v["corp_codes"]
         else:
             logger.info("Get JQuants api key.")
             api_key = get_jquants_api_key_v2()
@@ -208,23 +203,33 @@ class DataIngestionYFinanceFinReport(WorkflowsRegistry, ExternalFileMixin):
             else:
                 corp_lists = corp_lists["Code"].tolist()
 
-            for code in corp_lists:
-                logger.info(f"Fetching data for code: {code}")
-                logger.info(f"Data ingestion after {cut_date}.")
-                income_statement, balance_sheet, cash_flow, dividends = self.fetch_data(
-                    f"{code[:4]}.T", cut_date
-                )
-                income_statements.append(income_statement)
-                balance_sheets.append(balance_sheet)
-                cash_flows.append(cash_flow)
-                dividends_reports.append(dividends)
-                time.sleep(1)  # To avoid hitting rate limits.
-
-            logger.info("Combining documents into one dataframe")
-            income_statements_df = pd.concat(income_statements, ignore_index=True)
-            balance_sheets_df = pd.concat(balance_sheets, ignore_index=True)
-            cash_flows_df = pd.concat(cash_flows, ignore_index=True)
-            dividends_reports_df = pd.concat(dividends_reports, ignore_index=True)
+        # Fetch all statements of a code by one Ticker; codes are fetched concurrently.
+        logger.info(
+            f"Fetching data for {len(corp_lists)} codes "
+            f"with {v['max_workers']} threads."
+        )
+        reports = get_yfinance_fin_reports(
+            [f"{code[:4]}.T" for code in corp_lists], max_workers=v["max_workers"]
+        )
+
+        income_statements = []
+        balance_sheets = []
+        cash_flows = []
+        dividends_reports = []
+        for report in reports.values():
+            income_statement, balance_sheet, cash_flow, dividends = self.cut_data(
+                *report, cut_date=cut_date
+            )
+            income_statements.append(income_statement)
+            balance_sheets.append(balance_sheet)
+            cash_flows.append(cash_flow)
+            dividends_reports.append(dividends)
+
+        logger.info("Combining documents into one dataframe")
+        income_statements_df = pd.concat(income_statements, ignore_index=True)
+        balance_sheets_df = pd.concat(balance_sheets, ignore_index=True)
+        cash_flows_df = pd.concat(cash_flows, ignore_index=True)
+        dividends_reports_df = pd.concat(dividends_reports, ignore_index=True)
 
         # Replace ".T" with "0" in ticker codes
         income_statements_df["ticker"] = income_statements_df["ticker"].str.replace(
@@ -384,6 +389,21 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
         str = "overwrite"
     schema_stock_price: Output data schema of stock price.
         Optional[Dict] = Field(description="data_schema_stock_price.", default=None)
+    chunk_size: Number of tickers downloaded at once.
+        int = 100
+    max_workers: Number of chunks reshaped and checkpointed concurrently; downloads
+        run one at a time within rate_limit.
+        int = 4
+    checkpoint: Save each chunk when downloaded; a failed run downloads only missing chunks.
+        bool = True
+    checkpoint_dir: Folder of checkpoints; removed for a run once its data is output.
+        Optional[str] = None; Home directory/DataHive/checkpoint/yfinance if None.
+    watermark: Download each ticker only after the latest Date of its Ticker in
+        target_path_stock, read by read_watermarks, until end_date or today; write_mode
+        must not be overwrite. start_date or period applies to tickers not saved yet.
+        bool = False
+    rate_limit: Rate limit of requests; requests_per_second, burst, max_retries and backoff.
+        Dict = {"requests_per_second": 2.0, "burst": 4}
     ingestion_source: Data source.
         str
     ----------
@@ -408,6 +428,12 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
     schema_stock_price: Optional[Dict] = Field(
         description="data_schema_stock_price.", default=None
     )
+    chunk_size: int = Field(default=100, ge=1)
+    max_workers: int = Field(default=4, ge=1)
+    checkpoint: bool = True
+    checkpoint_dir: Optional[str] = None
+    watermark: bool = False
+    rate_limit: Dict = {"requests_per_second": 2.0, "burst": 4}
     ingestion_source: str
 
     @field_validator("period", mode="before")
@@ -441,24 +467,86 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
         return value
 
     def fetch_data(
-        self, codes, start_date=None, end_date=None, period=None, interval=None
+        self,
+        codes,
+        start_date=None,
+        end_date=None,
+        period=None,
+        interval=None,
+        checkpoint_dir=None,
     ):
-        """Fetch data via Yahoo finance."""
+        """Fetch data via Yahoo finance in chunks of codes."""
+        v = self.variables
         if start_date is not None and end_date is not None:
-            stock_price = get_yfinance_data(
+            stock_price = download_yfinance_data(
                 tickers=codes,
+                chunk_size=v["chunk_size"],
+                max_workers=v["max_workers"],
+                checkpoint_dir=checkpoint_dir,
                 start_date=start_date,
                 end_date=end_date,
             )
         else:
-            stock_price = get_yfinance_data(
+            stock_price = download_yfinance_data(
                 tickers=codes,
+                chunk_size=v["chunk_size"],
+                max_workers=v["max_workers"],
+                checkpoint_dir=checkpoint_dir,
                 period=period,
                 interval=interval,
             )
 
         return stock_price
 
+    def plan_downloads(self, corp_lists, watermarks=None) -> List[Dict]:
+        """Return downloads of tickers with their start_date, end_date, period and interval.
+
+        With watermarks, each ticker is downloaded from the day after its watermark until
+        end_date or today, and tickers from the same day are downloaded together.
+        Tickers up to date are not downloaded.
+        """
+        v = self.variables
+        params = {k: v[k] for k in ["start_date", "end_date", "period", "interval"]}
+        if watermarks is None:
+            return [{"tickers": corp_lists, **params}]
+
+        # end_date of Yahoo finance is exclusive.
+        end_date = v["end_date"] or str(
+            datetime.date.today() + datetime.timedelta(days=1)
+        )
+        last_date = str((pd.Timestamp(end_date) - pd.Timedelta(days=1)).date())
+
+        # Tickers saved as Ticker; e.g. 7203.T as 72030.
+        tickers = {ticker.replace(".T", "0"): ticker for ticker in corp_lists}
+        groups = {}
+        ranges = missing_ranges(tickers, watermarks, v["start_date"], last_date)
+        for key, (start_date, _) in ranges.items():
+            groups.setdefault(start_date, []).append(tickers[key])
+        logger.info(f"{len(tickers) - len(ranges)} tickers are up to date.")
+
+        downloads = []
+        for start_date, group in groups.items():
+            # Tickers not saved yet are downloaded by period.
+            if start_date is None:
+                downloads.append({"tickers": group, **params})
+            else:
+                downloads.append(
+                    {
+                        "tickers": group,
+                        "start_date": start_date,
+                        "end_date": end_date,
+                        "period": None,
+                        "interval": None,
+                    }
+                )
+
+        return downloads
+
+    def remove_checkpoints(self, checkpoint_dirs) -> None:
+        """Remove checkpoints of a run once its data is output."""
+        for checkpoint_dir in checkpoint_dirs:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
     def run(self) -> None:
         """Execute workflow."""
         # Get a logger.
@@ -469,8 +557,8 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
         # Get variables.
         logger.info("Retrieving workflow variables.")
         v = self.variables
-
-        stock_prices = []
+        # Rate limit of yfinance shared by all requests of the workflow.
+        set_rate_limit("yfinance", v["rate_limit"])
 
         if (
             v["start_date"] is None
@@ -485,20 +573,7 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
 
         # If corp_codes is defined, use them; otherwise get all listed corp codes from JQuants.
         if v["corp_codes"]:
-            logger.info(f"Fetching data for code: {v['corp_codes']}")
-            corp_lists = [f"{code[:4]}.T" for code in v["corp_codes"]]
-            stock_price = self.fetch_data(
-                corp_lists,
-                v["start_date"],
-                v["end_date"],
-                v["period"],
-                v["interval"],
-            )
-            stock_prices.append(stock_price)
-            time.sleep(1)  # To avoid hitting rate limits.
-
-            stock_prices_df = pd.concat(stock_prices, ignore_index=True)
-
+            corp_lists = v["corp_codes"]
         else:
             logger.info("Get JQuants api key.")
             api_key = get_jquants_api_key_v2()
@@ -515,25 +590,70 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
                 ]["Code"].tolist()
                 logger.info(f"Total {len(corp_lists)} corporations after filtering.")
             else:
-                corp_lists = [f"{code[:4]}.T" for code in corp_lists["Code"].tolist()]
+                corp_lists = corp_lists["Code"].tolist()
+        corp_lists = [f"{code[:4]}.T" for code in corp_lists]
+        logger.info(f"Fetching data for {len(corp_lists)} codes.")
+
+        # Watermarks of saved data; only dates after them are downloaded.
+        watermarks = None
+        if v["watermark"]:
+            if (
+                v["format"] != "csv"
+                or not v["target_path_stock"]
+                or v["write_mode"] == "overwrite"
+                or v["interval"] not in [None, "1d"]
+            ):
+                raise ValueError(
+                    "watermark downloads daily data after saved data of each ticker; "
+                    "format must be csv with target_path_stock, write_mode must not be "
+                    "overwrite and interval must be 1d."
+                )
+            target_path = get_file_path(v["target_db"], v["target_path_stock"])
+            watermarks = read_watermarks(target_path)
+            logger.info(f"Watermarks of {len(watermarks)} tickers in {target_path}.")
 
-            logger.info(f"Fetching data for code: {corp_lists}")
+        downloads = self.plan_downloads(corp_lists, watermarks)
+        if not downloads:
+            logger.info("No new data to fetch from Yahoo finance API.")
+            return
 
-            stock_price = self.fetch_data(
-                corp_lists,
-                v["start_date"],
-                v["end_date"],
-                v["period"],
-                v["interval"],
+        stock_prices_dfs = []
+        checkpoint_dirs = []
+        for download in downloads:
+            # Checkpoints of chunks; a failed run is resumed from downloaded chunks.
+            checkpoint_dir = None
+            if v["checkpoint"]:
+                checkpoint_dir = yfinance_checkpoint_dir(
+                    download["tickers"],
+                    v["checkpoint_dir"],
+                    chunk_size=v["chunk_size"],
+                    start_date=download["start_date"],
+                    end_date=download["end_date"],
+                    period=download["period"],
+                    interval=download["interval"],
+                )
+                checkpoint_dirs.append(checkpoint_dir)
+                logger.info(f"Checkpoints of chunks are saved in {checkpoint_dir}.")
+
+            stock_prices_dfs.append(
+                self.fetch_data(
+                    download["tickers"],
+                    download["start_date"],
+                    download["end_date"],
+                    download["period"],
+                    download["interval"],
+                    checkpoint_dir,
+                )
             )
-            stock_prices.append(stock_price)
-            time.sleep(1)  # To avoid hitting rate limits.
-
-            logger.info("Combining parsed data into one DataFrame.")
-            stock_prices_df = pd.concat(stock_prices, ignore_index=True)
+        stock_prices_df = (
+            stock_prices_dfs[0]
+            if len(stock_prices_dfs) == 1
+            else pd.concat(stock_prices_dfs, ignore_index=True)
+        )
 
         if stock_prices_df.empty:
             logger.warning("No data fetched from Yahoo finance API.")
+            self.remove_checkpoints(checkpoint_dirs)
             return
 
         stock_prices_df["ticker"] = stock_prices_df["ticker"].str.replace(".T", "0")
@@ -550,6 +670,7 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
         # Output
         if v["format"] == "df":
             logger.info("Returning DataFrame format.")
+            self.remove_checkpoints(checkpoint_dirs)
             return stock_prices_df_vaid
 
         elif v["format"] == "csv":
@@ -561,8 +682,11 @@ class DataIngestionYFinanceStockPrice(WorkflowsRegistry, ExternalFileMixin):
                     file_path=v["target_path_stock"],
                     primary_keys=extract_primary_keys(v["schema_stock_price"]),
                 ).mode(v["write_mode"]).save()
+                if watermarks is not None:
+                    update_watermarks(target_path, stock_prices_df_vaid, watermarks)
             else:
                 logger.error("No path defined for stock price!")
+            self.remove_checkpoints(checkpoint_dirs)
 
         else:
             raise NotImplementedError("other type not implemented yet!")
@@ -603,6 +727,8 @@ class DataIngestionYFinanceMarketData(WorkflowsRegistry, ExternalFileMixin):
         str = "overwrite"
     schema_market_data: Output data schema of market data.
         Optional[Dict] = Field(description="data_schema_market_data.", default=None)
+    rate_limit: Rate limit of requests; requests_per_second, burst, max_retries and backoff.
+        Dict = {"requests_per_second": 2.0, "burst": 4}
     ingestion_source: Data source.
         str
     ----------
@@ -625,6 +751,7 @@ class DataIngestionYFinanceMarketData(WorkflowsRegistry, ExternalFileMixin):
     schema_market_data: Optional[Dict] = Field(
         description="data_schema_market_data.", default=None
     )
+    rate_limit: Dict = {"requests_per_second": 2.0, "burst": 4}
     ingestion_source: str
 
     @field_validator("period", mode="before")
@@ -678,6 +805,8 @@ class DataIngestionYFinanceMarketData(WorkflowsRegistry, ExternalFileMixin):
         # Get variables.
         logger.info("Retrieving workflow variables.")
         v = self.variables
+        # Rate limit of yfinance shared by all requests of the workflow.
+        set_rate_limit("yfinance", v["rate_limit"])
 
         market_data_consolidated = []
 
@@ -702,7 +831,6 @@ class DataIngestionYFinanceMarketData(WorkflowsRegistry, ExternalFileMixin):
             v["interval"],
         )
         market_data_consolidated.append(market_data)
-        time.sleep(1)  # To avoid hitting rate limits.
 
         market_data_consolidated_df = pd.concat(
             market_data_consolidated, ignore_index=True